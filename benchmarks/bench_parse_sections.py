@@ -0,0 +1,120 @@
+# benchmarks/bench_parse_sections.py
+"""
+Compare the single-pass section parser against the original per-line
+regex/dict implementation on a large synthetic document.
+
+Usage:
+    python benchmarks/bench_parse_sections.py [--lines 100000] [--repeat 3]
+"""
+import argparse
+import gc
+import re
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.section_parser import parse_document, parse_sections
+
+
+def reference_parse_sections(content):
+    """The original GxPDocumentGenerator.parse_sections (dict per line, re.match per line)"""
+    sections = []
+    lines = content.split('\n')
+    section_stack = [{'level': 0, 'indent_level': -1}]
+    for line in lines:
+        stripped_line = line.strip()
+        if not stripped_line:
+            continue
+        heading_match = re.match(r'^\s*(\d+(\.\d+)*)\.?\s+(.+)$', line)
+        if heading_match:
+            heading_number = heading_match.group(1)
+            level = heading_number.count('.') + 1
+            heading_text = heading_match.group(3).strip()
+            current_section_info = {
+                'type': 'heading',
+                'level': level,
+                'text': f"{heading_number}. {heading_text}",
+                'number': heading_number,
+                'indent_level': level - 1
+            }
+            sections.append(current_section_info)
+            while section_stack[-1]['level'] >= level:
+                section_stack.pop()
+            section_stack.append(current_section_info)
+        else:
+            parent_section = section_stack[-1]
+            sections.append({
+                'type': 'content',
+                'level': parent_section['level'],
+                'text': stripped_line,
+                'indent_level': parent_section['indent_level'] + 1
+            })
+    return sections
+
+
+def synthetic_document(target_lines):
+    """A document shaped like the generator output (epics with x.1-x.6 and nested controls)"""
+    lines = ["Document Summary", "    Synthetic benchmark document.", ""]
+    epic = 0
+    while len(lines) < target_lines:
+        epic += 1
+        lines += [f"{epic}. Screen {epic}", ""]
+        for sub, title in enumerate(["Function of Screen", "Title", "User Interface", "Data Displayed", "Data Entry/Edit"], start=1):
+            lines += [f"{epic}.{sub} {title}", "    Description of the screen behaviour for this section.", ""]
+        lines += [f"{epic}.6 Controls", ""]
+        for control in range(1, 6):
+            lines += [f"{epic}.6.{control} Control {control}"]
+            for part, title in enumerate(["Picture", "Visible", "Enabled"], start=1):
+                lines += [f"    {epic}.6.{control}.{part} {title}", "        [Description]", ""]
+            lines += [f"    {epic}.6.{control}.4 Validation/Processing",
+                      f"        {epic}.6.{control}.4.1",
+                      "            Processing logic for a specific validation.", ""]
+    return "\n".join(lines[:target_lines])
+
+
+def measure(func, content, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func(content)
+        best = min(best, time.perf_counter() - start)
+        del result
+    gc.collect()
+    tracemalloc.start()
+    result = func(content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    content = synthetic_document(args.lines)
+    ref_time, ref_peak, ref_result = measure(reference_parse_sections, content, args.repeat)
+    doc_time, doc_peak, document = measure(parse_document, content, args.repeat)
+    rec_time, rec_peak, records = measure(parse_sections, content, args.repeat)
+
+    if [section.to_dict() for section in records] != ref_result:
+        print("ERROR: parse_sections output differs from the reference implementation")
+        return 1
+
+    print(f"{args.lines} lines, {len(document)} sections")
+    print(f"{'implementation':<28}{'time (s)':>10}{'peak memory (MB)':>18}{'speedup':>9}{'memory':>8}")
+    for name, elapsed, peak in (
+        ("reference (dict per line)", ref_time, ref_peak),
+        ("parse_document (columns)", doc_time, doc_peak),
+        ("parse_sections (records)", rec_time, rec_peak),
+    ):
+        print(f"{name:<28}{elapsed:>10.4f}{peak / 1e6:>18.2f}{ref_time / elapsed:>8.2f}x{peak / ref_peak:>7.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
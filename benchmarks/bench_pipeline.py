@@ -0,0 +1,189 @@
+# benchmarks/bench_pipeline.py
+"""
+Micro-benchmarks for the CPU-side of the generation pipeline: parse_sections,
+create_txt_document, preprocess_content and the DOCX renderer, run against
+synthetic generated documents of increasing size and the BLOOD-* fixtures.
+
+Each case reports its best time over --repeat runs and its peak traced memory,
+and is compared with the stored baseline (benchmarks/baseline.json). The run
+fails (exit code 1) if any case is slower or uses more memory than the baseline
+allows. Timings are machine specific: refresh the baseline with
+--update-baseline on the machine that runs the check.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--sizes 1000,10000,100000,1000000] [--repeat 3]
+    python benchmarks/bench_pipeline.py --update-baseline
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+# The generators configure the Gemini client on construction; nothing here calls it
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("GENERATION_CACHE_ENABLED", "false")
+# Parse and render in this process: the baseline times the stages themselves, and
+# tracemalloc does not see allocations made in CPU pool worker processes
+os.environ["CPU_POOL_WORKERS"] = "0"
+
+from benchmarks.bench_parse_sections import synthetic_document
+from src.section_parser import parse_document, parse_sections
+from src.docx_renderer import render_docx
+from src.gxp_doc_generator import GxPDocumentGenerator as LegacyGenerator
+from src.gxp_doc_generator_gemini import GxPDocumentGenerator
+
+BASE_PATH = Path(__file__).parent.parent
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+FIXTURES_PATH = BASE_PATH / "data" / "userstories"
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+# Allowed slowdown / memory growth relative to the baseline before a case fails
+DEFAULT_TIME_TOLERANCE = 0.5
+DEFAULT_MEMORY_TOLERANCE = 0.2
+# Time differences below this are timer noise and never count as a regression
+MIN_TIME_DELTA = 0.005
+
+
+def deep_document(target_lines):
+    """A synthetic document with 1.1.1.1-style nesting down to nine levels"""
+    lines = []
+    counters = []
+    while len(lines) < target_lines:
+        # Walk down to level 9, then back up one level at a time
+        if len(counters) < 9:
+            counters.append(1)
+        else:
+            while len(counters) > 1 and counters[-1] >= 3:
+                counters.pop()
+            counters[-1] += 1
+        number = ".".join(str(c) for c in counters)
+        indent = "    " * (len(counters) - 1)
+        lines += [f"{indent}{number} Section {number}", f"{indent}    Detail text for section {number}.", ""]
+    return "\n".join(lines[:target_lines])
+
+
+def fixture_document():
+    """The BLOOD-* user story fixtures joined into one document"""
+    return "\n\n".join(path.read_text(encoding="utf-8") for path in sorted(FIXTURES_PATH.glob("BLOOD-*.txt")))
+
+
+def measure(func, content, repeat):
+    """Return (best time in seconds, peak traced memory in bytes)"""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func(content)
+        best = min(best, time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    func(content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def build_operations(output_dir):
+    """Name -> callable(content) for every benchmarked pipeline stage"""
+    generator = GxPDocumentGenerator()
+    generator.output_path = output_dir
+    legacy_generator = LegacyGenerator()
+    legacy_generator.output_path = output_dir
+    docx_path = output_dir / "benchmark.docx"
+    return {
+        "parse_sections": parse_sections,
+        "create_txt_document": generator.create_txt_document,
+        "preprocess_content": legacy_generator.preprocess_content,
+        "render_docx": lambda content: render_docx(parse_document(content), docx_path),
+    }
+
+
+def build_documents(sizes):
+    """Case label -> document content"""
+    documents = {}
+    for size in sizes:
+        documents[f"synthetic-{size}"] = synthetic_document(size)
+        documents[f"deep-{size}"] = deep_document(size)
+    documents["fixtures-BLOOD"] = fixture_document()
+    return documents
+
+
+def compare(results, baseline, time_tolerance, memory_tolerance):
+    """Return a list of regression messages for cases that exceed their baseline"""
+    regressions = []
+    for case, result in results.items():
+        expected = baseline.get(case)
+        if expected is None:
+            continue
+        time_limit = max(expected["time"] * (1 + time_tolerance), expected["time"] + MIN_TIME_DELTA)
+        if result["time"] > time_limit:
+            regressions.append(f"{case}: {result['time']:.4f}s > {time_limit:.4f}s (baseline {expected['time']:.4f}s)")
+        memory_limit = expected["peak"] * (1 + memory_tolerance)
+        if result["peak"] > memory_limit:
+            regressions.append(
+                f"{case}: {result['peak'] / 1e6:.2f} MB > {memory_limit / 1e6:.2f} MB (baseline {expected['peak'] / 1e6:.2f} MB)"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma separated synthetic document sizes, in lines.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", default=None, help="Comma separated subset of stages to run.")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline.")
+    parser.add_argument("--time-tolerance", type=float, default=DEFAULT_TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=DEFAULT_MEMORY_TOLERANCE)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    documents = build_documents(sizes)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        operations = build_operations(Path(output_dir))
+        if args.only:
+            operations = {name: operations[name] for name in args.only.split(",")}
+
+        results = {}
+        print(f"{'case':<44}{'time (s)':>10}{'peak memory (MB)':>18}")
+        for label, content in documents.items():
+            for name, func in operations.items():
+                case = f"{name}/{label}"
+                elapsed, peak = measure(func, content, args.repeat)
+                results[case] = {"time": round(elapsed, 6), "peak": peak}
+                print(f"{case:<44}{elapsed:>10.4f}{peak / 1e6:>18.2f}")
+
+    if args.update_baseline:
+        baseline = {
+            "machine": f"{platform.system()} {platform.machine()}, Python {platform.python_version()}",
+            "results": results,
+        }
+        args.baseline.write_text(json.dumps(baseline, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one.")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    regressions = compare(results, baseline.get("results", {}), args.time_tolerance, args.memory_tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {args.baseline} ({baseline.get('machine')}):")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print(f"\nNo regressions against {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
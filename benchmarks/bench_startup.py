@@ -0,0 +1,138 @@
+# benchmarks/bench_startup.py
+"""
+Cold-start benchmark of the API.
+
+1. Import time: runs `python -X importtime -c "import src.api.main"` in a fresh
+   interpreter and reports the total, the time of each src module and the
+   slowest third-party packages.
+2. Startup: starts uvicorn --runs times and measures the time from launching
+   the process to the first 200 from /health and to the generator being ready
+   (the first 200 from /generate/llm, which waits for the Gemini client).
+
+The Gemini SDK and python-docx must not be imported at startup; the run fails
+(exit code 1) if importing the app loads any of HEAVY_MODULES.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--top 15]
+"""
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+BASE_PATH = Path(__file__).parent.parent
+# Imported on first use only; loading one of these at startup is a regression
+HEAVY_MODULES = ("google.generativeai", "google.api_core.exceptions", "docx", "lxml")
+IMPORTTIME_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+POLL_INTERVAL_SECONDS = 0.01
+DEFAULT_STARTUP_TIMEOUT_SECONDS = 60
+
+
+def benchmark_env():
+    env = dict(os.environ)
+    # The generator configures the Gemini client on creation; nothing here calls it
+    env.setdefault("GOOGLE_API_KEY", "benchmark")
+    env["PYTHONPATH"] = str(BASE_PATH) + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def measure_imports():
+    """Return ([(module, self µs, cumulative µs, depth)], eagerly loaded heavy modules)"""
+    check = f"import sys, src.api.main; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", check],
+        cwd=BASE_PATH, env=benchmark_env(), capture_output=True, text=True, check=True
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    eager = [name for name in result.stdout.strip().split(",") if name]
+    return modules, eager
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, deadline):
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(POLL_INTERVAL_SECONDS)
+    raise TimeoutError(f"No 200 from {url} in time.")
+
+
+def measure_startup(timeout):
+    """Seconds from launching uvicorn to the first healthy response and to the generator being ready"""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.api.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BASE_PATH, env=benchmark_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = started + timeout
+        healthy = wait_for(f"{base_url}/health", deadline)
+        ready = wait_for(f"{base_url}/generate/llm", deadline)
+        return healthy - started, ready - started
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Server starts to measure.")
+    parser.add_argument("--top", type=int, default=15, help="Third-party packages to list.")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_STARTUP_TIMEOUT_SECONDS)
+    args = parser.parse_args()
+
+    modules, eager = measure_imports()
+    total = next(cumulative for name, _, cumulative, _ in modules if name == "src.api.main")
+    print(f"Importing src.api.main: {total / 1e6:.3f}s\n")
+    print(f"{'module':<44}{'self (s)':>10}{'cumulative (s)':>16}")
+    for name, self_us, cumulative_us, _ in modules:
+        if name.startswith("src."):
+            print(f"{name:<44}{self_us / 1e6:>10.4f}{cumulative_us / 1e6:>16.4f}")
+
+    # Top-level third-party packages: the outermost import of each
+    packages = {}
+    for name, _, cumulative_us, depth in modules:
+        root = name.split(".")[0]
+        if root != "src" and name == root:
+            packages[root] = max(packages.get(root, 0), cumulative_us)
+    print(f"\n{'package':<44}{'cumulative (s)':>26}")
+    for root, cumulative_us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{root:<44}{cumulative_us / 1e6:>26.4f}")
+
+    healthy, ready = zip(*(measure_startup(args.timeout) for _ in range(args.runs)))
+    print(f"\n{'startup (s), ' + str(args.runs) + ' runs':<44}{'min':>10}{'median':>10}{'max':>10}")
+    for label, values in (("first healthy response (/health)", healthy), ("generator ready (/generate/llm)", ready)):
+        print(f"{label:<44}{min(values):>10.3f}{statistics.median(values):>10.3f}{max(values):>10.3f}")
+
+    if eager:
+        print(f"\nImported at startup, should be lazy: {', '.join(eager)}")
+        return 1
+    print("\nNo heavy modules imported at startup.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+# benchmarks/bench_structure_validator.py
+"""
+Check and time the structural validator (src/structure_validator.py).
+
+The sample section of prompt/system.txt is the reference for a well-formed
+section. Before timing, the run checks that the sample passes, also with a
+numbered acceptance-criteria list inside its content (such lists are content,
+not headings), and that known defects are reported. It then times
+validate_document over a document of --sections copies of the sample.
+
+Usage:
+    python benchmarks/bench_structure_validator.py [--sections 50] [--repeat 5]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.epics import renumber_section
+from src.structure_validator import validate_section, validate_document
+
+SYSTEM_PROMPT_PATH = Path(__file__).parent.parent / "prompt" / "system.txt"
+ACCEPTANCE_CRITERIA = (
+    "    Acceptance Criteria:\n"
+    "    1. Provider can search and select a patient\n"
+    "    2. Provider enters the postal code\n"
+    "        2.1 Only digits are accepted\n"
+    "    3. Provider confirms the entry"
+)
+
+
+def sample_section():
+    """The sample section of the system prompt as section 1, with its screen name as the heading"""
+    system_prompt = SYSTEM_PROMPT_PATH.read_text(encoding="utf-8")
+    return "1. Postal Code Entry\n" + system_prompt[system_prompt.index("1.1 Function of Screen"):].strip()
+
+
+def check_cases(section):
+    """Return a list of failed checks (empty if the validator behaves as expected)"""
+    with_list = section.replace("1.2 Title", ACCEPTANCE_CRITERIA + "\n\n1.2 Title", 1)
+    cases = [
+        ("sample section", section, []),
+        ("sample with a numbered list", with_list, []),
+        ("renamed subsection", with_list.replace("1.2 Title", "1.2 Heading"), ["1.2 should be 'Title', not 'Heading'"]),
+        ("markdown", section.replace("1.4 Data Displayed", "**1.4 Data Displayed**"), None),
+        ("missing Controls", section.replace("1.6 Controls", "Controls"), None),
+    ]
+    failures = []
+    for name, text, expected in cases:
+        issues = validate_section(text, 1)
+        if (expected is not None and issues != expected) or (expected is None and not issues):
+            failures.append(f"{name}: got {issues}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    section = sample_section()
+    failures = check_cases(section)
+    if failures:
+        print("ERROR: unexpected validation results:\n  " + "\n  ".join(failures))
+        return 1
+
+    document = "Document Summary\n    Benchmark document.\n\n" + "\n\n".join(
+        renumber_section(section, number) for number in range(1, args.sections + 1)
+    )
+    best = None
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        report = validate_document(document)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    if report:
+        print(f"ERROR: well-formed document reported as malformed: {report[:3]}")
+        return 1
+    print(f"{args.sections} sections, {len(document.splitlines())} lines: "
+          f"{best:.4f}s ({best / args.sections * 1000:.2f} ms per section)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
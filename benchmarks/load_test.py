@@ -0,0 +1,165 @@
+# benchmarks/load_test.py
+"""
+End-to-end load test of the API: each virtual user uploads a user stories file
+and the DB schema (/upload/*), then requests the document (/generate), and the
+harness reports throughput and p50/p95/p99 latency per endpoint.
+
+By default the app runs in-process with the replay LLM backend, so no Gemini
+quota is used and the numbers measure the service's own overhead (plus the
+simulated model latency). Point --url at a running server to test a deployment.
+
+Usage:
+    python benchmarks/load_test.py [--requests 200] [--concurrency 16]
+        [--latency fixed:0.5] [--mode single|fanout|incremental] [--output-format txt|docx]
+    python benchmarks/load_test.py --url http://localhost:8000 --requests 50
+
+Requires httpx (pip install httpx).
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+try:
+    import httpx
+except ImportError:
+    sys.exit("The load test requires httpx: pip install httpx")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+DATA_PATH = Path(__file__).parent.parent / "data"
+ENDPOINTS = ("upload_userstories", "upload_databaseschema", "generate")
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def load_inputs():
+    stories = "\n\n".join(
+        path.read_text(encoding="utf-8") for path in sorted((DATA_PATH / "userstories").glob("BLOOD-*.txt"))
+    )
+    schema = (DATA_PATH / "database-design" / "blood_collection_schema.sql").read_text(encoding="utf-8")
+    return stories.encode("utf-8"), schema.encode("utf-8")
+
+
+async def run_session(client, stories, schema, args, latencies, errors):
+    """One virtual user: upload both inputs, then generate"""
+    if args.unique_inputs:
+        # A distinct upload per session defeats upload dedup and the generation cache
+        stories = stories + f"\n\nNote: load test session {uuid.uuid4().hex}\n".encode("utf-8")
+
+    async def timed(endpoint, request):
+        start = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError as e:
+            errors[endpoint] = errors.get(endpoint, 0) + 1
+            print(f"{endpoint}: {type(e).__name__}: {e}")
+            return None
+        latencies[endpoint].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            errors[endpoint] = errors.get(endpoint, 0) + 1
+            return None
+        return response
+
+    stories_response = await timed("upload_userstories", client.post(
+        "/upload/userstories", files={"file": ("stories.txt", stories, "text/plain")}
+    ))
+    schema_response = await timed("upload_databaseschema", client.post(
+        "/upload/databaseschema", files={"file": ("schema.sql", schema, "text/plain")}
+    ))
+    if stories_response is None or schema_response is None:
+        return
+    params = {
+        "user_stories_id": stories_response.json()["upload_id"],
+        "db_schema_id": schema_response.json()["upload_id"],
+        "output_format": args.output_format,
+    }
+    if args.mode:
+        params["mode"] = args.mode
+    await timed("generate", client.get("/generate", params=params))
+
+
+async def run_load(args, client):
+    stories, schema = load_inputs()
+    latencies = {endpoint: [] for endpoint in ENDPOINTS}
+    errors = {}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def worker():
+        async with semaphore:
+            await run_session(client, stories, schema, args, latencies, errors)
+
+    # Warm-up request (generator creation, first imports) is not measured
+    await run_session(client, stories, schema, args, {endpoint: [] for endpoint in ENDPOINTS}, {})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def report(latencies, errors, elapsed, args):
+    sessions = len(latencies["generate"])
+    print(f"\n{args.requests} sessions, concurrency {args.concurrency}, {elapsed:.2f}s wall time")
+    print(f"Throughput: {sessions / elapsed:.2f} documents/s, "
+          f"{sum(len(values) for values in latencies.values()) / elapsed:.2f} requests/s")
+    print(f"{'endpoint':<24}{'count':>7}{'errors':>8}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}{'max (ms)':>10}")
+    for endpoint in ENDPOINTS:
+        values = sorted(latencies[endpoint])
+        print(f"{endpoint:<24}{len(values):>7}{errors.get(endpoint, 0):>8}"
+              + "".join(f"{1000 * percentile(values, q):>10.1f}" for q in (0.50, 0.95, 0.99))
+              + f"{1000 * (values[-1] if values else float('nan')):>10.1f}")
+
+
+async def main_async(args):
+    timeout = httpx.Timeout(args.timeout)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=timeout) as client:
+            return await run_load(args, client)
+
+    # In-process: replay backend, no Gemini calls
+    os.environ.setdefault("GOOGLE_API_KEY", "load-test")
+    os.environ["LLM_BACKEND"] = "replay"
+    os.environ["LLM_REPLAY_LATENCY"] = args.latency
+    os.environ["LLM_REPLAY_CHUNK_INTERVAL"] = args.chunk_interval
+    # The quota limiter would only measure the configured limits
+    os.environ.setdefault("GEMINI_REQUESTS_PER_MINUTE", "0")
+    os.environ.setdefault("GEMINI_TOKENS_PER_MINUTE", "0")
+    from src.api.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=timeout) as client:
+        return await run_load(args, client)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="Base URL of a running server (default: run the app in-process).")
+    parser.add_argument("--requests", type=int, default=100, help="Number of upload+generate sessions.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mode", default=None, help="Generation mode passed to /generate.")
+    parser.add_argument("--output-format", default="txt")
+    parser.add_argument("--latency", default="fixed:0.2",
+                        help="Replay backend response latency (none, fixed:S, uniform:MIN,MAX, normal:MEAN,STD, lognormal:MU,SIGMA).")
+    parser.add_argument("--chunk-interval", default="none", help="Replay backend delay between streamed chunks.")
+    parser.add_argument("--shared-inputs", dest="unique_inputs", action="store_false",
+                        help="Reuse identical inputs in every session (exercises upload dedup and the generation cache).")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout in seconds.")
+    args = parser.parse_args()
+
+    latencies, errors, elapsed = asyncio.run(main_async(args))
+    report(latencies, errors, elapsed, args)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+# src/api/dependencies.py
+from fastapi import HTTPException, Request, status
+import asyncio
+import logging
+
+from src.gxp_doc_generator_gemini import GxPDocumentGenerator
+
+logger = logging.getLogger(__name__)
+
+_generator_lock = asyncio.Lock()
+
+
+def create_generator():
+    """
+    Creates the process-wide GxPDocumentGenerator, or returns None (after logging)
+    if it cannot be configured yet, e.g. because GOOGLE_API_KEY is missing.
+    Startup must not fail in that case so /health keeps answering.
+    """
+    try:
+        return GxPDocumentGenerator()
+    except Exception as e:
+        logger.error(f"Could not initialize the document generator: {e}")
+        return None
+
+
+async def get_generator(request: Request) -> GxPDocumentGenerator:
+    """
+    FastAPI dependency returning the shared generator created after startup.
+    Requests arriving while it is still being created wait for it. If startup
+    could not create it, creation is retried here so a fixed configuration is
+    picked up without a restart.
+    """
+    generator = getattr(request.app.state, "generator", None)
+    if generator is not None:
+        return generator
+
+    warm_up_task = getattr(request.app.state, "warm_up_task", None)
+    if warm_up_task is not None and not warm_up_task.done():
+        # Shielded: a client disconnecting must not cancel the shared start-up
+        await asyncio.shield(warm_up_task)
+        generator = getattr(request.app.state, "generator", None)
+        if generator is not None:
+            return generator
+
+    async with _generator_lock:
+        generator = getattr(request.app.state, "generator", None)
+        if generator is None:
+            try:
+                generator = await asyncio.to_thread(GxPDocumentGenerator)
+            except Exception as e:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Internal server error: document generator is not available ({e}). Please check server logs."
+                )
+            request.app.state.generator = generator
+    return generator
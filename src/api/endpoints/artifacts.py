@@ -0,0 +1,179 @@
+# src/api/endpoints/artifacts.py
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import Response, StreamingResponse
+import re
+import logging
+
+from src.artifact_store import get_artifact_store
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Artifacts never change once stored, so clients and proxies may keep them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+FILE_CHUNK_SIZE = 64 * 1024
+# Preferred order when the client accepts several encodings equally
+ENCODING_PREFERENCE = ("br", "gzip")
+BYTE_RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def accepted_encodings(accept_encoding):
+    """Map each content-coding in an Accept-Encoding header to its q-value"""
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate_encoding(artifact, accept_encoding):
+    """Return the precompressed encoding to serve ("br", "gzip") or None for the original file"""
+    accepted = accepted_encodings(accept_encoding)
+    best, best_q = None, 0.0
+    for encoding in ENCODING_PREFERENCE:
+        if encoding not in artifact.encodings:
+            continue
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against `etag`"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def parse_byte_range(range_header, size):
+    """
+    Return (start, end) (inclusive) for a single "bytes=" range, None when the
+    header should be ignored (absent, malformed or several ranges), or raise
+    ValueError when the range cannot be satisfied.
+    """
+    if not range_header:
+        return None
+    match = BYTE_RANGE_PATTERN.match(range_header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("Empty suffix range.")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        raise ValueError("Range starts after the end of the file.")
+    return start, end
+
+
+def iter_file(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(FILE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def artifact_response(request, artifact, cache_control=IMMUTABLE_CACHE_CONTROL, extra_headers=None):
+    """
+    Serve `artifact` for `request`: a precompressed variant when the client
+    accepts one, 304 for a matching If-None-Match, 206 for a single byte Range
+    (honouring If-Range) and 416 for an unsatisfiable one.
+    """
+    encoding = negotiate_encoding(artifact, request.headers.get("accept-encoding"))
+    path = artifact.variant_path(encoding) if encoding else artifact.path
+    # Each representation has its own strong ETag
+    etag = f'"{artifact.id}-{encoding}"' if encoding else artifact.etag
+    size = path.stat().st_size
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Vary": "Accept-Encoding",
+        "Accept-Ranges": "bytes",
+        "Content-Location": artifact.url,
+        **(extra_headers or {}),
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    headers["Content-Disposition"] = f'attachment; filename="{artifact.filename}"'
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range.strip() != etag:
+        # The client's partial copy is of another representation: send it all
+        range_header = None
+    try:
+        byte_range = parse_byte_range(range_header, size)
+    except ValueError:
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={**headers, "Content-Range": f"bytes */{size}"}
+        )
+
+    status_code = status.HTTP_200_OK
+    start, length = 0, size
+    if byte_range is not None:
+        start, end = byte_range
+        length = end - start + 1
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(length)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type=artifact.media_type)
+    return StreamingResponse(
+        iter_file(path, start, length), status_code=status_code, headers=headers, media_type=artifact.media_type
+    )
+
+
+@router.api_route(
+    "/artifacts/{artifact_id}",
+    methods=["GET", "HEAD"],
+    tags=["Artifacts"],
+    summary="Download a Generated Document by Content Hash",
+    responses={
+        200: {"description": "The document (possibly gzip/brotli encoded, see Content-Encoding)."},
+        206: {"description": "The requested byte range."},
+        304: {"description": "The client's copy (If-None-Match) is current."},
+        404: {"description": "Unknown artifact id."},
+        416: {"description": "The requested range cannot be satisfied."},
+    }
+)
+async def get_artifact(artifact_id: str, request: Request):
+    """
+    Downloads a generated document by its `artifact_id` (the SHA-256 of its
+    content). The URL always refers to the same bytes, so responses carry a
+    strong ETag and may be cached indefinitely; conditional (If-None-Match) and
+    resumable (Range, If-Range) downloads are supported.
+    """
+    artifact = get_artifact_store().get(artifact_id)
+    if artifact is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Artifact '{artifact_id}' not found.")
+    return artifact_response(request, artifact)
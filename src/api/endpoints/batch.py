@@ -0,0 +1,185 @@
+# src/api/endpoints/batch.py
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+import os
+import re
+import json
+import time
+import zipfile
+import logging
+
+from src.gxp_doc_generator_gemini import GxPDocumentGenerator, OUTPUT_FORMAT_TXT, COMPRESSED_SUFFIXES
+from src.incremental import DEFAULT_DOCUMENT_KEY
+
+from ..dependencies import get_generator
+from .generate import (
+    resolve_uploaded_inputs, validate_generation_mode, validate_document_key_param,
+    validate_output_format, store_artifact
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+DEFAULT_BATCH_MAX_ITEMS = 100
+DEFAULT_BATCH_MAX_CONCURRENCY = 4
+ZIP_CHUNK_SIZE = 64 * 1024
+# Characters allowed in the folder name of an item inside the zip
+UNSAFE_NAME_PATTERN = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+class BatchItem(BaseModel):
+    user_stories_id: str = Field(..., description="upload_id returned by /upload/userstories or /upload/userstories/bulk.")
+    db_schema_id: str = Field(..., description="upload_id returned by /upload/databaseschema.")
+    name: Optional[str] = Field(None, description="Folder name of this item's document in the zip (e.g. the module name).")
+    mode: Optional[str] = Field(None, description="Generation mode, as for /generate.")
+    document_key: str = Field(DEFAULT_DOCUMENT_KEY, description="Document key for 'incremental' mode.")
+    output_format: str = Field(OUTPUT_FORMAT_TXT, description="'txt', 'docx', 'md', 'html' or several comma separated (a zip of them).")
+
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+    max_concurrency: Optional[int] = Field(
+        None, ge=1, description="Generations run at once (capped by BATCH_MAX_CONCURRENCY)."
+    )
+
+
+class ZipStreamBuffer:
+    """
+    Write-only file object collecting what zipfile writes, drained after each
+    write so the archive can be streamed. It has no tell()/seek(), so zipfile
+    writes data descriptors instead of seeking back into the stream.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def item_folder(index, item):
+    """Unique, filesystem-safe folder for an item inside the zip"""
+    name = UNSAFE_NAME_PATTERN.sub("_", item.name or "").strip("._") or "item"
+    return f"{index + 1:03d}_{name[:80]}"
+
+
+def stream_batch_zip(generator, items, resolved, max_concurrency):
+    """
+    Generate every item on a bounded pool and yield a zip archive as the items
+    complete: each finished document as `<folder>/<filename>`, each failure as
+    `<folder>/error.txt`, and finally `manifest.json` with per-item status.
+    """
+    buffer = ZipStreamBuffer()
+    results = [None] * len(items)
+
+    def run(index):
+        item = items[index]
+        user_stories_path, db_schema_path = resolved[index]
+        started = time.perf_counter()
+        output_file_path = generator.generate(
+            user_stories_path, db_schema_path,
+            mode=item.mode, document_key=item.document_key, output_format=item.output_format
+        )
+        return store_artifact(output_file_path), time.perf_counter() - started
+
+    executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="gxp-batch")
+    try:
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            futures = {executor.submit(run, index): index for index in range(len(items))}
+            for future in as_completed(futures):
+                index = futures[future]
+                item = items[index]
+                folder = item_folder(index, item)
+                result = {"index": index, "name": item.name, "folder": folder,
+                          "user_stories_id": item.user_stories_id, "db_schema_id": item.db_schema_id}
+                try:
+                    artifact, elapsed = future.result()
+                except Exception as e:
+                    logger.error(f"Batch item {index} ({item.name}) failed: {e}", exc_info=True)
+                    results[index] = {**result, "status": "failed", "error": str(e)}
+                    archive.writestr(f"{folder}/error.txt", f"{type(e).__name__}: {e}\n")
+                    yield buffer.drain()
+                    continue
+
+                results[index] = {**result, "status": "completed", "artifact_id": artifact.id,
+                                  "artifact_url": artifact.url, "filename": artifact.filename,
+                                  "size": artifact.size, "seconds": round(elapsed, 3)}
+                entry = zipfile.ZipInfo(f"{folder}/{artifact.filename}", date_time=datetime.now().timetuple()[:6])
+                # DOCX and bundles are already zips; deflating them again only costs time
+                entry.compress_type = zipfile.ZIP_STORED if artifact.path.suffix in COMPRESSED_SUFFIXES else zipfile.ZIP_DEFLATED
+                with open(artifact.path, 'rb') as source, archive.open(entry, "w") as target:
+                    while chunk := source.read(ZIP_CHUNK_SIZE):
+                        target.write(chunk)
+                        yield buffer.drain()
+                yield buffer.drain()
+
+            completed = sum(1 for result in results if result["status"] == "completed")
+            manifest = {"total": len(items), "completed": completed, "failed": len(items) - completed, "items": results}
+            archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+            logger.info(f"Batch finished: {completed} of {len(items)} documents generated.")
+        yield buffer.drain()
+    finally:
+        # Also reached when the client disconnects: drop the items not started yet
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+@router.post(
+    "/generate/batch",
+    tags=["Generation"],
+    summary="Generate GxP Documents for Many Inputs",
+    description="Generates one document per (user stories, DB schema) item with bounded concurrency and streams back a zip archive as the documents complete. Each item's document is in its own folder; failed items get an `error.txt` instead, and `manifest.json` at the end of the archive lists every item's status.",
+    responses={
+        200: {"description": "Zip archive of the generated documents.", "content": {"application/zip": {}}},
+        400: {"description": "Empty or too large batch, or an invalid item parameter."},
+        404: {"description": "Unknown upload id(s) in an item."},
+    }
+)
+async def generate_batch(request: BatchRequest, generator: GxPDocumentGenerator = Depends(get_generator)):
+    """
+    Generates documents for all items of the batch. Every item is validated
+    before anything is generated, so a bad upload id fails the whole request
+    up front instead of in the middle of the archive.
+    """
+    max_items = int(os.getenv("BATCH_MAX_ITEMS", DEFAULT_BATCH_MAX_ITEMS))
+    if not request.items or len(request.items) > max_items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch must contain between 1 and {max_items} items (got {len(request.items)})."
+        )
+
+    resolved = []
+    for index, item in enumerate(request.items):
+        try:
+            validate_generation_mode(item.mode)
+            validate_document_key_param(item.document_key)
+            validate_output_format(item.output_format)
+            resolved.append(resolve_uploaded_inputs(item.user_stories_id, item.db_schema_id))
+        except HTTPException as e:
+            raise HTTPException(status_code=e.status_code, detail=f"Item {index}: {e.detail}")
+
+    max_concurrency = int(os.getenv("BATCH_MAX_CONCURRENCY", DEFAULT_BATCH_MAX_CONCURRENCY))
+    if request.max_concurrency:
+        max_concurrency = min(max_concurrency, request.max_concurrency)
+    max_concurrency = max(1, min(max_concurrency, len(request.items)))
+    print(f"Starting batch generation of {len(request.items)} documents (max {max_concurrency} concurrent)...")
+
+    filename = f"GxP_Documentation_batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return StreamingResponse(
+        stream_batch_zip(generator, request.items, resolved, max_concurrency),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Accel-Buffering": "no"}
+    )
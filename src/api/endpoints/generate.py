@@ -1,26 +1,135 @@
 # src/api/endpoints/generate.py
-from fastapi import APIRouter, HTTPException, status
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import FileResponse, StreamingResponse
 import os
+import json
 from pathlib import Path
 import traceback # Import for detailed error logging
 import asyncio
 
 # Import your generator class
-from src.gxp_doc_generator_gemini import GxPDocumentGenerator
+from src.gxp_doc_generator_gemini import GxPDocumentGenerator, GENERATION_MODES, OUTPUT_FORMAT_TXT, parse_output_formats
+from src.renderers import RENDERERS
+from src.generation_cache import get_generation_cache, get_section_cache
+from src.similarity_index import get_similarity_index
+from src.section_parser import IncrementalSectionParser
+from src.incremental import validate_document_key, DEFAULT_DOCUMENT_KEY
+from src.prompt_compaction import PromptBudgetExceededError
+from src.llm_client import LLMUnavailableError, LLMDeadlineExceededError
+from src.artifact_store import get_artifact_store
+from src.metrics import GenerationTimings
 
-# Import the shared state (simple dictionary) and upload directory
-from .uploads import uploaded_files, UPLOAD_DIR
+# Import the shared content-addressed upload store
+from .uploads import upload_store
+from .artifacts import artifact_response
+from ..dependencies import get_generator
 
 router = APIRouter()
 # Output directory is handled within the generator class ('output/')
 
+def resolve_uploaded_inputs(user_stories_id, db_schema_id):
+    """
+    Returns the (user_stories_path, db_schema_path) stored for the given upload
+    ids, raising HTTPException if either is unknown. A bulk upload's bundle id
+    resolves to the list of its files.
+    """
+    user_stories_path = upload_store.input_paths(user_stories_id)
+    if user_stories_path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No uploaded user stories file with id '{user_stories_id}'. Upload it via /upload/userstories or /upload/userstories/bulk."
+        )
+    db_schema_path = upload_store.path_for(db_schema_id)
+    if db_schema_path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No uploaded database schema file with id '{db_schema_id}'. Upload it via /upload/databaseschema."
+        )
+    return user_stories_path, db_schema_path
+
+
+# Shared query parameters identifying the inputs of a generation
+USER_STORIES_ID_QUERY = Query(..., description="upload_id returned by /upload/userstories or /upload/userstories/bulk.")
+DB_SCHEMA_ID_QUERY = Query(..., description="upload_id returned by /upload/databaseschema.")
+
+
+def validate_generation_mode(mode):
+    """
+    Raises HTTPException for an unknown generation mode. None selects the server default.
+    """
+    if mode is not None and mode not in GENERATION_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown generation mode '{mode}'. Expected one of: {', '.join(GENERATION_MODES)}."
+        )
+    return mode
+
+
+# Shared query parameter for endpoints that trigger a generation
+MODE_QUERY = Query(
+    None,
+    description="'single' sends all user stories in one prompt; 'fanout' generates each epic concurrently and stitches the sections; 'incremental' works like 'fanout' but only regenerates epics whose stories or referenced schema tables changed since the last run of the same document_key. Defaults to the GENERATION_MODE setting."
+)
+DOCUMENT_KEY_QUERY = Query(
+    DEFAULT_DOCUMENT_KEY,
+    description="Identifies the document across runs for 'incremental' mode (letters, digits, '_', '-', '.')."
+)
+
+
+OUTPUT_FORMAT_QUERY = Query(
+    OUTPUT_FORMAT_TXT,
+    description="Format of the generated document: 'txt' (plain text), 'docx' (Word, with a linked table of contents), 'md' (Markdown) or 'html'. Several comma separated formats (e.g. 'txt,docx') are rendered from one parse and returned together as a zip file."
+)
+
+# Media types of the generated documents, by file suffix (zip: several formats at once)
+DOCUMENT_MEDIA_TYPES = {
+    **{renderer.suffix: renderer.media_type for renderer in RENDERERS.values()},
+    ".zip": "application/zip",
+}
+
+
+def validate_output_format(output_format):
+    """
+    Raises HTTPException for an unknown output format (or list of formats).
+    """
+    try:
+        parse_output_formats(output_format)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return output_format
+
+
+def document_media_type(output_file_path):
+    """
+    Returns the media type to serve a generated document with.
+    """
+    return DOCUMENT_MEDIA_TYPES.get(Path(output_file_path).suffix.lower(), "application/octet-stream")
+
+
+def store_artifact(output_file_path):
+    """
+    Moves a generated document into the content-addressed artifact store and
+    returns its Artifact (served at /artifacts/{artifact_id}).
+    """
+    return get_artifact_store().add(output_file_path, document_media_type(output_file_path))
+
+
+def validate_document_key_param(document_key):
+    """
+    Raises HTTPException for a document key that cannot be used.
+    """
+    try:
+        return validate_document_key(document_key)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
 @router.get(
     "/generate",
     tags=["Generation"],
     response_class=FileResponse,
     summary="Generate GxP Document",
-    description="Triggers the GxP document generation using previously uploaded user stories and DB schema. Returns the generated document as a downloadable file.",
+    description="Triggers the GxP document generation using the uploaded user stories and DB schema identified by their upload ids. Returns the generated document as a downloadable file.",
     responses={
         200: {
             "description": "GxP document generated successfully.",
@@ -30,67 +139,62 @@ router = APIRouter()
                         "type": "string",
                         "format": "binary"
                     }
-                }
-                # Add 'application/vnd.openxmlformats-officedocument.wordprocessingml.document' if supporting DOCX
+                },
+                "application/vnd.openxmlformats-officedocument.wordprocessingml.document": {
+                    "schema": {
+                        "type": "string",
+                        "format": "binary"
+                    }
+                },
+                "text/markdown": {"schema": {"type": "string", "format": "binary"}},
+                "text/html": {"schema": {"type": "string", "format": "binary"}},
+                "application/zip": {"schema": {"type": "string", "format": "binary"}}
             }
         },
-        400: {"description": "Input file(s) not uploaded yet."},
-        404: {"description": "Uploaded file(s) not found on server."},
+        400: {"description": "Invalid generation mode, document key or output format."},
+        404: {"description": "Unknown upload id(s)."},
+        413: {"description": "A prompt built from the inputs exceeds the per-request token budget."},
         500: {"description": "Internal server error during generation."},
+        503: {"description": "Gemini API is unavailable (circuit breaker open), retry later."},
+        504: {"description": "Gemini API did not respond in time, including retries."},
     }
 )
-async def generate_gxp_document():
+async def generate_gxp_document(
+    request: Request,
+    user_stories_id: str = USER_STORIES_ID_QUERY,
+    db_schema_id: str = DB_SCHEMA_ID_QUERY,
+    mode: str = MODE_QUERY,
+    document_key: str = DOCUMENT_KEY_QUERY,
+    output_format: str = OUTPUT_FORMAT_QUERY,
+    generator: GxPDocumentGenerator = Depends(get_generator)
+):
     """
-    Triggers the GxP document generation process using the previously
-    uploaded files and returns the generated document for download.
+    Triggers the GxP document generation process using the uploaded files
+    and returns the generated document for download.
 
-    Requires prior successful calls to `/output/userstories` and `/output/databaseschema`.
+    Requires prior successful calls to `/upload/userstories` and `/upload/databaseschema`,
+    whose `upload_id`s are passed as `user_stories_id` and `db_schema_id`.
+    The document is also stored as an artifact; its stable URL is returned in the
+    `Content-Location` header for repeat and resumable downloads. The duration of
+    each generation stage is reported in the `Server-Timing` header.
     """
-    user_stories_path_str = uploaded_files.get("user_stories")
-    db_schema_path_str = uploaded_files.get("db_schema")
-
-    # Check if paths were stored after upload
-    if not user_stories_path_str:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="User stories file has not been uploaded via /output/userstories."
-        )
-    if not db_schema_path_str:
-         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Database schema file has not been uploaded via /output/databaseschema."
-        )
-
-    # Convert to Path objects for checking existence
-    user_stories_path = Path(user_stories_path_str)
-    db_schema_path = Path(db_schema_path_str)
-
-    # Check if the files actually exist at the stored paths
-    if not user_stories_path.exists():
-         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Uploaded user stories file not found on server at path: {user_stories_path_str}"
-         )
-    if not db_schema_path.exists():
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Uploaded database schema file not found on server at path: {db_schema_path_str}"
-        )
+    validate_generation_mode(mode)
+    validate_document_key_param(document_key)
+    validate_output_format(output_format)
+    user_stories_path, db_schema_path = resolve_uploaded_inputs(user_stories_id, db_schema_id)
 
     try:
         print(f"Starting GxP document generation process...")
         print(f"Using User Stories: {user_stories_path}")
         print(f"Using DB Schema: {db_schema_path}")
 
-        # Instantiate the generator, passing the file paths
-        generator = GxPDocumentGenerator(
-            user_stories_path=user_stories_path, # Pass Path objects or strings
-            db_schema_path=db_schema_path
-        )
-
         # Call the generate method - it handles loading, API call, parsing, saving
-        # It returns the Path object to the generated file (e.g., output/GxP_Documentation_....txt)
-        output_file_path = await asyncio.to_thread(generator.generate) # Run synchronous generator code in a thread
+        # It returns the Path object to the generated file (e.g., output/GxP_Documentation_....txt or .docx)
+        timings = GenerationTimings()
+        output_file_path = await asyncio.to_thread(
+            generator.generate, user_stories_path, db_schema_path,
+            mode=mode, document_key=document_key, output_format=output_format, timings=timings
+        ) # Run synchronous generator code in a thread
 
         # Ensure the generate method returned a path and the file exists
         if not output_file_path or not output_file_path.exists():
@@ -100,15 +204,25 @@ async def generate_gxp_document():
                 detail="Internal server error: Document generator failed to produce the output file."
             )
 
-        print(f"Generation successful. Preparing file for download: {output_file_path}")
-        # Provide the generated file for download
-        return FileResponse(
-            path=str(output_file_path), # Convert Path object to string for FileResponse
-            filename=output_file_path.name, # Get filename from Path object
-            media_type='text/plain' # Media type for TXT file
-            # Use 'application/vnd.openxmlformats-officedocument.wordprocessingml.document' for docx
+        artifact = await asyncio.to_thread(store_artifact, output_file_path)
+        print(f"Generation successful. Serving artifact {artifact.id} ({artifact.filename})")
+        # Every call generates anew, so this URL must not be cached; /artifacts/{id} may be
+        return artifact_response(
+            request, artifact, cache_control="no-cache", extra_headers={"Server-Timing": timings.server_timing()}
         )
 
+    except PromptBudgetExceededError as e:
+         print(f"Generation rejected: {e}")
+         raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"{e} Reduce the inputs or raise PROMPT_TOKEN_BUDGET."
+         )
+    except LLMUnavailableError as e:
+         print(f"Generation rejected: {e}")
+         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    except LLMDeadlineExceededError as e:
+         print(f"Generation timed out: {e}")
+         raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
     except FileNotFoundError as e:
          # Specific handling for file missing errors during generator execution
          print(f"Generation failed due to missing file inside generator: {e}")
@@ -132,4 +246,154 @@ async def generate_gxp_document():
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An unexpected internal server error occurred while generating the document: {str(e)}. Please check server logs."
-        )
\ No newline at end of file
+        )
+
+
+def format_sse_event(event, payload):
+    """
+    Encodes a Server-Sent Event with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@router.get(
+    "/generate/stream",
+    tags=["Generation"],
+    summary="Stream GxP Document Generation",
+    description="Generates the GxP document with Gemini streaming enabled and pushes each parsed heading/content line to the client as soon as it is complete, either as Server-Sent Events (`format=sse`) or as chunked plain text (`format=text`). The complete TXT document is also saved on the server, with any structure repairs applied (see `repaired` in the `complete` event).",
+    responses={
+        200: {
+            "description": "Stream of generated sections.",
+            "content": {"text/event-stream": {}, "text/plain": {}}
+        },
+        400: {"description": "Unknown stream format."},
+        404: {"description": "Unknown upload id(s)."},
+        500: {"description": "Internal server error before streaming started."},
+    }
+)
+async def stream_gxp_document(
+    user_stories_id: str = USER_STORIES_ID_QUERY,
+    db_schema_id: str = DB_SCHEMA_ID_QUERY,
+    format: str = Query("sse", description="'sse' for Server-Sent Events, 'text' for chunked plain text."),
+    generator: GxPDocumentGenerator = Depends(get_generator)
+):
+    """
+    Streams the generated document section by section.
+
+    SSE events: `section` (one parsed heading or content line, with its rendered
+    TXT line), then `complete` (the saved document's filename and artifact URL,
+    and `repaired`: whether structure repairs changed it from the streamed text)
+    or `error`.
+    """
+    if format not in ("sse", "text"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown stream format '{format}'. Expected 'sse' or 'text'."
+        )
+    user_stories_path, db_schema_path = resolve_uploaded_inputs(user_stories_id, db_schema_id)
+
+    try:
+        # Inputs are loaded up front so missing files fail with a proper status code
+        system_prompt = await asyncio.to_thread(generator.load_system_prompt)
+        user_stories = await asyncio.to_thread(generator.load_user_stories, user_stories_path)
+        db_design = await asyncio.to_thread(generator.load_database_design, db_schema_path)
+    except Exception as e:
+        print(f"Could not start streaming generation: {str(e)}")
+        traceback.print_exc()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Internal server error: could not start generation ({e}). Please check server logs."
+        )
+
+    def section_stream():
+        # Runs in Starlette's threadpool since it is a synchronous iterator
+        parser = IncrementalSectionParser()
+        chunks = []
+        previous_section = None
+
+        def encode(section):
+            nonlocal previous_section
+            lines = generator.format_txt_lines(section, previous_section)
+            previous_section = section
+            if format == "sse":
+                return format_sse_event("section", {**section.to_dict(), "lines": lines})
+            return "\n".join(lines) + "\n"
+
+        result = {}
+        try:
+            for chunk in generator.generate_gxp_content_stream(system_prompt, user_stories, db_design, result=result):
+                chunks.append(chunk)
+                for section in parser.feed(chunk):
+                    yield encode(section)
+            for section in parser.close():
+                yield encode(section)
+
+            # The saved document is the one /generate and the cache return: with structure repairs applied
+            content = result.get("content", "".join(chunks))
+            if not content.strip():
+                raise ValueError("Generated content is empty.")
+            artifact = store_artifact(generator.create_txt_document(content))
+            print(f"Streaming generation complete. Saved as artifact {artifact.id}")
+            if format == "sse":
+                yield format_sse_event("complete", {
+                    "filename": artifact.filename, "artifact_id": artifact.id, "artifact_url": artifact.url,
+                    "repaired": result.get("repaired", False)
+                })
+        except Exception as e:
+            print(f"Error during streaming generation: {str(e)}")
+            traceback.print_exc()
+            if format == "sse":
+                yield format_sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        section_stream(),
+        media_type="text/event-stream" if format == "sse" else "text/plain",
+        # Disable caching and proxy buffering so each section reaches the client immediately
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get(
+    "/generate/cache",
+    tags=["Generation"],
+    summary="Generation Cache Statistics",
+    description="Returns hit/miss counters and tier sizes for the generation cache, under `sections` the epic section cache and under `near_duplicates` the near-duplicate index.",
+)
+async def generation_cache_stats():
+    """
+    Reports the state of the content-addressed generation and section caches
+    and of the near-duplicate index.
+    """
+    cache = get_generation_cache()
+    section_cache = get_section_cache()
+    stats = {"enabled": True, **cache.stats()} if cache is not None else {"enabled": False}
+    stats["sections"] = {"enabled": True, **section_cache.stats()} if section_cache is not None else {"enabled": False}
+    similarity_index = get_similarity_index()
+    stats["near_duplicates"] = {"enabled": True, **similarity_index.stats()} if similarity_index is not None else {"enabled": False}
+    return stats
+
+
+@router.get(
+    "/generate/prompts",
+    tags=["Generation"],
+    summary="Prompt Compaction Report",
+    description="Returns how many prompts were sent since startup and the estimated tokens saved by prompt compaction.",
+)
+async def prompt_compaction_stats(generator: GxPDocumentGenerator = Depends(get_generator)):
+    """
+    Reports prompt sizes before and after compaction and the per-request token budget.
+    """
+    return generator.prompt_stats()
+
+
+@router.get(
+    "/generate/llm",
+    tags=["Generation"],
+    summary="Gemini Client Statistics",
+    description="Returns call, retry and throttling counters and the circuit breaker state of the shared Gemini client.",
+)
+async def llm_client_stats(generator: GxPDocumentGenerator = Depends(get_generator)):
+    """
+    Reports the state of the rate-limited Gemini client shared by all requests.
+    """
+    return generator.llm.stats()
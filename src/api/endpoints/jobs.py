@@ -0,0 +1,139 @@
+# src/api/endpoints/jobs.py
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import FileResponse
+import logging
+
+from src.gxp_doc_generator_gemini import GxPDocumentGenerator
+from src.job_manager import get_job_manager, JobQueueFullError, STATUS_COMPLETED, STATUS_FAILED
+from src.artifact_store import get_artifact_store
+
+from ..dependencies import get_generator
+from .artifacts import artifact_response
+from .generate import (
+    resolve_uploaded_inputs, validate_generation_mode, validate_document_key_param,
+    validate_output_format, store_artifact,
+    MODE_QUERY, DOCUMENT_KEY_QUERY, OUTPUT_FORMAT_QUERY, USER_STORIES_ID_QUERY, DB_SCHEMA_ID_QUERY
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.post(
+    "/jobs",
+    tags=["Jobs"],
+    summary="Enqueue GxP Document Generation",
+    status_code=status.HTTP_202_ACCEPTED,
+    description="Queues a GxP document generation for the given uploaded user stories and DB schema and returns a job id immediately. Poll `/jobs/{job_id}` for progress.",
+    responses={
+        202: {"description": "Generation job queued."},
+        400: {"description": "Invalid generation mode, document key or output format."},
+        404: {"description": "Unknown upload id(s)."},
+        503: {"description": "Job queue is full, retry later."},
+    }
+)
+async def create_job(
+    user_stories_id: str = USER_STORIES_ID_QUERY,
+    db_schema_id: str = DB_SCHEMA_ID_QUERY,
+    mode: str = MODE_QUERY,
+    document_key: str = DOCUMENT_KEY_QUERY,
+    output_format: str = OUTPUT_FORMAT_QUERY,
+    generator: GxPDocumentGenerator = Depends(get_generator)
+):
+    """
+    Queues a generation job for the given upload ids.
+    """
+    validate_generation_mode(mode)
+    validate_document_key_param(document_key)
+    validate_output_format(output_format)
+    user_stories_path, db_schema_path = resolve_uploaded_inputs(user_stories_id, db_schema_id)
+
+    def run_generation(progress_callback):
+        # The job result is the artifact id of the generated document
+        return store_artifact(generator.generate(
+            user_stories_path, db_schema_path,
+            progress_callback=progress_callback, mode=mode, document_key=document_key,
+            output_format=output_format
+        )).id
+
+    try:
+        job = get_job_manager().submit(
+            run_generation,
+            metadata={
+                "user_stories_id": user_stories_id,
+                "db_schema_id": db_schema_id,
+                "mode": mode,
+                "document_key": document_key,
+                "output_format": output_format,
+            }
+        )
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+    return {
+        **job.to_dict(),
+        "status_url": f"/jobs/{job.id}",
+        "artifact_url": f"/jobs/{job.id}/artifact",
+    }
+
+
+@router.get(
+    "/jobs/{job_id}",
+    tags=["Jobs"],
+    summary="Get Generation Job Status",
+    responses={404: {"description": "Unknown job id."}}
+)
+async def get_job(job_id: str):
+    """
+    Returns the status and current stage (loading_inputs, prompt_built, llm_running,
+    parsing, rendering, completed) of a generation job.
+    """
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job '{job_id}' not found.")
+    if job.status == STATUS_COMPLETED:
+        # Stable, cacheable URL of the generated document
+        return {**job.to_dict(), "artifact_id": job.result, "artifact_url": f"/artifacts/{job.result}"}
+    return job.to_dict()
+
+
+@router.get(
+    "/jobs/{job_id}/artifact",
+    tags=["Jobs"],
+    response_class=FileResponse,
+    summary="Download Generated Document",
+    responses={
+        200: {"description": "The generated document."},
+        404: {"description": "Unknown job id or artifact missing."},
+        409: {"description": "Job has not completed yet."},
+        500: {"description": "Job failed."},
+    }
+)
+async def get_job_artifact(job_id: str, request: Request):
+    """
+    Downloads the document produced by a completed job.
+    """
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job '{job_id}' not found.")
+    if job.status == STATUS_FAILED:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Job '{job_id}' failed: {job.error}"
+        )
+    if job.status != STATUS_COMPLETED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job '{job_id}' is not complete yet (status: {job.status}, stage: {job.stage})."
+        )
+
+    artifact = get_artifact_store().get(job.result)
+    if artifact is None:
+        logger.error(f"Job {job_id} completed but its artifact is missing: {job.result}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Generated document is no longer available on the server."
+        )
+
+    return artifact_response(request, artifact)
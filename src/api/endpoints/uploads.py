@@ -1,11 +1,15 @@
 # src/api/endpoints/uploads.py
 from fastapi import APIRouter, File, UploadFile, HTTPException, status
-import aiofiles
+from typing import List
 import os
+import asyncio
 from pathlib import Path
-import shutil # For potentially moving files if needed
 import logging # Use standard logging
 
+from src.upload_store import UploadStore, UploadLimitExceededError
+from src.state_store import get_state_store
+from src.upload_archives import store_bulk_upload, InvalidArchiveError
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,13 +25,10 @@ except OSError as e:
     logger.error(f"Could not create upload directory {UPLOAD_DIR}: {e}")
     # Depending on severity, you might want to prevent the app from starting
 
-# In-memory storage for uploaded file paths (simple example).
-# WARNING: Not suitable for production! Lost on restart, not scalable.
-# Consider using Redis, a database, or returning IDs mapping to cloud storage.
-uploaded_files = {
-    "user_stories": None,
-    "db_schema": None
-}
+# Uploads are stored under their SHA-256 and referenced by that id (upload_id)
+# in the generate calls, so concurrent users never share or overwrite inputs.
+# Bundle manifests live in the shared state store, like jobs and artifacts.
+upload_store = UploadStore(UPLOAD_DIR / "uploads", get_state_store())
 
 @router.post(
     "/upload/userstories",
@@ -42,43 +43,29 @@ uploaded_files = {
 )
 async def upload_user_stories(file: UploadFile = File(..., description="The user stories file (e.g., .txt)")):
     """
-    Uploads the user stories file. Replaces any previously uploaded user stories file.
+    Uploads the user stories file. Returns its `upload_id` (the SHA-256 of the
+    content), which is passed as `user_stories_id` to the generate endpoints.
     """
     if not file:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No upload file sent.")
 
-    # Define save path. Using a fixed name overwrites previous uploads.
-    # Alternatively, generate unique names if history is needed.
-    # filename = f"user_stories_{file.filename}" # Keep original filename part
-    filename = "uploaded_user_stories.txt" # Fixed name for simplicity
-    file_path = UPLOAD_DIR / filename
-
     try:
-        logger.info(f"Attempting to save user stories file '{file.filename}' to: {file_path}")
-        # Use a temporary file path during write for atomicity? (More complex)
-        async with aiofiles.open(file_path, 'wb') as out_file:
-            while content := await file.read(1024 * 1024):  # Read file in chunks (e.g., 1MB)
-                await out_file.write(content)
-
-        # Store the absolute or relative path (relative to project root works well here)
-        # Storing the string representation of the Path object.
-        uploaded_files["user_stories"] = str(file_path.resolve()) # Store absolute path
-        logger.info(f"User stories file '{file.filename}' saved successfully. Path stored: {uploaded_files['user_stories']}")
+        logger.info(f"Attempting to store user stories file '{file.filename}'")
+        stored = await upload_store.save(file)
+        logger.info(f"User stories file '{file.filename}' stored as upload {stored['upload_id']}.")
         return {
             "message": "User stories file uploaded successfully.",
             "filename": file.filename,
             "content_type": file.content_type,
-            "saved_path": str(file_path) # Return relative path for info
+            **stored
         }
     except Exception as e:
-        logger.error(f"Error saving user stories file '{file.filename}' to {file_path}: {e}", exc_info=True)
+        logger.error(f"Error saving user stories file '{file.filename}': {e}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Could not save user stories file on the server: {e}"
         )
     finally:
-        # Ensure file handle is closed if an error occurs during read/write
-        # (aiofiles context manager handles this)
         await file.close()
 
 
@@ -95,35 +82,96 @@ async def upload_user_stories(file: UploadFile = File(..., description="The user
 )
 async def upload_database_schema(file: UploadFile = File(..., description="The database schema file (e.g., .sql, .txt)")):
     """
-    Uploads the database schema file. Replaces any previously uploaded schema file.
+    Uploads the database schema file. Returns its `upload_id` (the SHA-256 of the
+    content), which is passed as `db_schema_id` to the generate endpoints.
     """
     if not file:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No upload file sent.")
 
-    # Fixed name for simplicity, overwrites previous upload
-    filename = "uploaded_db_schema.sql"
-    file_path = UPLOAD_DIR / filename
-
     try:
-        logger.info(f"Attempting to save DB schema file '{file.filename}' to: {file_path}")
-        async with aiofiles.open(file_path, 'wb') as out_file:
-             while content := await file.read(1024 * 1024): # Read in chunks
-                await out_file.write(content)
-
-        # Store the path (absolute recommended for clarity if paths are passed around)
-        uploaded_files["db_schema"] = str(file_path.resolve()) # Store absolute path
-        logger.info(f"DB schema file '{file.filename}' saved successfully. Path stored: {uploaded_files['db_schema']}")
+        logger.info(f"Attempting to store DB schema file '{file.filename}'")
+        stored = await upload_store.save(file)
+        logger.info(f"DB schema file '{file.filename}' stored as upload {stored['upload_id']}.")
         return {
             "message": "Database schema file uploaded successfully.",
             "filename": file.filename,
             "content_type": file.content_type,
-            "saved_path": str(file_path) # Return relative path for info
+            **stored
         }
     except Exception as e:
-        logger.error(f"Error saving database schema file '{file.filename}' to {file_path}: {e}", exc_info=True)
+        logger.error(f"Error saving database schema file '{file.filename}': {e}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Could not save database schema file on the server: {e}"
         )
     finally:
         await file.close()
+
+
+@router.post(
+    "/upload/userstories/bulk",
+    tags=["Uploads"],
+    summary="Upload Several User Stories Files or an Archive",
+    status_code=status.HTTP_200_OK,
+    responses={
+        200: {"description": "Files uploaded successfully"},
+        400: {"description": "No usable user stories file, or an unreadable archive"},
+        413: {"description": "Too many files or files too large"},
+        500: {"description": "Could not save files"}
+    }
+)
+async def upload_user_stories_bulk(
+    files: List[UploadFile] = File(..., description="User stories files (e.g., BLOOD-*.txt) and/or .zip / .tar(.gz) archives of them")
+):
+    """
+    Uploads several user stories files in one request. Archives are extracted
+    entry by entry with size limits (UPLOAD_MAX_ENTRIES, UPLOAD_MAX_ENTRY_MB,
+    UPLOAD_MAX_TOTAL_MB). Each file is stored as its own upload and listed, with
+    the title, epic and hash of each of its stories, in a manifest. Returns the
+    manifest; its `bundle_id` is passed as `user_stories_id` to the generate
+    endpoints.
+    """
+    try:
+        logger.info(f"Attempting to store {len(files)} user stories file(s): {', '.join(f.filename or '' for f in files)}")
+        # Extraction and hashing are blocking file I/O; keep them off the event loop
+        manifest = await asyncio.to_thread(
+            store_bulk_upload, upload_store, [(file.filename, file.file) for file in files]
+        )
+        logger.info(f"User stories stored as bundle {manifest['bundle_id']} ({manifest['file_count']} files).")
+        return {
+            "message": "User stories files uploaded successfully.",
+            "upload_id": manifest["bundle_id"],
+            **manifest
+        }
+    except UploadLimitExceededError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except InvalidArchiveError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except ValueError as e:
+        # Nothing usable in the upload
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error saving user stories files: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Could not save user stories files on the server: {e}"
+        )
+    finally:
+        for file in files:
+            await file.close()
+
+
+@router.get(
+    "/upload/bundles/{bundle_id}",
+    tags=["Uploads"],
+    summary="Get a User Stories Bundle Manifest",
+    responses={404: {"description": "Unknown bundle id"}}
+)
+async def get_bundle_manifest(bundle_id: str):
+    """
+    Returns the manifest of a bulk upload: its files and their stories.
+    """
+    manifest = upload_store.load_manifest(bundle_id)
+    if manifest is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Bundle '{bundle_id}' not found.")
+    return manifest
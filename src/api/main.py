@@ -1,17 +1,77 @@
 # src/api/main.py
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Response, status
-from .endpoints import uploads, generate
+from .endpoints import uploads, generate, jobs, artifacts, batch
+from .dependencies import create_generator
+from src.job_manager import shutdown_job_manager
+from src.cpu_pool import get_cpu_pool, shutdown_cpu_pool
+from src.metrics import REGISTRY
+from src.llm_client import CIRCUIT_CLOSED
 import os
+import asyncio
+
+# Prometheus text exposition format
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
 
 # Create uploads directory if it doesn't exist
 UPLOAD_DIR = "output"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
-app = FastAPI(title="GxP Document Generator API")
+def llm_client_metrics():
+    """The Gemini client counters and circuit breaker state as Prometheus samples"""
+    generator = getattr(app.state, "generator", None)
+    if generator is None:
+        return []
+    stats = generator.llm.stats()
+    return [
+        ("gxp_llm_client_events_total", "counter", "Gemini calls, retries, failures and calls rejected by the open circuit.",
+         [({"event": event}, stats[event]) for event in ("calls", "retries", "failures", "rejected")]),
+        ("gxp_llm_throttled_seconds_total", "counter", "Time spent waiting for the Gemini rate limits.",
+         [({}, stats["throttled_seconds"])]),
+        ("gxp_llm_circuit_open", "gauge", "1 while the Gemini circuit breaker is not closed.",
+         [({}, int(stats["circuit_state"] != CIRCUIT_CLOSED))]),
+    ]
+
+
+def warm_up_cpu_pool():
+    cpu_pool = get_cpu_pool()
+    if cpu_pool is not None:
+        cpu_pool.warm_up()
+
+
+async def warm_up(app: FastAPI):
+    """
+    Start the CPU workers and create the generator (importing the Gemini SDK)
+    after startup, so /health answers while they load. Requests that need the
+    generator wait for this in get_generator.
+    """
+    await asyncio.to_thread(warm_up_cpu_pool)
+    # One generator (and Gemini client) for the lifetime of the process
+    app.state.generator = await asyncio.to_thread(create_generator)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.generator = None
+    app.state.warm_up_task = asyncio.create_task(warm_up(app))
+    yield
+    app.state.warm_up_task.cancel()
+    # Stop the background generation workers; queued jobs are cancelled
+    shutdown_job_manager()
+    # Stop the parsing/rendering worker processes
+    shutdown_cpu_pool()
+
+
+app = FastAPI(title="GxP Document Generator API", lifespan=lifespan)
 
 app.include_router(uploads.router)
 app.include_router(generate.router)
+app.include_router(jobs.router)
+app.include_router(artifacts.router)
+app.include_router(batch.router)
+
+REGISTRY.add_collector(llm_client_metrics)
 
 @app.get("/")
 async def root():
@@ -25,6 +85,14 @@ async def health_check():
     """
     return {"status": "ok"}
 
+@app.get("/metrics", tags=["Health"], response_class=Response)
+async def metrics():
+    """
+    Prometheus metrics: generation and per-stage duration histograms, Gemini
+    call latency, time to first token and token counts, and the client counters.
+    """
+    return Response(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
 # Optional: If you want to run directly using python src/api/main.py
 # You'd typically use uvicorn src.api.main:app --reload
 # if __name__ == "__main__":
@@ -0,0 +1,169 @@
+# src/artifact_store.py
+"""
+Content-addressed storage for generated documents.
+
+A generated file is moved to `<artifact_dir>/<sha256><suffix>` and described by
+an entry in the "artifacts" namespace of the state store (download filename,
+media type, size), so every API process finds it. The hash is the artifact
+id, so an artifact URL always refers to the same bytes and can be cached
+forever, and two generations finishing at the same moment can never overwrite
+each other. Text artifacts also get precompressed gzip (and, when the optional
+`brotli` package is installed, brotli) variants next to them, which the API
+serves by content negotiation.
+"""
+import os
+import gzip
+import uuid
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime
+
+try:
+    import brotli
+except ImportError:  # optional: brotli variants are simply not produced
+    brotli = None
+
+from src.upload_store import UPLOAD_ID_PATTERN
+from src.state_store import get_state_store
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024  # 1 MB
+# Files smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+# A variant is kept only if it is at most this fraction of the original size
+MAX_COMPRESSED_RATIO = 0.9
+# Content-Encoding -> file suffix of the precompressed variant
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+# State store namespace of the artifact index
+ARTIFACTS_NAMESPACE = "artifacts"
+
+
+class Artifact:
+    """A stored document"""
+
+    def __init__(self, artifact_id, path, filename, media_type, size, encodings=()):
+        self.id = artifact_id
+        self.path = Path(path)
+        self.filename = filename
+        self.media_type = media_type
+        self.size = size
+        self.encodings = list(encodings)
+
+    @property
+    def etag(self):
+        """Strong entity tag of the identity representation"""
+        return f'"{self.id}"'
+
+    @property
+    def url(self):
+        return f"/artifacts/{self.id}"
+
+    def variant_path(self, encoding):
+        """Path of the precompressed variant for `encoding`, or None"""
+        if encoding not in self.encodings:
+            return None
+        return self.path.with_name(self.path.name + ENCODING_SUFFIXES[encoding])
+
+    def to_dict(self):
+        return {
+            "artifact_id": self.id,
+            "filename": self.filename,
+            "media_type": self.media_type,
+            "size": self.size,
+            "encodings": self.encodings,
+            "url": self.url,
+        }
+
+
+class ArtifactStore:
+    """Generated documents stored under their SHA-256, with precompressed variants"""
+
+    def __init__(self, artifact_dir, state_store):
+        self.artifact_dir = Path(artifact_dir)
+        self.artifact_dir.mkdir(parents=True, exist_ok=True)
+        self.state_store = state_store
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _file_hash(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            while chunk := f.read(HASH_CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def add(self, source_path, media_type, filename=None):
+        """
+        Move the generated file at `source_path` into the store and return its
+        Artifact. Storing content that is already present keeps the existing
+        artifact (and its filename) and removes the new copy.
+        """
+        source_path = Path(source_path)
+        artifact_id = self._file_hash(source_path)
+        with self._lock:
+            existing = self.get(artifact_id)
+            if existing is not None:
+                source_path.unlink(missing_ok=True)
+                return existing
+
+            path = self.artifact_dir / f"{artifact_id}{source_path.suffix.lower()}"
+            os.replace(source_path, path)
+            size = path.stat().st_size
+            encodings = self._precompress(path, media_type, size)
+            artifact = Artifact(artifact_id, path, filename or source_path.name, media_type, size, encodings)
+            metadata = {**artifact.to_dict(), "file": path.name, "created_at": datetime.now().isoformat()}
+            # The index entry is written last: an artifact is visible only once complete
+            self.state_store.put(ARTIFACTS_NAMESPACE, artifact_id, metadata)
+        logger.info(f"Stored artifact {artifact_id} ({artifact.filename}, {size} bytes, variants: {encodings or 'none'}).")
+        return artifact
+
+    def _precompress(self, path, media_type, size):
+        """Write the gzip/brotli variants worth keeping; return their encodings"""
+        if size < MIN_COMPRESS_SIZE or not media_type.startswith("text/"):
+            # DOCX and other zip-based formats are already compressed
+            return []
+        data = path.read_bytes()
+        compressors = {"gzip": lambda d: gzip.compress(d, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressors["br"] = lambda d: brotli.compress(d, quality=11)
+        encodings = []
+        for encoding, compress in compressors.items():
+            compressed = compress(data)
+            if len(compressed) > size * MAX_COMPRESSED_RATIO:
+                continue
+            variant = path.with_name(path.name + ENCODING_SUFFIXES[encoding])
+            tmp_path = variant.with_name(f".{uuid.uuid4().hex}.part")
+            tmp_path.write_bytes(compressed)
+            os.replace(tmp_path, variant)
+            encodings.append(encoding)
+        return encodings
+
+    def get(self, artifact_id):
+        """Return the Artifact stored under `artifact_id`, or None"""
+        if not artifact_id or not UPLOAD_ID_PATTERN.match(artifact_id):
+            return None
+        metadata = self.state_store.get(ARTIFACTS_NAMESPACE, artifact_id)
+        if metadata is None:
+            return None
+        path = self.artifact_dir / metadata["file"]
+        if not path.exists():
+            return None
+        encodings = [e for e in metadata.get("encodings", []) if path.with_name(path.name + ENCODING_SUFFIXES[e]).exists()]
+        return Artifact(artifact_id, path, metadata["filename"], metadata["media_type"], metadata["size"], encodings)
+
+
+_artifact_store = None
+_artifact_store_lock = threading.Lock()
+
+
+def get_artifact_store(output_path=None):
+    """Return the process-wide artifact store (under `output/artifacts` by default)"""
+    global _artifact_store
+    with _artifact_store_lock:
+        if _artifact_store is None:
+            base = Path(output_path) if output_path else Path(__file__).parent.parent / "output"
+            _artifact_store = ArtifactStore(base / "artifacts", get_state_store())
+        return _artifact_store
@@ -0,0 +1,120 @@
+# src/cpu_pool.py
+"""
+Process pool for the CPU-bound stages of a generation.
+
+Parsing the generated content and rendering it (DOCX in particular) is pure
+Python work that holds the GIL, so running it on the request's thread slows
+every other request served by the same process. These stages are sent to a
+ProcessPoolExecutor instead: the inputs (content, ParsedDocument, paths) and
+outputs are picklable, and the stage timings a worker records are sent back
+with the result. The Gemini calls stay on threads, where they mostly wait on
+the network.
+
+CPU_POOL_WORKERS sets the number of worker processes; 0 keeps the stages in
+the calling thread.
+"""
+import os
+import logging
+import importlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from src.metrics import GenerationTimings, use_timings, record_stages
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CPU_POOL_WORKERS = min(4, os.cpu_count() or 1)
+# Imported by every worker on start-up, so the first generation does not pay for it
+WARM_UP_MODULES = ("src.section_parser", "src.renderers")
+
+
+def _warm_up():
+    for module in WARM_UP_MODULES:
+        importlib.import_module(module)
+
+
+def _run_timed(function, args):
+    """Run `function(*args)` in a worker process; return its result and the stages it timed"""
+    timings = GenerationTimings()
+    with use_timings(timings):
+        result = function(*args)
+    return result, dict(timings.stages)
+
+
+class CPUPool:
+    """Runs picklable functions on a pool of worker processes"""
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._executor = self._create_executor()
+
+    def _create_executor(self):
+        # Forking a process that runs request and Gemini threads can copy held
+        # locks into the child, so workers are started fresh
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def map(self, calls):
+        """
+        Run (function, args) pairs concurrently in the worker processes and
+        return their results in order. The stages timed by the workers are added
+        to the caller's current generation timings.
+        """
+        with self._lock:
+            executor = self._executor
+        try:
+            futures = [executor.submit(_run_timed, function, args) for function, args in calls]
+            results = []
+            for future in futures:
+                result, stages = future.result()
+                record_stages(stages)
+                results.append(result)
+            return results
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory): replace the pool for the next calls
+            logger.error("CPU worker process died; restarting the process pool.")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = self._create_executor()
+            raise
+
+    def warm_up(self):
+        """Start the worker processes and their imports in the background"""
+        with self._lock:
+            for _ in range(self.max_workers):
+                self._executor.submit(_warm_up)
+
+    def run(self, function, *args):
+        """Run `function(*args)` in a worker process and return its result"""
+        return self.map([(function, args)])[0]
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_cpu_pool = None
+_cpu_pool_lock = threading.Lock()
+
+
+def get_cpu_pool():
+    """Return the process-wide CPU pool configured from the environment, or None when disabled"""
+    global _cpu_pool
+    with _cpu_pool_lock:
+        if _cpu_pool is None:
+            max_workers = int(os.getenv("CPU_POOL_WORKERS", DEFAULT_CPU_POOL_WORKERS))
+            if max_workers <= 0:
+                return None
+            _cpu_pool = CPUPool(max_workers)
+        return _cpu_pool
+
+
+def shutdown_cpu_pool():
+    """Stop the worker processes (called on application shutdown)"""
+    global _cpu_pool
+    with _cpu_pool_lock:
+        if _cpu_pool is not None:
+            _cpu_pool.shutdown()
+            _cpu_pool = None
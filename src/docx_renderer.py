@@ -0,0 +1,201 @@
+# src/docx_renderer.py
+"""
+Fast DOCX rendering of a parsed GxP document.
+
+The styled base document (fonts, title/timestamp/TOC styles) is built once per
+process and kept as bytes; each render loads a copy of it and appends all body
+paragraphs in one bulk XML parse instead of one python-docx call per paragraph.
+"""
+import io
+import threading
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+from docx import Document
+from docx.oxml.ns import nsdecls
+from docx.oxml import parse_xml
+from docx.shared import Pt, Inches
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.enum.style import WD_STYLE_TYPE
+
+from src.section_parser import ParsedDocument, parse_document
+from src.metrics import timed_stage
+from src.renderers import DEFAULT_FONT_NAME, DOCUMENT_TITLE
+# Deepest heading level listed in the table of contents
+TOC_MAX_LEVEL = 3
+# Left indentation per outline level, in twentieths of a point (0.25 inch)
+INDENT_TWIPS = 360
+# Word supports built-in heading styles 1-9
+MAX_HEADING_LEVEL = 9
+
+_template_cache = {}  # font name -> (template bytes, {style name: style id})
+_template_lock = threading.Lock()
+
+
+def define_styles(doc, default_font=DEFAULT_FONT_NAME):
+    """Define document styles"""
+    styles = doc.styles
+
+    # --- Define Custom Styles ---
+    # Style for the main title
+    try:
+        style = styles['CustomTitle']
+    except KeyError:
+        style = styles.add_style('CustomTitle', WD_STYLE_TYPE.PARAGRAPH)
+    style.base_style = styles['Normal']
+    font = style.font
+    font.name = default_font
+    font.size = Pt(24)
+    font.bold = True
+    style.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    style.paragraph_format.space_after = Pt(18)
+
+    # Style for the Table of Contents heading
+    try:
+        style = styles['TOC Heading']
+    except KeyError:
+        style = styles.add_style('TOC Heading', WD_STYLE_TYPE.PARAGRAPH)
+    style.base_style = styles['Heading 1'] # Base on Heading 1 for outline level
+    font = style.font
+    font.name = default_font
+    font.size = Pt(16)
+    font.bold = True
+    style.paragraph_format.space_after = Pt(12)
+    style.paragraph_format.keep_with_next = True
+
+    # Styles for the Table of Contents entries, indented per level
+    for level in range(1, MAX_HEADING_LEVEL + 1):
+        try:
+            style = styles[f'TOC {level}']
+        except KeyError:
+            style = styles.add_style(f'TOC {level}', WD_STYLE_TYPE.PARAGRAPH)
+        style.base_style = styles['Normal']
+        style.font.name = default_font
+        style.paragraph_format.left_indent = Inches(0.25 * (level - 1))
+        style.paragraph_format.space_after = Pt(2)
+
+    # Style for the timestamp
+    try:
+        style = styles['Timestamp']
+    except KeyError:
+        style = styles.add_style('Timestamp', WD_STYLE_TYPE.PARAGRAPH)
+    style.base_style = styles['Normal']
+    font = style.font
+    font.name = default_font
+    font.size = Pt(10)
+    font.italic = True
+    style.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+    style.paragraph_format.space_after = Pt(30)
+
+    # --- Customize Base Styles ---
+    # Normal Style
+    style = styles['Normal']
+    font = style.font
+    font.name = default_font
+    font.size = Pt(11)
+    style.paragraph_format.space_after = Pt(6)
+    style.paragraph_format.line_spacing = 1.15
+
+    # Ensure built-in heading styles use the default font
+    for i in range(1, MAX_HEADING_LEVEL + 1):
+        try:
+            style = styles[f'Heading {i}']
+            style.font.name = default_font
+            style.paragraph_format.space_before = Pt(12)
+            style.paragraph_format.space_after = Pt(6)
+        except KeyError:
+            continue # Ignore if style doesn't exist
+
+
+def _base_template(font_name):
+    """Return (template bytes, style ids) for the styled empty document, building it once"""
+    with _template_lock:
+        cached = _template_cache.get(font_name)
+        if cached is None:
+            doc = Document()
+            define_styles(doc, font_name)
+            style_ids = {style.name: style.style_id for style in doc.styles}
+            buffer = io.BytesIO()
+            doc.save(buffer)
+            cached = (buffer.getvalue(), style_ids)
+            _template_cache[font_name] = cached
+        return cached
+
+
+def _paragraph(style_id, text="", indent_twips=0, bookmark=None, anchor=None, page_break_before=False):
+    """Serialize a single w:p element"""
+    properties = f'<w:pStyle w:val="{style_id}"/>'
+    if page_break_before:
+        properties += '<w:pageBreakBefore/>'
+    if indent_twips:
+        properties += f'<w:ind w:left="{indent_twips}"/>'
+    run = f'<w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r>' if text else ''
+    if anchor:
+        run = f'<w:hyperlink w:anchor="{anchor}" w:history="1">{run}</w:hyperlink>'
+    if bookmark:
+        bookmark_id, name = bookmark
+        run = f'<w:bookmarkStart w:id="{bookmark_id}" w:name="{name}"/>{run}<w:bookmarkEnd w:id="{bookmark_id}"/>'
+    return f'<w:p><w:pPr>{properties}</w:pPr>{run}</w:p>'
+
+
+def render_docx(document, output_file, font_name=DEFAULT_FONT_NAME, title=DOCUMENT_TITLE, generated_at=None):
+    """
+    Render a ParsedDocument (or raw content) to a .docx file and return its path.
+
+    Layout: title page with timestamp, a table of contents built from the outline
+    (headings up to TOC_MAX_LEVEL, linked to bookmarks on the headings), then the
+    body with built-in heading styles and content indented one level below its heading.
+    """
+    if not isinstance(document, ParsedDocument):
+        document = parse_document(document)
+    generated_at = generated_at or datetime.now()
+    template, style_ids = _base_template(font_name)
+
+    def style_id(name):
+        return style_ids.get(name, 'Normal')
+
+    heading_style_ids = [style_id(f'Heading {level}') for level in range(1, MAX_HEADING_LEVEL + 1)]
+    toc_style_ids = [style_id(f'TOC {level}') for level in range(1, MAX_HEADING_LEVEL + 1)]
+    normal_id = style_id('Normal')
+
+    parts = [
+        _paragraph(style_id('CustomTitle'), title),
+        _paragraph(style_id('Timestamp'), f'Generated on: {generated_at.strftime("%Y-%m-%d %H:%M:%S")}'),
+        _paragraph(style_id('TOC Heading'), 'Table of Contents', page_break_before=True),
+    ]
+
+    # Table of contents from the outline
+    kinds, levels, texts = document.kinds, document.levels, document.texts
+    for i in document.heading_indices():
+        level = levels[i]
+        if level <= TOC_MAX_LEVEL:
+            parts.append(_paragraph(toc_style_ids[level - 1], texts[i], anchor=f"_Toc{i}"))
+
+    # Body
+    first_heading = True
+    for i, (kind, level, text) in enumerate(zip(kinds, levels, texts)):
+        if kind:
+            parts.append(_paragraph(
+                heading_style_ids[min(level, MAX_HEADING_LEVEL) - 1], text,
+                indent_twips=(level - 1) * INDENT_TWIPS,
+                bookmark=(i, f"_Toc{i}") if level <= TOC_MAX_LEVEL else None,
+                page_break_before=first_heading
+            ))
+            first_heading = False
+        else:
+            parts.append(_paragraph(normal_id, text, indent_twips=level * INDENT_TWIPS))
+
+    doc = Document(io.BytesIO(template))
+    body = doc.element.body
+    fragment = parse_xml(f'<w:body {nsdecls("w")}>{"".join(parts)}</w:body>')
+    # Insert before the trailing section properties
+    sect_pr = body.sectPr
+    for paragraph in list(fragment):
+        if sect_pr is not None:
+            sect_pr.addprevious(paragraph)
+        else:
+            body.append(paragraph)
+
+    with timed_stage("write"):
+        doc.save(output_file)
+    return output_file
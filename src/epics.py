@@ -0,0 +1,129 @@
+# src/epics.py
+"""
+Helpers for splitting user stories into epics and stitching per-epic
+generated sections back into a single document.
+"""
+import re
+
+# A story starts at its "Title:" line (see data/userstories/BLOOD-*.txt)
+STORY_START_PATTERN = re.compile(r'^\s*Title\s*:\s*(.+?)\s*$', re.IGNORECASE)
+# Optional explicit epic assignment inside a story
+EPIC_PATTERN = re.compile(r'^\s*Epic(?:\s+Name)?\s*:\s*(.+?)\s*$', re.IGNORECASE)
+# Numbered heading, e.g. "1. Patient Search", "1.6.1.4 Validation/Processing"
+NUMBERED_LINE_PATTERN = re.compile(r'^(\s*)(\d+)((?:\.\d+)*)(\.?)(\s+.*)?$')
+CODE_FENCE_PATTERN = re.compile(r'^\s*```.*$')
+
+
+class Epic:
+    """A named group of user stories that becomes one top-level document section."""
+
+    def __init__(self, name):
+        self.name = name
+        self.stories = []
+
+    @property
+    def text(self):
+        return "\n\n".join(self.stories)
+
+    def __repr__(self):
+        return f"Epic(name={self.name!r}, stories={len(self.stories)})"
+
+
+def split_stories(user_stories):
+    """
+    Split the loaded user story texts into individual stories.
+
+    Each item of `user_stories` may hold a single story or several concatenated
+    stories (as with an uploaded combined file); stories are delimited by their
+    "Title:" line. Text before the first title is kept as its own story.
+    """
+    stories = []
+    for text in user_stories:
+        current = []
+        for line in text.splitlines():
+            if STORY_START_PATTERN.match(line) and any(l.strip() for l in current):
+                stories.append("\n".join(current).strip())
+                current = []
+            current.append(line)
+        if any(l.strip() for l in current):
+            stories.append("\n".join(current).strip())
+    return stories
+
+
+def story_epic_name(story):
+    """Return the epic a story belongs to: its "Epic:" line if present, otherwise its title."""
+    title = None
+    for line in story.splitlines():
+        epic_match = EPIC_PATTERN.match(line)
+        if epic_match:
+            return epic_match.group(1)
+        if title is None:
+            title_match = STORY_START_PATTERN.match(line)
+            if title_match:
+                title = title_match.group(1)
+    if title:
+        return title
+    # Fall back to the first non-empty line
+    return next((line.strip() for line in story.splitlines() if line.strip()), "Untitled")
+
+
+def split_stories_by_epic(user_stories):
+    """Group the user stories by epic, preserving the order in which epics first appear."""
+    epics = {}
+    for story in split_stories(user_stories):
+        name = story_epic_name(story)
+        key = name.lower()
+        if key not in epics:
+            epics[key] = Epic(name)
+        epics[key].stories.append(story)
+    return list(epics.values())
+
+
+def extract_top_level_section(content):
+    """
+    Return the part of a per-epic response starting at its first top-level
+    heading ("1. [Screen Name]"), dropping any preamble, summary or code fences.
+    """
+    lines = [line for line in content.splitlines() if not CODE_FENCE_PATTERN.match(line)]
+    for i, line in enumerate(lines):
+        match = NUMBERED_LINE_PATTERN.match(line)
+        if match and not match.group(3) and match.group(5) and match.group(5).strip():
+            return "\n".join(lines[i:]).strip()
+    return "\n".join(lines).strip()
+
+
+def renumber_section(section_text, number):
+    """
+    Renumber a single top-level section so it becomes section `number`.
+
+    The first top-level heading and every nested heading carrying the same
+    top-level number (e.g. "1.6.1.4") are rewritten; plain numbered list items
+    inside the content ("2. Provider selects a test") are left untouched.
+    """
+    lines = section_text.splitlines()
+    original = None
+    renumbered = []
+    for line in lines:
+        match = NUMBERED_LINE_PATTERN.match(line)
+        if match:
+            indent, top, rest, dot, tail = match.groups()
+            if original is None and not rest:
+                original = top
+                line = f"{indent}{number}{rest}{dot}{tail or ''}"
+            elif original is not None and rest and top == original:
+                line = f"{indent}{number}{rest}{dot}{tail or ''}"
+        renumbered.append(line)
+    return "\n".join(renumbered)
+
+
+def stitch_sections(sections, preamble=None):
+    """
+    Renumber the per-epic sections 1..N in order and join them into one document
+    that parse_sections can consume unchanged.
+    """
+    parts = []
+    if preamble and preamble.strip():
+        parts.append(preamble.strip())
+    for number, section in enumerate(sections, start=1):
+        parts.append(renumber_section(extract_top_level_section(section), number))
+    return "\n\n".join(parts) + "\n"
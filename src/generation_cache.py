@@ -0,0 +1,234 @@
+# src/generation_cache.py
+import os
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Defaults can be overridden through environment variables (see get_generation_cache)
+DEFAULT_MAX_MEMORY_ENTRIES = 32
+DEFAULT_MAX_DISK_BYTES = 256 * 1024 * 1024  # 256 MB
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60  # One week
+# Epic sections are small and shared between documents, so more of them are kept in memory
+DEFAULT_SECTION_CACHE_MAX_MEMORY_ENTRIES = 256
+# Same output directory the generator writes to (project root / output)
+DEFAULT_OUTPUT_PATH = Path(__file__).parent.parent / "output"
+
+
+class GenerationCache:
+    """
+    Content-addressed cache for generated document content.
+
+    Entries live in an in-memory LRU tier and are written through to an on-disk
+    tier (one file per key) so they survive restarts. Both tiers expire entries
+    after `ttl_seconds`; the memory tier is bounded by entry count and the disk
+    tier by total size, evicting the least recently used entries first.
+    """
+
+    def __init__(self, cache_dir, max_memory_entries=DEFAULT_MAX_MEMORY_ENTRIES,
+                 max_disk_bytes=DEFAULT_MAX_DISK_BYTES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._memory = OrderedDict()  # key -> (stored_at, content)
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+
+    @staticmethod
+    def make_key(*parts):
+        """Build a cache key from the given parts (length-prefixed so boundaries are unambiguous)."""
+        digest = hashlib.sha256()
+        for part in parts:
+            data = (part if part is not None else "").encode("utf-8")
+            digest.update(str(len(data)).encode("ascii") + b":")
+            digest.update(data)
+        return digest.hexdigest()
+
+    def _disk_path(self, key):
+        return self.cache_dir / f"{key}.txt"
+
+    def _is_expired(self, stored_at):
+        return self.ttl_seconds is not None and (time.time() - stored_at) > self.ttl_seconds
+
+    def get(self, key):
+        """Return cached content for `key`, or None on a miss."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, content = entry
+                if not self._is_expired(stored_at):
+                    self._memory.move_to_end(key)
+                    self._stats["hits"] += 1
+                    self._stats["memory_hits"] += 1
+                    return content
+                # Expired in memory; the disk copy has the same age
+                del self._memory[key]
+                self._remove_disk_entry(key)
+                self._stats["expired"] += 1
+
+            path = self._disk_path(key)
+            try:
+                stored_at = path.stat().st_mtime
+                if self._is_expired(stored_at):
+                    self._remove_disk_entry(key)
+                    self._stats["expired"] += 1
+                    self._stats["misses"] += 1
+                    return None
+                content = path.read_text(encoding="utf-8")
+                # Record the access explicitly (atime is unreliable on noatime mounts);
+                # mtime keeps the storage time used for TTL
+                os.utime(path, (time.time(), stored_at))
+            except FileNotFoundError:
+                self._stats["misses"] += 1
+                return None
+            except OSError as e:
+                logger.warning(f"Could not read generation cache entry {path}: {e}")
+                self._stats["misses"] += 1
+                return None
+
+            # Promote to the memory tier; keep the original storage time for TTL purposes
+            self._remember(key, stored_at, content)
+            self._stats["hits"] += 1
+            self._stats["disk_hits"] += 1
+            return content
+
+    def set(self, key, content):
+        """Store `content` under `key` in both tiers."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, content)
+            path = self._disk_path(key)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            try:
+                tmp_path.write_text(content, encoding="utf-8")
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Could not write generation cache entry {path}: {e}")
+                tmp_path.unlink(missing_ok=True)
+                return
+            self._stats["stores"] += 1
+            self._enforce_disk_limit()
+
+    def clear(self):
+        """Remove every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            for path in self.cache_dir.glob("*.txt"):
+                path.unlink(missing_ok=True)
+
+    def stats(self):
+        """Return hit/miss counters and current tier sizes."""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            disk_entries = list(self.cache_dir.glob("*.txt"))
+            return {
+                **self._stats,
+                "hit_ratio": (self._stats["hits"] / lookups) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": len(disk_entries),
+                "disk_bytes": sum(p.stat().st_size for p in disk_entries if p.exists()),
+            }
+
+    # --- Internal helpers (caller must hold self._lock) ---
+
+    def _remember(self, key, stored_at, content):
+        self._memory[key] = (stored_at, content)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _remove_disk_entry(self, key):
+        self._disk_path(key).unlink(missing_ok=True)
+
+    def _enforce_disk_limit(self):
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob("*.txt"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            if self._is_expired(st.st_mtime):
+                path.unlink(missing_ok=True)
+                self._stats["expired"] += 1
+                continue
+            entries.append((st.st_atime, st.st_size, path))
+            total += st.st_size
+
+        if total <= self.max_disk_bytes:
+            return
+
+        # Oldest access first
+        entries.sort(key=lambda item: item[0])
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            self._memory.pop(path.stem, None)
+            total -= size
+            self._stats["evictions"] += 1
+
+
+_generation_cache = None
+_generation_cache_lock = threading.Lock()
+
+
+def get_generation_cache(output_path=None):
+    """
+    Return the process-wide generation cache (stored under `<output_path>/cache`),
+    or None if caching is disabled via GENERATION_CACHE_ENABLED=false.
+    """
+    global _generation_cache
+    if os.getenv("GENERATION_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    with _generation_cache_lock:
+        if _generation_cache is None:
+            _generation_cache = GenerationCache(
+                cache_dir=Path(output_path or DEFAULT_OUTPUT_PATH) / "cache",
+                max_memory_entries=int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", DEFAULT_MAX_MEMORY_ENTRIES)),
+                max_disk_bytes=int(os.getenv("GENERATION_CACHE_MAX_DISK_MB", DEFAULT_MAX_DISK_BYTES // (1024 * 1024))) * 1024 * 1024,
+                ttl_seconds=int(os.getenv("GENERATION_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+            )
+        return _generation_cache
+
+
+_section_cache = None
+_section_cache_lock = threading.Lock()
+
+
+def get_section_cache(output_path=None):
+    """
+    Return the process-wide cache of generated epic sections (stored under
+    `<output_path>/cache/sections`), or None if disabled via
+    SECTION_CACHE_ENABLED=false. Entries are keyed by everything a section
+    depends on (see GxPDocumentGenerator.epic_input_hash), so any document
+    containing the same epic reuses them. Disk size and TTL follow the
+    GENERATION_CACHE_* settings.
+    """
+    global _section_cache
+    if os.getenv("SECTION_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    with _section_cache_lock:
+        if _section_cache is None:
+            _section_cache = GenerationCache(
+                cache_dir=Path(output_path or DEFAULT_OUTPUT_PATH) / "cache" / "sections",
+                max_memory_entries=int(os.getenv("SECTION_CACHE_MAX_ENTRIES", DEFAULT_SECTION_CACHE_MAX_MEMORY_ENTRIES)),
+                max_disk_bytes=int(os.getenv("GENERATION_CACHE_MAX_DISK_MB", DEFAULT_MAX_DISK_BYTES // (1024 * 1024))) * 1024 * 1024,
+                ttl_seconds=int(os.getenv("GENERATION_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+            )
+        return _section_cache
@@ -2,15 +2,17 @@ import os
 import json
 from pathlib import Path
 from dotenv import load_dotenv
-from docx import Document
-from docx.shared import Inches, Pt
+from docx.shared import Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.style import WD_STYLE_TYPE
-from docx.enum.text import WD_COLOR_INDEX
 import re
 from datetime import datetime
 import google.generativeai as genai
 
+from src.section_parser import parse_document, parse_sections
+from src.docx_renderer import render_docx
+from src.prompt_compaction import compact_user_stories, dedupe_instructions, minify_ddl
+
 class GxPDocumentGenerator:
     def __init__(self):
         # Load environment variables
@@ -50,22 +52,15 @@ class GxPDocumentGenerator:
     def generate_gxp_content(self, system_prompt, user_stories, db_design):
         """Generate GxP documentation content using Gemini API"""
         try:
-            # Prepare the prompt
-            prompt = f"""
-            Based on the following inputs, generate a GxP Function Detail Design Document. Structure the content with clear headings and subheadings, following a hierarchical numbering system (e.g., 1., 1.1, 1.1.1, etc.). Ensure each section is properly delineated and the content is well-organized.
-            
-            User Stories:
-            {'-' * 80}
-            {chr(10).join(user_stories)}
-            {'-' * 80}
-
-            Database Design:
-            {'-' * 80}
-            {db_design}
-            {'-' * 80}
-            
-            {system_prompt}
-            """
+            # Prepare the prompt (compacted inputs, see src/prompt_compaction.py)
+            prompt = (
+                "Based on the following inputs, generate a GxP Function Detail Design Document. Structure the content with clear headings and subheadings, following a hierarchical numbering system (e.g., 1., 1.1, 1.1.1, etc.). Ensure each section is properly delineated and the content is well-organized.\n\n"
+                f"User Stories:\n{compact_user_stories(chr(10).join(user_stories))}\n\n"
+                f"Database Design:\n{minify_ddl(db_design)}\n"
+            )
+            # The system prompt is already the first turn of the chat history below,
+            # so it is not repeated in the message
+            system_prompt = dedupe_instructions(system_prompt)
 
             # Initialize chat with system prompt
             chat = self.model.start_chat(history=[
@@ -104,102 +99,14 @@ class GxPDocumentGenerator:
 
     def parse_sections(self, content):
         """Parse content into sections with proper hierarchy and indentation"""
-        sections = []
-        lines = content.split('\n')
-        current_section = None
-        section_stack = []  # Keep track of parent sections
-        
-        for line in lines:
-            line = line.rstrip()  # Remove trailing whitespace but keep indentation
-            if not line:
-                continue
-                
-            # Check if line is a heading (starts with numbers)
-            heading_match = re.match(r'^(\d+(\.\d+)*)\.\s+(.+)$', line)
-            if heading_match:
-                # Calculate heading level based on number of dots
-                heading_number = heading_match.group(1)
-                dots_count = heading_number.count('.')
-                level = dots_count + 1
-                
-                # Create section object
-                current_section = {
-                    'type': 'heading',
-                    'level': level,
-                    'text': line.strip(),
-                    'number': heading_number,
-                    'dots_count': dots_count
-                }
-                
-                # Update section stack
-                while section_stack and section_stack[-1]['level'] >= level:
-                    section_stack.pop()
-                if section_stack:
-                    current_section['parent_section'] = section_stack[-1]
-                section_stack.append(current_section)
-                sections.append(current_section)
-            else:
-                # For content lines
-                if current_section:
-                    content_section = {
-                        'type': 'content',
-                        'level': current_section['level'],
-                        'text': line.strip(),
-                        'parent_section': current_section,
-                        'dots_count': current_section['dots_count']
-                    }
-                    sections.append(content_section)
-        
-        return sections
+        return parse_sections(content)
 
     def create_word_document(self, content):
         """Create a Word document with the generated content"""
-        doc = Document()
-        
-        # Define styles first
-        self.define_styles(doc)
-        
-        # Add title page
-        title = doc.add_paragraph('GxP Function Detail Design Document', style='Title')
-        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Add timestamp on title page
-        timestamp = doc.add_paragraph(f'Generated on: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}', style='Timestamp')
-        timestamp.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        
-        # Add page break after title page
-        doc.add_page_break()
-        
-        # Add table of contents placeholder
-        doc.add_paragraph('Table of Contents', style='TOC Heading')
-        doc.add_paragraph('', style='Normal')  # Placeholder for TOC
-        doc.add_page_break()
-        
-        # Process content
-        sections = self.parse_sections(content)
-        
-        # Add sections to document
-        for section in sections:
-            # Calculate indentation (40 points = approximately 4 spaces)
-            indent_points = Pt(section['indent_level'] * 40)
-            
-            if section['type'] == 'heading':
-                # For headings, use the built-in heading style
-                heading = doc.add_heading(section['text'], level=section['level'])
-                heading.paragraph_format.left_indent = indent_points
-                heading.paragraph_format.space_after = Pt(12)
-            else:
-                # For content, use normal style with proper indentation
-                para = doc.add_paragraph(section['text'], style='Normal')
-                para.paragraph_format.left_indent = indent_points
-                para.paragraph_format.space_after = Pt(6)
-                para.paragraph_format.space_before = Pt(6)
-        
-        # Save the document
+        # Title page, table of contents and body are rendered from the parsed outline
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_file = self.output_path / f'GxP_Documentation_{timestamp}.docx'
-        doc.save(output_file)
-        return output_file
+        return render_docx(parse_document(content), output_file)
 
     def create_txt_document(self, content):
         """Create a TXT document with the generated content"""
@@ -222,36 +129,41 @@ class GxPDocumentGenerator:
         
         # Add sections with proper indentation
         for section in sections:
+            # Content lines before the first heading are not part of any section
+            if section.type == 'content' and section.parent < 0:
+                continue
+
             # Calculate base indentation based on dots in section number
-            if section['type'] == 'heading':
+            if section.type == 'heading':
                 # Add blank line between sections of same or lower level
-                if last_section and last_section['type'] == 'heading':
-                    if section['level'] <= last_section['level']:
+                if last_section and last_section.type == 'heading':
+                    if section.level <= last_section.level:
                         output_lines.append('')
                 
                 # Calculate indentation for headings
-                if section['dots_count'] == 0:  # Top level (1., 2., etc)
+                if section.dots_count == 0:  # Top level (1., 2., etc)
                     indent = ''
                 else:
                     # Each dot means one more level of indentation
-                    indent = '    ' * section['dots_count']
+                    indent = '    ' * section.dots_count
                 
-                output_lines.append(f"{indent}{section['text']}")
+                output_lines.append(f"{indent}{section.text}")
                 
             else:  # Content
                 # Content is always indented one more level than its parent heading
-                if section['parent_section']:
-                    parent_dots = section['parent_section']['dots_count']
+                parent_section = sections[section.parent] if section.parent >= 0 else None
+                if parent_section:
+                    parent_dots = parent_section.dots_count
                     
                     # Special handling for Validation/Processing sections
-                    if 'Validation/Processing' in section['parent_section']['text']:
+                    if 'Validation/Processing' in parent_section.text:
                         indent = '    ' * (parent_dots + 2)
                     else:
                         indent = '    ' * (parent_dots + 1)
                 else:
                     indent = '    '  # Default indentation for content
                 
-                output_lines.append(f"{indent}{section['text']}")
+                output_lines.append(f"{indent}{section.text}")
             
             last_section = section
         
@@ -3,31 +3,111 @@ import os
 import json
 from pathlib import Path
 from dotenv import load_dotenv
-from docx import Document
-from docx.shared import Inches, Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.enum.style import WD_STYLE_TYPE
-from docx.enum.text import WD_COLOR_INDEX
-import re
+import threading
+import uuid
+import zipfile
 from datetime import datetime
-import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor
+
+from src.generation_cache import GenerationCache, get_generation_cache, get_section_cache
+from src.similarity_index import get_similarity_index
+from src.epics import split_stories_by_epic, stitch_sections, extract_top_level_section, renumber_section
+from src.incremental import SectionManifestStore, DEFAULT_DOCUMENT_KEY
+from src.schema_graph import parse_schema
+from src.llm_backends import create_backend
+from src.llm_client import get_llm_client, LLMUnavailableError, LLMDeadlineExceededError
+from src.section_parser import parse_document
+from src.cpu_pool import get_cpu_pool
+from src.structure_validator import validate_section, split_top_level_sections
+from src.metrics import GenerationTimings, use_timings, timed_stage, run_in_context, SECTION_REPAIRS
+from src.renderers import (
+    OUTPUT_FORMATS, OUTPUT_FORMAT_TXT, OUTPUT_FORMAT_DOCX,
+    get_renderer, render_formats, format_txt_lines
+)
+from src.prompt_compaction import (
+    compact_user_stories, dedupe_instructions, minify_ddl, estimate_tokens, PromptBudgetExceededError
+)
+
+# Gemini model used for generation
+MODEL_NAME = "gemini-1.5-flash"
+# Bump whenever the prompt wording in generate_gxp_content changes so cached
+# generations produced from the old template are not reused
+PROMPT_TEMPLATE_VERSION = "1"
+
+# Generation modes: one prompt for the whole document, or one concurrent prompt per epic
+GENERATION_MODE_SINGLE = "single"
+GENERATION_MODE_FANOUT = "fanout"
+# Per-epic generation that reuses the sections of the previous run whose inputs are unchanged
+GENERATION_MODE_INCREMENTAL = "incremental"
+GENERATION_MODES = (GENERATION_MODE_SINGLE, GENERATION_MODE_FANOUT, GENERATION_MODE_INCREMENTAL)
+# Upper bound on concurrent Gemini calls issued by a single fan-out generation
+DEFAULT_FANOUT_MAX_CONCURRENCY = 4
+
+# Upper bound on the size of a single prompt, in tokens (0 disables the check)
+DEFAULT_PROMPT_TOKEN_BUDGET = 100_000
+
+# Suffixes of documents that are already compressed (not deflated again in a bundle)
+COMPRESSED_SUFFIXES = (".docx", ".zip")
+
+
+def parse_output_formats(output_format):
+    """
+    Normalize an output format selection: a format name, a comma separated list
+    ("txt,docx") or a list of names. Returns the distinct formats in order and
+    raises ValueError for an unknown or empty selection.
+    """
+    if isinstance(output_format, str):
+        output_format = output_format.split(',')
+    formats = []
+    for name in output_format or ():
+        name = name.strip().lower()
+        if name and name not in formats:
+            formats.append(name)
+    unknown = [name for name in formats if name not in OUTPUT_FORMATS]
+    if unknown or not formats:
+        raise ValueError(
+            f"Unknown output format '{','.join(unknown)}'. Expected one or more of: {', '.join(OUTPUT_FORMATS)}."
+        )
+    return formats
+
+DOCUMENT_INSTRUCTIONS = "Based on the following inputs, generate a GxP Function Detail Design Document. Structure the content with clear headings and subheadings, following a hierarchical numbering system (e.g., 1., 1.1, 1.1.1, etc.). Ensure each section is properly delineated and the content is well-organized. Output should be PLAIN TEXT suitable for a .txt file, using indentation for structure."
+
+EPIC_SECTION_INSTRUCTIONS = "Based on the following inputs, generate exactly ONE top-level section of a GxP Function Detail Design Document, covering only the single epic described by the user stories below. Number it as section 1 (\"1. [Screen Name]\") with subsections 1.1, 1.2, 1.3.1, 1.6.1.4.1, etc., following the structure in the instructions. Do NOT include a Document Summary or any other top-level section. Output should be PLAIN TEXT suitable for a .txt file, using indentation for structure."
+
+DELTA_INSTRUCTIONS = "The text under \"Previous Version\" was generated from user stories nearly identical to the ones below. Revise it so that it matches the user stories below: keep the structure, numbering and wording of everything that still applies and change only what the differences in the user stories require. Return the complete revised text, not only the changes."
+
+REPAIR_INSTRUCTIONS = "The section below, section {number} of a GxP Function Detail Design Document, does not follow the required structure:\n{issues}\n\nRewrite exactly this ONE top-level section, numbered {number} (\"{number}. [Screen Name]\"), so that it follows the structure in the instructions: fix the problems listed, keep the content that is correct and fill any missing subsection from the user stories below. Do NOT include a Document Summary or any other top-level section. Output should be PLAIN TEXT suitable for a .txt file, using indentation for structure.\n\nSection:\n{section}"
+
+DOCUMENT_SUMMARY_INSTRUCTIONS = "Based on the following epics and user story titles, write ONLY the \"Document Summary\" part of a GxP Function Detail Design Document: the line \"Document Summary\" followed by a generic description of the application or functionality, indented 4 spaces. Do not write any numbered sections. Use plain text only, no markdown."
 
 class GxPDocumentGenerator:
-    def __init__(self, user_stories_path=None, db_schema_path=None): # Accept paths
+    """
+    Generates GxP documents with Gemini.
+
+    One instance is meant to live for the whole process (the API creates it at
+    startup) and be shared by concurrent requests: the Gemini client is configured
+    once and everything specific to a request (input paths, mode, callbacks) is
+    passed as method arguments.
+    """
+
+    def __init__(self, backend=None):
+        """
+        `backend` is the LLM backend to generate with (see src/llm_backends.py);
+        by default it is created from the LLM_BACKEND environment variable, which
+        selects the real Gemini API unless set to "replay" or "record".
+        """
         # Load environment variables
         load_dotenv()
 
-        # Configure Gemini API
-        api_key = os.getenv('GOOGLE_API_KEY')
-        if not api_key:
-            raise ValueError("Missing GOOGLE_API_KEY environment variable.")
-        genai.configure(api_key=api_key)
-
         # Consider making the model configurable or handling potential errors
         try:
             # Use a known, stable model. Ensure it's available.
             # Check Gemini documentation for current model names.
-            self.model = genai.GenerativeModel("gemini-1.5-flash")
+            self.model_name = MODEL_NAME
+            # The Gemini backend configures the API key and fails if it is missing
+            self.model = backend if backend is not None else create_backend(self.model_name)
+            # Process-wide rate limits, retries and circuit breaker for this model
+            self.llm = get_llm_client(self.model, f"{self.model.name}:{self.model_name}")
         except Exception as e:
             print(f"Error initializing Gemini model: {e}")
             # Handle error appropriately, maybe raise it or set self.model to None
@@ -43,12 +123,34 @@ class GxPDocumentGenerator:
         self.prompt_path.mkdir(parents=True, exist_ok=True) # Ensure prompt dir exists
         self.default_font_name = "Arial"
 
-        # Store provided input file paths as Path objects
-        self.user_stories_path = Path(user_stories_path) if user_stories_path else None
-        self.db_schema_path = Path(db_schema_path) if db_schema_path else None
+        # Shared content-addressed cache of generated content (None if disabled)
+        self.generation_cache = get_generation_cache(self.output_path)
+        # Generated epic sections, shared by every document containing the same epic (None if disabled)
+        self.section_cache = get_section_cache(self.output_path)
+        # Previous generations for near-duplicate inputs, reused or revised (None if disabled)
+        self.similarity_index = get_similarity_index(self.output_path)
+        # Per-document record of which section came from which epic (incremental mode)
+        self.section_manifests = SectionManifestStore(self.output_path / 'manifests')
+
+        # Prompt compaction (minified DDL, compact stories and instructions) and the
+        # per-request token budget; PROMPT_TOKEN_COUNT=api counts with the Gemini API
+        # instead of estimating locally
+        self.prompt_compaction = os.getenv("PROMPT_COMPACTION_ENABLED", "true").lower() not in ("0", "false", "no")
+        self.prompt_token_budget = int(os.getenv("PROMPT_TOKEN_BUDGET", DEFAULT_PROMPT_TOKEN_BUDGET))
+        self.exact_token_count = os.getenv("PROMPT_TOKEN_COUNT", "estimate").lower() == "api"
+        # Include only the schema tables a prompt's user stories need
+        self.schema_pruning = os.getenv("SCHEMA_PRUNING_ENABLED", "true").lower() not in ("0", "false", "no")
+        # Re-prompt for the sections that break the required outline (see src/structure_validator.py)
+        self.structure_repair = os.getenv("STRUCTURE_REPAIR_ENABLED", "true").lower() not in ("0", "false", "no")
+        self._prompt_stats = {"prompts": 0, "original_tokens": 0, "prompt_tokens": 0, "saved_tokens": 0}
+        self._prompt_stats_lock = threading.Lock()
+
+        # System prompt kept in memory, reloaded only when the file's mtime changes
+        self._system_prompt_cache = None # (path, mtime_ns, text)
+        self._system_prompt_lock = threading.Lock()
 
     def load_system_prompt(self):
-        """Load the system prompt template"""
+        """Load the system prompt template (cached in memory until the file changes)"""
         # Construct path relative to base path
         prompt_file = self.prompt_path / 'system.txt'
         if not prompt_file.exists():
@@ -58,59 +160,79 @@ class GxPDocumentGenerator:
                 raise FileNotFoundError(f"Error: System prompt file not found at expected locations relative to project root or script location.")
 
         try:
-            print(prompt_file)
-            with open(prompt_file, 'r', encoding='utf-8') as f: # Specify encoding
-                return f.read()
+            mtime_ns = prompt_file.stat().st_mtime_ns
+            with self._system_prompt_lock:
+                cached = self._system_prompt_cache
+                if cached and cached[0] == prompt_file and cached[1] == mtime_ns:
+                    return cached[2]
+                print(f"Loading system prompt from {prompt_file}")
+                with open(prompt_file, 'r', encoding='utf-8') as f: # Specify encoding
+                    system_prompt = f.read()
+                self._system_prompt_cache = (prompt_file, mtime_ns, system_prompt)
+                return system_prompt
         except Exception as e:
             print(f"Error reading system prompt file {prompt_file}: {e}")
             raise # Re-raise the exception after logging
 
 
-    def load_user_stories(self):
-        """Load user stories content from the provided file path."""
-        if not self.user_stories_path:
+    def load_user_stories(self, user_stories_path):
+        """
+        Load user stories content from the given file path (or list of file paths).
+        Returns a list with the content of each file.
+        """
+        if not user_stories_path:
              raise ValueError("User stories file path was not provided to the generator.")
-        if not self.user_stories_path.exists():
-            raise FileNotFoundError(f"User stories file not found at the provided path: {self.user_stories_path}")
-        try:
-            with open(self.user_stories_path, 'r', encoding='utf-8') as f: # Specify encoding
-                 # Return as a list containing one item (the whole file content)
-                 # to match the expected format in generate_gxp_content
-                return [f.read()]
-        except Exception as e:
-            print(f"Error reading user stories file {self.user_stories_path}: {e}")
-            raise
+        paths = user_stories_path if isinstance(user_stories_path, (list, tuple)) else [user_stories_path]
+        stories = []
+        for path in map(Path, paths):
+            if not path.exists():
+                raise FileNotFoundError(f"User stories file not found at the provided path: {path}")
+            try:
+                with open(path, 'r', encoding='utf-8') as f: # Specify encoding
+                    stories.append(f.read())
+            except Exception as e:
+                print(f"Error reading user stories file {path}: {e}")
+                raise
+        return stories
 
 
-    def load_database_design(self):
-        """Load database design content from the provided file path."""
-        if not self.db_schema_path:
+    def load_database_design(self, db_schema_path):
+        """Load database design content from the given file path."""
+        if not db_schema_path:
             raise ValueError("Database schema file path was not provided to the generator.")
-        if not self.db_schema_path.exists():
-            raise FileNotFoundError(f"Database schema file not found at the provided path: {self.db_schema_path}")
+        db_schema_path = Path(db_schema_path)
+        if not db_schema_path.exists():
+            raise FileNotFoundError(f"Database schema file not found at the provided path: {db_schema_path}")
         try:
-            with open(self.db_schema_path, 'r', encoding='utf-8') as f: # Specify encoding
+            with open(db_schema_path, 'r', encoding='utf-8') as f: # Specify encoding
                 return f.read()
         except Exception as e:
-            print(f"Error reading database schema file {self.db_schema_path}: {e}")
+            print(f"Error reading database schema file {db_schema_path}: {e}")
             raise
 
-    def generate_gxp_content(self, system_prompt, user_stories, db_design):
-        """Generate GxP documentation content using Gemini API"""
-        if not self.model:
-             raise RuntimeError("Gemini model was not initialized successfully.")
-        try:
-            # Ensure user_stories is joined correctly if it's a list
-            user_stories_text = "\n".join(user_stories) # Use newline as separator
-
-            # Ensure inputs are not excessively large - add checks if needed
-            # Example check (adjust limits as needed):
-            # MAX_INPUT_LENGTH = 100000 # Example character limit
-            # if len(user_stories_text) > MAX_INPUT_LENGTH or len(db_design) > MAX_INPUT_LENGTH:
-            #     raise ValueError("Input data exceeds maximum allowed length.")
-
-            prompt = f"""
-            Based on the following inputs, generate a GxP Function Detail Design Document. Structure the content with clear headings and subheadings, following a hierarchical numbering system (e.g., 1., 1.1, 1.1.1, etc.). Ensure each section is properly delineated and the content is well-organized. Output should be PLAIN TEXT suitable for a .txt file, using indentation for structure.
+    @property
+    def prompt_version(self):
+        """Prompt template identifier used in cache keys (compact/pruned prompts differ from verbose ones)"""
+        version = PROMPT_TEMPLATE_VERSION
+        if self.prompt_compaction:
+            version += "-compact"
+        if self.schema_pruning:
+            version += "-pruned"
+        return version
+
+    def relevant_schema(self, user_stories_text, db_design):
+        """
+        The part of the schema a prompt for `user_stories_text` needs: the tables the
+        stories mention plus their foreign-key neighbours (the whole schema if schema
+        pruning is disabled, no tables could be parsed or none is mentioned).
+        """
+        if not self.schema_pruning:
+            return db_design
+        return parse_schema(db_design).prune(user_stories_text)[0]
+
+    def _verbose_prompt(self, system_prompt, user_stories_text, db_design, instructions):
+        return f"""
+            {instructions}
 
             User Stories:
             {'-' * 80}
@@ -128,6 +250,157 @@ class GxPDocumentGenerator:
             {'-' * 80}
             """
 
+    def build_prompt(self, system_prompt, user_stories_text, db_design, instructions=DOCUMENT_INSTRUCTIONS):
+        """Build the generation prompt from the inputs and the system instructions"""
+        with timed_stage("prompt_build"):
+            schema = db_design
+            if self.schema_pruning:
+                graph = parse_schema(db_design)
+                schema, table_names = graph.prune(user_stories_text)
+                if len(table_names) < len(graph):
+                    print(f"Schema pruned to {len(table_names)} of {len(graph)} tables for this prompt: {', '.join(table_names)}.")
+
+            if not self.prompt_compaction:
+                return self.check_prompt_budget(self._verbose_prompt(system_prompt, user_stories_text, schema, instructions))
+
+            prompt = (
+                f"{instructions}\n\n"
+                f"User Stories:\n{compact_user_stories(user_stories_text)}\n\n"
+                f"Database Design:\n{minify_ddl(schema)}\n\n"
+                f"System Requirements/Instructions:\n{dedupe_instructions(system_prompt)}\n"
+            )
+            # Savings are reported against the verbose prompt with the whole schema
+            self._record_prompt_compaction(
+                self._verbose_prompt(system_prompt, user_stories_text, db_design, instructions), prompt
+            )
+            return self.check_prompt_budget(prompt)
+
+    def build_delta_prompt(self, system_prompt, user_stories_text, db_design, previous, instructions=DOCUMENT_INSTRUCTIONS):
+        """Prompt revising `previous`, generated for near-identical inputs, to match these inputs"""
+        return self.build_prompt(
+            system_prompt, user_stories_text, db_design,
+            instructions=f"{instructions}\n\n{DELTA_INSTRUCTIONS}\n\nPrevious Version:\n{previous}"
+        )
+
+    def similarity_scope(self, system_prompt, kind):
+        """Near-duplicates are only looked up among generations of the same kind, prompt and model"""
+        return GenerationCache.make_key(system_prompt, self.model_name, self.prompt_version, kind)
+
+    def find_near_duplicate(self, scope, user_stories_text, schema, description):
+        """
+        A previous generation for inputs similar to these (see src/similarity_index.py),
+        or None if there is none or the index is disabled.
+        """
+        if self.similarity_index is None:
+            return None
+        match = self.similarity_index.find(scope, user_stories_text, schema)
+        if match is not None:
+            action = "reusing it" if match.reuse else "revising it with a delta prompt"
+            print(f"Near-duplicate of {description} found (similarity {match.similarity:.3f}), {action}.")
+        return match
+
+    def _seeded_prompt(self, match, system_prompt, user_stories_text, db_design, instructions=DOCUMENT_INSTRUCTIONS):
+        """The delta prompt for a near-duplicate `match` if there is one that fits the budget, else the full prompt"""
+        if match is not None:
+            try:
+                return self.build_delta_prompt(system_prompt, user_stories_text, db_design, match.content, instructions)
+            except PromptBudgetExceededError:
+                print("Delta prompt exceeds the token budget, generating from scratch.")
+        return self.build_prompt(system_prompt, user_stories_text, db_design, instructions=instructions)
+
+    def _record_prompt_compaction(self, verbose_prompt, prompt):
+        """Log and accumulate the (estimated) tokens saved by compacting one prompt"""
+        original_tokens = estimate_tokens(verbose_prompt)
+        prompt_tokens = estimate_tokens(prompt)
+        saved_tokens = original_tokens - prompt_tokens
+        print(f"Prompt compacted from ~{original_tokens} to ~{prompt_tokens} tokens "
+              f"(saved ~{saved_tokens}, {100 * saved_tokens / max(original_tokens, 1):.0f}%).")
+        with self._prompt_stats_lock:
+            self._prompt_stats["prompts"] += 1
+            self._prompt_stats["original_tokens"] += original_tokens
+            self._prompt_stats["prompt_tokens"] += prompt_tokens
+            self._prompt_stats["saved_tokens"] += saved_tokens
+
+    def prompt_stats(self):
+        """Totals of the prompt compaction report since startup"""
+        with self._prompt_stats_lock:
+            stats = dict(self._prompt_stats)
+        stats["saved_percent"] = round(100 * stats["saved_tokens"] / max(stats["original_tokens"], 1), 1)
+        stats.update({
+            "compaction_enabled": self.prompt_compaction,
+            "schema_pruning_enabled": self.schema_pruning,
+            "token_budget": self.prompt_token_budget,
+            "token_count": "api" if self.exact_token_count else "estimate",
+        })
+        return stats
+
+    def count_prompt_tokens(self, prompt):
+        """Tokens in `prompt`: counted by the Gemini API if configured, otherwise estimated"""
+        if self.exact_token_count:
+            try:
+                return self.llm.count_tokens(prompt).total_tokens
+            except Exception as e:
+                print(f"Token count via Gemini API failed, using an estimate instead: {e}")
+        return estimate_tokens(prompt)
+
+    def check_prompt_budget(self, prompt):
+        """Return `prompt`, or raise PromptBudgetExceededError if it exceeds the per-request token budget"""
+        if self.prompt_token_budget > 0:
+            tokens = self.count_prompt_tokens(prompt)
+            if tokens > self.prompt_token_budget:
+                raise PromptBudgetExceededError(tokens, self.prompt_token_budget)
+        return prompt
+
+    def _generate_text(self, prompt):
+        """Send a single prompt to Gemini and return the response text"""
+        response = self.llm.generate_content(prompt)
+
+        # Check for safety ratings or blocks if applicable
+        # (Refer to Google AI documentation for handling safety attributes)
+        # if response.prompt_feedback.block_reason:
+        #     raise ValueError(f"Content generation blocked due to: {response.prompt_feedback.block_reason}")
+
+        return response.text
+
+    def generate_gxp_content(self, system_prompt, user_stories, db_design, progress_callback=None):
+        """Generate GxP documentation content using Gemini API"""
+        if not self.model:
+             raise RuntimeError("Gemini model was not initialized successfully.")
+        try:
+            # Ensure user_stories is joined correctly if it's a list
+            user_stories_text = "\n".join(user_stories) # Use newline as separator
+
+            # Identical inputs produce an identical prompt, so reuse the previous generation
+            cache_key = None
+            if self.generation_cache is not None:
+                cache_key = GenerationCache.make_key(
+                    system_prompt, user_stories_text, db_design, self.model_name, self.prompt_version
+                )
+                cached_content = self.generation_cache.get(cache_key)
+                if cached_content is not None:
+                    print(f"Generation cache hit ({cache_key[:12]}), skipping Gemini API call.")
+                    return cached_content
+
+            # Ensure inputs are not excessively large - add checks if needed
+            # Example check (adjust limits as needed):
+            # MAX_INPUT_LENGTH = 100000 # Example character limit
+            # if len(user_stories_text) > MAX_INPUT_LENGTH or len(db_design) > MAX_INPUT_LENGTH:
+            #     raise ValueError("Input data exceeds maximum allowed length.")
+
+            scope = self.similarity_scope(system_prompt, GENERATION_MODE_SINGLE)
+            match = self.find_near_duplicate(scope, user_stories_text, db_design, "the document")
+            if match is not None and match.reuse:
+                content = match.content
+                if cache_key is not None:
+                    self.generation_cache.set(cache_key, content)
+                self.similarity_index.add(scope, user_stories_text, db_design, content, label="document")
+                return content
+
+            prompt = self._seeded_prompt(match, system_prompt, user_stories_text, db_design)
+
+            if progress_callback:
+                progress_callback("prompt_built")
+
             # Initialize chat with system prompt (optional, depends on model preference)
             # Some models work better with direct generation requests
             # chat = self.model.start_chat(history=[
@@ -143,16 +416,18 @@ class GxPDocumentGenerator:
             # response = chat.send_message(prompt)
 
             # Direct generation request
-            response = self.model.generate_content(prompt)
-
-
-            # Check for safety ratings or blocks if applicable
-            # (Refer to Google AI documentation for handling safety attributes)
-            # if response.prompt_feedback.block_reason:
-            #     raise ValueError(f"Content generation blocked due to: {response.prompt_feedback.block_reason}")
+            if progress_callback:
+                progress_callback("llm_running")
+            content = self._generate_text(prompt)
+            if self.structure_repair and content:
+                content = self.repair_structure(system_prompt, user_stories, db_design, content)
+            if cache_key is not None and content and content.strip():
+                self.generation_cache.set(cache_key, content)
+            if self.similarity_index is not None and content:
+                self.similarity_index.add(scope, user_stories_text, db_design, content, label="document")
 
             # Return the generated text
-            return response.text
+            return content
 
         except Exception as e:
             print(f"Error generating content via Gemini API: {str(e)}")
@@ -160,239 +435,475 @@ class GxPDocumentGenerator:
             raise
 
 
-    def parse_sections(self, content):
-        """Parse content into sections with proper hierarchy and indentation for TXT output"""
-        sections = []
-        lines = content.split('\n')
-        current_section_info = {'level': 0, 'indent_level': -1} # Track current nesting
-        section_stack = [{'level': 0, 'indent_level': -1}] # Stack to manage hierarchy
-
-        for line in lines:
-            stripped_line = line.strip()
-            if not stripped_line: # Skip empty lines
-                continue
-
-            # Try to match heading format (e.g., "1. Heading", "1.2. Subheading")
-            heading_match = re.match(r'^\s*(\d+(\.\d+)*)\.?\s+(.+)$', line)
-
-            if heading_match:
-                heading_number = heading_match.group(1)
-                level = heading_number.count('.') + 1
-                heading_text = heading_match.group(3).strip()
-                # Use heading level to determine base indent
-                indent_level = level - 1
-
-                current_section_info = {
-                    'type': 'heading',
-                    'level': level,
-                     # Reconstruct text for consistency
-                    'text': f"{heading_number}. {heading_text}",
-                    'number': heading_number,
-                    'indent_level': indent_level
-                }
-                sections.append(current_section_info)
-
-                # Manage stack for potential future child content indentation
-                while section_stack[-1]['level'] >= level:
-                    section_stack.pop()
-                section_stack.append(current_section_info)
+    def generate_gxp_content_stream(self, system_prompt, user_stories, db_design, result=None):
+        """
+        Generate GxP documentation content using the Gemini streaming API.
 
-            else:
-                # Treat as content line if not a heading
-                # Indent based on the last known heading's level
-                parent_section = section_stack[-1]
-                # Content is indented one level deeper than its parent heading
-                indent_level = parent_section['indent_level'] + 1
-
-                content_section = {
-                    'type': 'content',
-                    'level': parent_section['level'], # Associated with parent heading level
-                    'text': stripped_line, # Store the stripped content line
-                    'indent_level': indent_level
-                }
-                sections.append(content_section)
-
-        return sections
-
-    def create_word_document(self, content):
-        """Placeholder/Optional: Create a Word document with the generated content"""
-        print("Word document creation is currently optional/not fully implemented.")
-        # If needed, implement using the parse_sections logic adapted for Word styles/indentation
-        # Ensure self.define_styles(doc) is called and works correctly.
-        timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = self.output_path / f'GxP_Documentation_{timestamp_str}.docx'
-        print(f"Placeholder for Word document at: {output_file}")
-        # Example:
-        # doc = Document()
-        # self.define_styles(doc)
-        # ... (add title, TOC placeholder, sections using parse_sections and doc.add_paragraph/heading) ...
-        # doc.save(output_file)
-        return None # Return None or the path if implemented
+        Yields text chunks as they arrive. Once the stream finishes, the complete
+        content is repaired (see repair_structure) and stored in the generation
+        cache. A cache hit or a reused near-duplicate (see find_near_duplicate)
+        is yielded as one chunk. If a `result` dict is given, it receives the
+        final document as "content" and whether it differs from the streamed
+        text as "repaired", so callers store what the cache holds.
+        """
+        if not self.model:
+             raise RuntimeError("Gemini model was not initialized successfully.")
+        user_stories_text = "\n".join(user_stories)
+
+        cache_key = None
+        if self.generation_cache is not None:
+            cache_key = GenerationCache.make_key(
+                system_prompt, user_stories_text, db_design, self.model_name, self.prompt_version
+            )
+            cached_content = self.generation_cache.get(cache_key)
+            if cached_content is not None:
+                print(f"Generation cache hit ({cache_key[:12]}), skipping Gemini API call.")
+                if result is not None:
+                    result.update(content=cached_content, repaired=False)
+                yield cached_content
+                return
+
+        scope = self.similarity_scope(system_prompt, GENERATION_MODE_SINGLE)
+        match = self.find_near_duplicate(scope, user_stories_text, db_design, "the document")
+        if match is not None and match.reuse:
+            if cache_key is not None:
+                self.generation_cache.set(cache_key, match.content)
+            self.similarity_index.add(scope, user_stories_text, db_design, match.content, label="document")
+            if result is not None:
+                result.update(content=match.content, repaired=False)
+            yield match.content
+            return
+
+        prompt = self._seeded_prompt(match, system_prompt, user_stories_text, db_design)
+        try:
+            chunks = []
+            for chunk in self.llm.stream_content(prompt):
+                text = chunk.text
+                if text:
+                    chunks.append(text)
+                    yield text
+        except Exception as e:
+            print(f"Error streaming content via Gemini API: {str(e)}")
+            raise
 
+        streamed = content = "".join(chunks)
+        # The client already has the raw text; the stored document is validated and repaired
+        if self.structure_repair and content:
+            content = self.repair_structure(system_prompt, user_stories, db_design, content)
+        if cache_key is not None and content.strip():
+            self.generation_cache.set(cache_key, content)
+        if self.similarity_index is not None and content:
+            self.similarity_index.add(scope, user_stories_text, db_design, content, label="document")
+        if result is not None:
+            result.update(content=content, repaired=content != streamed)
+
+    def generate_epic_section(self, system_prompt, epic, db_design, input_hash=None):
+        """
+        Generate the top-level section ("1. [Screen Name]") for a single epic.
+        A section generated before for the same epic inputs (`input_hash`, see
+        epic_input_hash), in any document, is reused from the section cache; one
+        generated for near-identical inputs is reused or revised (see find_near_duplicate).
+        """
+        if self.section_cache is not None:
+            input_hash = input_hash or self.epic_input_hash(system_prompt, epic, db_design)
+            cached_section = self.section_cache.get(input_hash)
+            if cached_section is not None:
+                print(f"Section cache hit for epic '{epic.name}' ({input_hash[:12]}), skipping Gemini API call.")
+                return cached_section
+
+        match = None
+        if self.similarity_index is not None:
+            scope = self.similarity_scope(system_prompt, "section")
+            schema = self.relevant_schema(epic.text, db_design)
+            match = self.find_near_duplicate(scope, epic.text, schema, f"epic '{epic.name}'")
+
+        if match is not None and match.reuse:
+            section = match.content
+        else:
+            prompt = self._seeded_prompt(match, system_prompt, epic.text, db_design, instructions=EPIC_SECTION_INSTRUCTIONS)
+            print(f"Generating section for epic '{epic.name}' ({len(epic.stories)} stories)...")
+            section = self._generate_text(prompt)
+            if self.structure_repair:
+                section = self.repair_section(system_prompt, extract_top_level_section(section), 1, epic.text, db_design)
+        if self.section_cache is not None and section.strip():
+            self.section_cache.set(input_hash, section)
+        if self.similarity_index is not None:
+            self.similarity_index.add(scope, epic.text, schema, section, label=epic.name)
+        return section
+
+    def repair_section(self, system_prompt, section, number, user_stories_text, db_design):
+        """
+        Return top-level section `number` with its structural problems fixed. A section
+        that is only numbered wrong is renumbered locally; otherwise Gemini is asked to
+        rewrite just this section, and the rewrite is kept if it has fewer problems.
+        """
+        issues = validate_section(section, number)
+        if not issues:
+            return section
+        renumbered = renumber_section(section, number)
+        renumbered_issues = validate_section(renumbered, number)
+        if not renumbered_issues:
+            SECTION_REPAIRS.inc(outcome="renumbered")
+            return renumbered
+        if len(renumbered_issues) < len(issues):
+            section, issues = renumbered, renumbered_issues
+
+        print(f"Section {number} breaks the required structure ({len(issues)} problems), re-prompting for it: {'; '.join(issues[:3])}")
+        try:
+            with timed_stage("repair"):
+                prompt = self.build_prompt(
+                    system_prompt, user_stories_text, db_design,
+                    instructions=REPAIR_INSTRUCTIONS.format(
+                        number=number, issues="\n".join(issues), section=section
+                    )
+                )
+                repaired = renumber_section(extract_top_level_section(self._generate_text(prompt)), number)
+        except Exception as e:
+            # Repairs are best effort: the section as generated is still usable
+            print(f"Error repairing section {number}, keeping it as generated: {e}")
+            SECTION_REPAIRS.inc(outcome="failed")
+            return section
+
+        repaired_issues = validate_section(repaired, number)
+        if len(repaired_issues) >= len(issues):
+            print(f"Repair of section {number} did not reduce its problems, keeping it as generated.")
+            SECTION_REPAIRS.inc(outcome="failed")
+            return section
+        SECTION_REPAIRS.inc(outcome="improved" if repaired_issues else "repaired")
+        return repaired
+
+    def repair_structure(self, system_prompt, user_stories, db_design, content, max_concurrency=None):
+        """
+        Validate every top-level section of a whole generated document and repair only
+        the malformed ones (concurrently), splicing them back in. Sections are matched to
+        epics by position when their counts agree, so a repair prompt gets only its epic's
+        stories; otherwise it gets all of them.
+        """
+        preamble, sections = split_top_level_sections(content)
+        malformed = [position for position, section in enumerate(sections) if validate_section(section, position + 1)]
+        if not malformed:
+            return content
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("FANOUT_MAX_CONCURRENCY", DEFAULT_FANOUT_MAX_CONCURRENCY))
+
+        epics = split_stories_by_epic(user_stories)
+        all_stories = "\n".join(user_stories)
+        calls = []
+        for position in malformed:
+            stories = epics[position].text if len(epics) == len(sections) else all_stories
+            calls.append((self.repair_section, (system_prompt, sections[position], position + 1, stories, db_design)))
+        print(f"Repairing {len(malformed)} of {len(sections)} sections instead of regenerating the document...")
+        for position, section in zip(malformed, self._run_concurrently(calls, max_concurrency)):
+            sections[position] = section
+        return "\n\n".join(([preamble] if preamble else []) + sections) + "\n"
+
+    def _epic_overview(self, epics):
+        """Epic names with the first line (title) of each of their stories"""
+        return "\n".join(
+            f"Epic: {epic.name}\n" + "\n".join(
+                "    " + story.splitlines()[0].strip() for story in epic.stories
+            )
+            for epic in epics
+        )
+
+    def generate_document_summary(self, epics):
+        """Generate the "Document Summary" preamble from the epic names and story titles"""
+        return self._generate_text(self.check_prompt_budget(f"{DOCUMENT_SUMMARY_INSTRUCTIONS}\n\n{self._epic_overview(epics)}\n"))
+
+    def _run_concurrently(self, calls, max_concurrency):
+        """Run (function, args) pairs on a bounded thread pool and return their results in order"""
+        if not calls:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(calls))), thread_name_prefix="gxp-epic") as executor:
+            futures = [run_in_context(executor, function, *args) for function, args in calls]
+            return [future.result() for future in futures]
+
+    def epic_input_hash(self, system_prompt, epic, db_design):
+        """
+        Hash of everything a generated epic section depends on: the epic's stories,
+        the part of the schema its prompt includes (see relevant_schema), the
+        system prompt, model and prompt version.
+        """
+        return GenerationCache.make_key(
+            system_prompt, epic.text, self.model_name, self.prompt_version,
+            self.relevant_schema(epic.text, db_design)
+        )
+
+    def generate_gxp_content_parallel(self, system_prompt, user_stories, db_design, progress_callback=None, max_concurrency=None):
+        """
+        Generate GxP documentation content with one concurrent Gemini call per epic.
+
+        Each call produces a single "1. [Screen Name]" section; the sections are then
+        renumbered in epic order and stitched (after a separately generated Document
+        Summary) into content that parse_sections consumes like a single-prompt result.
+        Sections of epics already generated for any document come from the section cache.
+        """
+        if not self.model:
+             raise RuntimeError("Gemini model was not initialized successfully.")
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("FANOUT_MAX_CONCURRENCY", DEFAULT_FANOUT_MAX_CONCURRENCY))
+        try:
+            epics = split_stories_by_epic(user_stories)
+            if not epics:
+                raise ValueError("No user stories found to generate content from.")
+
+            cache_key = None
+            if self.generation_cache is not None:
+                cache_key = GenerationCache.make_key(
+                    system_prompt, "\n".join(user_stories), db_design, self.model_name,
+                    self.prompt_version, GENERATION_MODE_FANOUT
+                )
+                cached_content = self.generation_cache.get(cache_key)
+                if cached_content is not None:
+                    print(f"Generation cache hit ({cache_key[:12]}), skipping Gemini API calls.")
+                    return cached_content
+
+            print(f"Fanning out generation over {len(epics)} epics (max {max_concurrency} concurrent calls)...")
+            if progress_callback:
+                progress_callback("prompt_built")
+                progress_callback("llm_running")
+
+            # Results come back in submission order so numbering follows the epic order
+            summary, *sections = self._run_concurrently(
+                [(self.generate_document_summary, (epics,))] +
+                [(self.generate_epic_section, (system_prompt, epic, db_design)) for epic in epics],
+                max_concurrency
+            )
+
+            content = stitch_sections(sections, preamble=summary)
+            if cache_key is not None and content.strip():
+                self.generation_cache.set(cache_key, content)
+            return content
 
-    def create_txt_document(self, content):
-        """Create a TXT document with the generated content, using parsed sections"""
-        # Process content using the parser optimized for TXT structure
-        sections = self.parse_sections(content)
-
-        output_lines = []
-
-        # Add title and timestamp
-        output_lines.append('GxP Function Detail Design Document')
-        output_lines.append('')
-        output_lines.append(f'Generated on: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
-        output_lines.append('')
-        # output_lines.append('Table of Contents') # Optional TOC placeholder
-        # output_lines.append('')
-
-        last_section_level = 0
-        # Add sections with proper indentation
-        for i, section in enumerate(sections):
-             # Add blank line between different top-level sections (level 1)
-             # or before a heading that's not immediately following another heading
-            if section['type'] == 'heading':
-                 # Add space before a new top-level heading if not the first heading
-                 if section['level'] == 1 and i > 0 and sections[i-1]['level'] > 0:
-                     output_lines.append('')
-                 # Add space before a heading if the previous line was content
-                 elif i > 0 and sections[i-1]['type'] == 'content':
-                      output_lines.append('')
-                 last_section_level = section['level'] # Track last heading level
-
-            # Calculate indentation based on indent_level from parse_sections
-            # Use 4 spaces per indent level
-            indent = '    ' * section['indent_level']
-
-            output_lines.append(f"{indent}{section['text']}")
-
-        # Join lines with newlines
-        output_text = '\n'.join(output_lines)
-
-        # Save the document
-        timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-        # Ensure output path is used correctly relative to project root
-        output_file = self.output_path / f'GxP_Documentation_{timestamp_str}.txt'
+        except Exception as e:
+            print(f"Error generating content via Gemini API (fan-out): {str(e)}")
+            raise
 
+    def generate_gxp_content_incremental(self, system_prompt, user_stories, db_design, document_key=DEFAULT_DOCUMENT_KEY, progress_callback=None, max_concurrency=None, report=None):
+        """
+        Regenerate only what changed since the previous run of `document_key`.
+
+        Each epic's section is stored with the hash of its inputs (see epic_input_hash).
+        Epics whose hash matches the previous run reuse the stored section; the others
+        are generated concurrently (as in fan-out mode) and spliced in, and the manifest
+        is updated for the next run. If a `report` dict is given, it is filled with a
+        summary of what was regenerated and reused.
+        """
+        if not self.model:
+             raise RuntimeError("Gemini model was not initialized successfully.")
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("FANOUT_MAX_CONCURRENCY", DEFAULT_FANOUT_MAX_CONCURRENCY))
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(output_text)
-            print(f"TXT document saved successfully to: {output_file}")
+            epics = split_stories_by_epic(user_stories)
+            if not epics:
+                raise ValueError("No user stories found to generate content from.")
+
+            manifest = self.section_manifests.load(document_key)
+            previous_sections = SectionManifestStore.sections_by_epic(manifest)
+
+            entries = []
+            calls = []
+            stale_entries = []
+            for epic in epics:
+                input_hash = self.epic_input_hash(system_prompt, epic, db_design)
+                previous = previous_sections.get(epic.name.lower())
+                if previous and previous.get("input_hash") == input_hash and previous.get("section"):
+                    entries.append(previous)
+                    continue
+                entry = {"name": epic.name, "input_hash": input_hash, "section": None}
+                entries.append(entry)
+                stale_entries.append(entry)
+                calls.append((self.generate_epic_section, (system_prompt, epic, db_design, input_hash)))
+
+            summary_hash = GenerationCache.make_key(self._epic_overview(epics), self.model_name, self.prompt_version)
+            summary_entry = manifest.get("summary")
+            regenerate_summary = not summary_entry or summary_entry.get("input_hash") != summary_hash
+            if regenerate_summary:
+                calls.append((self.generate_document_summary, (epics,)))
+
+            print(f"Incremental generation for '{document_key}': regenerating {len(stale_entries)} of {len(epics)} epics"
+                  f"{' and the document summary' if regenerate_summary else ''}.")
+            if progress_callback:
+                progress_callback("prompt_built")
+                progress_callback("llm_running")
+
+            results = self._run_concurrently(calls, max_concurrency)
+            for entry, section in zip(stale_entries, results):
+                entry["section"] = extract_top_level_section(section)
+            if regenerate_summary:
+                summary_entry = {"input_hash": summary_hash, "text": results[-1].strip()}
+
+            self.section_manifests.save(document_key, {"summary": summary_entry, "epics": entries})
+            if report is not None:
+                report.update({
+                    "document_key": document_key,
+                    "epics": len(epics),
+                    "regenerated_epics": [entry["name"] for entry in stale_entries],
+                    "reused_epics": len(epics) - len(stale_entries),
+                    "regenerated_summary": regenerate_summary,
+                })
+            return stitch_sections([entry["section"] for entry in entries], preamble=summary_entry["text"])
+
         except Exception as e:
-            print(f"Error writing TXT file {output_file}: {e}")
+            print(f"Error generating content via Gemini API (incremental): {str(e)}")
             raise
 
-        return output_file # Return the Path object
+    def parse_sections(self, content):
+        """
+        Parse content into sections with proper hierarchy and indentation for TXT output.
+        Returns a ParsedDocument, a sequence of Section records with an outline tree.
+        """
+        return parse_document(content)
+
+    def output_file_path(self, suffix):
+        """
+        A new, unique path for a generated document. The timestamp keeps the name
+        readable; the random part keeps generations finishing in the same second
+        from writing to the same file.
+        """
+        timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return self.output_path / f'GxP_Documentation_{timestamp_str}_{uuid.uuid4().hex[:8]}{suffix}'
+
+    def render_documents(self, content, output_formats, progress_callback=None):
+        """
+        Parse the generated content once and render it into every requested
+        format concurrently. Returns {format: output file path}. Both steps run
+        in the CPU worker processes unless CPU_POOL_WORKERS is 0.
+        """
+        pool = get_cpu_pool()
+        if progress_callback:
+            progress_callback("parsing")
+        with timed_stage("parse"):
+            document = pool.run(parse_document, content) if pool else self.parse_sections(content)
+
+        if progress_callback:
+            progress_callback("rendering")
+        output_files = {name: self.output_file_path(get_renderer(name).suffix) for name in output_formats}
+        try:
+            with timed_stage("render"):
+                output_files = render_formats(document, output_files, font_name=self.default_font_name, pool=pool)
+        except Exception as e:
+            print(f"Error rendering {', '.join(output_formats)} documents: {e}")
+            raise
+        for name, output_file in output_files.items():
+            print(f"{name.upper()} document saved successfully to: {output_file}")
+        return output_files
+
+    def bundle_documents(self, output_files):
+        """Pack the rendered documents ({format: path}) into one zip file and return its path"""
+        bundle_file = self.output_file_path('.zip')
+        with zipfile.ZipFile(bundle_file, 'w', compression=zipfile.ZIP_DEFLATED) as bundle:
+            for output_file in map(Path, output_files.values()):
+                compress_type = zipfile.ZIP_STORED if output_file.suffix in COMPRESSED_SUFFIXES else zipfile.ZIP_DEFLATED
+                # Name every format after the bundle, so the files read as one document
+                bundle.write(output_file, f"{bundle_file.stem}{output_file.suffix}", compress_type=compress_type)
+        for output_file in output_files.values():
+            Path(output_file).unlink(missing_ok=True)
+        print(f"Documents bundled into: {bundle_file}")
+        return bundle_file
+
+    def create_word_document(self, content, progress_callback=None):
+        """Create a Word document with the generated content, using parsed sections"""
+        return self.render_documents(content, [OUTPUT_FORMAT_DOCX], progress_callback)[OUTPUT_FORMAT_DOCX]
+
+    def format_txt_lines(self, section, previous_section=None):
+        """Return the TXT output lines for one parsed section, given the section before it"""
+        return format_txt_lines(section, previous_section)
+
+    def create_txt_document(self, content, progress_callback=None):
+        """Create a TXT document with the generated content, using parsed sections"""
+        return self.render_documents(content, [OUTPUT_FORMAT_TXT], progress_callback)[OUTPUT_FORMAT_TXT]
 
     def define_styles(self, doc):
         """Define document styles (Only relevant for create_word_document)"""
-        styles = doc.styles
-        # Use default font name stored in self
-        default_font = self.default_font_name
-
-        # --- Define Custom Styles ---
-        # Style for the main title
-        try:
-            style = styles['CustomTitle']
-        except KeyError:
-            style = styles.add_style('CustomTitle', WD_STYLE_TYPE.PARAGRAPH)
-        style.base_style = styles['Normal']
-        font = style.font
-        font.name = default_font
-        font.size = Pt(24)
-        font.bold = True
-        style.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        style.paragraph_format.space_after = Pt(18)
-
-        # Style for the Table of Contents heading
-        try:
-            style = styles['TOC Heading']
-        except KeyError:
-            style = styles.add_style('TOC Heading', WD_STYLE_TYPE.PARAGRAPH)
-        style.base_style = styles['Heading 1'] # Base on Heading 1 for outline level
-        font = style.font
-        font.name = default_font
-        font.size = Pt(16)
-        font.bold = True
-        style.paragraph_format.space_after = Pt(12)
-        style.paragraph_format.keep_with_next = True
-
-        # Style for the timestamp
+        from src.docx_renderer import define_styles
+        define_styles(doc, self.default_font_name)
+
+    def generate(self, user_stories_path, db_schema_path, progress_callback=None, mode=None, document_key=DEFAULT_DOCUMENT_KEY, output_format=OUTPUT_FORMAT_TXT, timings=None):
+        """
+        Main method to orchestrate the document generation process.
+
+        `user_stories_path` (a path or list of paths) and `db_schema_path` are the
+        input files for this run.
+
+        `progress_callback`, if given, is called with the name of each stage as it
+        starts: loading_inputs, prompt_built, llm_running, parsing, rendering.
+        `mode` selects single-prompt ("single"), per-epic parallel ("fanout") or
+        incremental per-epic ("incremental", keyed by `document_key`) generation;
+        it defaults to the GENERATION_MODE environment variable.
+        `output_format` is one of OUTPUT_FORMATS ("txt", "docx", "md", "html") or
+        several of them (a list or "txt,docx"); the content is parsed once and all
+        formats are rendered concurrently and returned together as a zip file.
+        `timings`, if given, is a GenerationTimings (src/metrics.py) that receives
+        the duration of every stage and the LLM token counts of this run.
+        """
+        mode = mode or os.getenv("GENERATION_MODE", GENERATION_MODE_SINGLE)
+        timings = timings if timings is not None else GenerationTimings()
+        status = "error"
         try:
-            style = styles['Timestamp']
-        except KeyError:
-            style = styles.add_style('Timestamp', WD_STYLE_TYPE.PARAGRAPH)
-        style.base_style = styles['Normal']
-        font = style.font
-        font.name = default_font
-        font.size = Pt(10)
-        font.italic = True
-        style.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        style.paragraph_format.space_after = Pt(30)
-
-        # --- Customize Base Styles ---
-        # Normal Style
-        style = styles['Normal']
-        font = style.font
-        font.name = default_font
-        font.size = Pt(11)
-        style.paragraph_format.space_after = Pt(6)
-        style.paragraph_format.line_spacing = 1.15
-
-        # Ensure built-in heading styles use the default font
-        for i in range(1, 10):
-            try:
-                style = styles[f'Heading {i}']
-                style.font.name = default_font
-                # Optional: Adjust heading sizes, spacing, etc.
-                # style.font.size = Pt(16 - i)
-                # style.paragraph_format.space_before = Pt(12)
-                # style.paragraph_format.space_after = Pt(6)
-            except KeyError:
-                continue # Ignore if style doesn't exist
-
-
-    def generate(self):
-        """Main method to orchestrate the document generation process"""
+            with use_timings(timings), timed_stage("total"):
+                output_file_path = self._generate(user_stories_path, db_schema_path, progress_callback, mode, document_key, output_format)
+            status = "ok"
+            return output_file_path
+        finally:
+            timings.observe(mode, status)
+
+    def _generate(self, user_stories_path, db_schema_path, progress_callback, mode, document_key, output_format):
+        """The generation steps of generate(), each timed as a stage of the current timings"""
         output_file_path = None # Initialize
         try:
+            output_formats = parse_output_formats(output_format)
             print("Initiating document generation...")
+            if progress_callback:
+                progress_callback("loading_inputs")
             # 1. Load system prompt first
             print("Loading system prompt...")
-            system_prompt = self.load_system_prompt()
+            with timed_stage("prompt_load"):
+                system_prompt = self.load_system_prompt()
             print("System prompt loaded.")
 
-             # 2. Load user stories and db design using the paths provided in __init__
-            print("Loading user stories...")
-            user_stories = self.load_user_stories() # Reads from self.user_stories_path
-            print("User stories loaded.")
+             # 2. Load user stories and db design from the given paths
+            with timed_stage("input_load"):
+                print("Loading user stories...")
+                user_stories = self.load_user_stories(user_stories_path)
+                print("User stories loaded.")
 
-            print("Loading database design...")
-            db_design = self.load_database_design() # Reads from self.db_schema_path
-            print("Database design loaded.")
+                print("Loading database design...")
+                db_design = self.load_database_design(db_schema_path)
+                print("Database design loaded.")
 
             # 3. Generate content via API
             print("Generating GxP documentation content via API...")
-            content = self.generate_gxp_content(system_prompt, user_stories, db_design)
+            if mode not in GENERATION_MODES:
+                raise ValueError(f"Unknown generation mode '{mode}'. Expected one of: {', '.join(GENERATION_MODES)}.")
+            # Prompt building, the LLM calls and cache lookups; llm and prompt_build are also reported on their own
+            with timed_stage("content"):
+                if mode == GENERATION_MODE_FANOUT:
+                    content = self.generate_gxp_content_parallel(system_prompt, user_stories, db_design, progress_callback=progress_callback)
+                elif mode == GENERATION_MODE_INCREMENTAL:
+                    content = self.generate_gxp_content_incremental(system_prompt, user_stories, db_design, document_key=document_key, progress_callback=progress_callback)
+                else:
+                    content = self.generate_gxp_content(system_prompt, user_stories, db_design, progress_callback=progress_callback)
             print("Content generation complete.")
             if not content or not content.strip():
                  raise ValueError("Generated content is empty.")
 
-            # 4. Decide which output format(s) you need and create them
-            # print("Creating Word document...")
-            # docx_file = self.create_word_document(content) # Optional
-            # if docx_file: print(f"Word document generated: {docx_file}")
-
-            print("Creating TXT document...")
-            txt_file_path = self.create_txt_document(content) # Generate TXT
-            if not txt_file_path:
-                 raise RuntimeError("Failed to create TXT document.")
-            print(f"TXT document generation successful: {txt_file_path}")
-            output_file_path = txt_file_path # Set the path to return
+            # 4. Create the document(s) in the requested output format(s)
+            print(f"Creating {', '.join(output_formats)} document(s)...")
+            output_files = self.render_documents(content, output_formats, progress_callback=progress_callback)
+            if len(output_files) == 1:
+                output_file_path = next(iter(output_files.values()))
+            else:
+                output_file_path = self.bundle_documents(output_files)
+            print(f"Document generation successful: {output_file_path}")
 
             # Return the path of the generated file the API needs to serve
             # Ensure it returns a Path object or string as expected by the endpoint
             return output_file_path
 
+        except (PromptBudgetExceededError, LLMUnavailableError, LLMDeadlineExceededError):
+            # Oversized inputs and an unavailable upstream are reported distinctly by callers
+            raise
         except FileNotFoundError as e:
              # Handle missing input files gracefully
              print(f"Error: Input file not found during generation - {e}")
@@ -0,0 +1,74 @@
+# src/incremental.py
+import os
+import re
+import json
+import logging
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Document keys become file names, so restrict them to a safe character set
+DOCUMENT_KEY_PATTERN = re.compile(r'^[A-Za-z0-9_.-]{1,100}$')
+DEFAULT_DOCUMENT_KEY = "default"
+
+
+def validate_document_key(document_key):
+    """Raise ValueError if `document_key` cannot be used as a manifest name"""
+    if not DOCUMENT_KEY_PATTERN.match(document_key or "") or document_key.startswith('.'):
+        raise ValueError(
+            f"Invalid document key '{document_key}'. Use 1-100 letters, digits, '_', '-' or '.'."
+        )
+    return document_key
+
+
+class SectionManifestStore:
+    """
+    Remembers, per document, which top-level section was generated from which
+    epic and the hash of that epic's inputs, so a later run can reuse every
+    section whose inputs are unchanged.
+
+    Manifest layout (one JSON file per document key):
+        {
+            "summary": {"input_hash": ..., "text": ...},
+            "epics": [{"name": ..., "input_hash": ..., "section": ...}, ...]
+        }
+    """
+
+    def __init__(self, manifest_dir):
+        self.manifest_dir = Path(manifest_dir)
+        self.manifest_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, document_key):
+        return self.manifest_dir / f"{validate_document_key(document_key)}.json"
+
+    def load(self, document_key):
+        """Return the stored manifest for `document_key`, or an empty one"""
+        path = self._path(document_key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {"summary": None, "epics": []}
+        except (OSError, ValueError) as e:
+            # A corrupt manifest only costs a full regeneration
+            logger.warning(f"Ignoring unreadable section manifest {path}: {e}")
+            return {"summary": None, "epics": []}
+        manifest.setdefault("summary", None)
+        manifest.setdefault("epics", [])
+        return manifest
+
+    def save(self, document_key, manifest):
+        """Atomically replace the stored manifest for `document_key`"""
+        path = self._path(document_key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp_path, path)
+
+    @staticmethod
+    def sections_by_epic(manifest):
+        """Map lower-cased epic name -> manifest entry"""
+        return {entry["name"].lower(): entry for entry in manifest.get("epics", [])}
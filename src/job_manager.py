@@ -0,0 +1,220 @@
+# src/job_manager.py
+import os
+import uuid
+import logging
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from src.state_store import get_state_store
+
+logger = logging.getLogger(__name__)
+
+# Approximate completion percentage reported for each generation stage
+JOB_STAGES = {
+    "queued": 0,
+    "loading_inputs": 5,
+    "prompt_built": 15,
+    "llm_running": 20,
+    "parsing": 80,
+    "rendering": 90,
+    "completed": 100,
+}
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+# State store namespace of the job records
+JOBS_NAMESPACE = "jobs"
+
+
+class JobQueueFullError(RuntimeError):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class Job:
+    """State of a single background generation job."""
+
+    def __init__(self, job_id, metadata=None):
+        self.id = job_id
+        self.status = STATUS_QUEUED
+        self.stage = "queued"
+        self.error = None
+        self.result = None
+        self.metadata = metadata or {}
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def set_stage(self, stage):
+        """Record the generation stage the job has reached."""
+        with self._lock:
+            self.stage = stage
+
+    @property
+    def progress(self):
+        return JOB_STAGES.get(self.stage, 0)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "stage": self.stage,
+                "progress": self.progress,
+                "error": self.error,
+                "metadata": self.metadata,
+                "created_at": self.created_at.isoformat(),
+                "started_at": self.started_at.isoformat() if self.started_at else None,
+                "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            }
+
+    def to_record(self):
+        """The job as stored in the state store"""
+        record = self.to_dict()
+        with self._lock:
+            record["result"] = self.result
+        return record
+
+    @classmethod
+    def from_record(cls, record):
+        job = cls(record["job_id"], record.get("metadata"))
+        job.status = record["status"]
+        job.stage = record["stage"]
+        job.error = record.get("error")
+        job.result = record.get("result")
+        job.created_at = datetime.fromisoformat(record["created_at"])
+        job.started_at = datetime.fromisoformat(record["started_at"]) if record.get("started_at") else None
+        job.finished_at = datetime.fromisoformat(record["finished_at"]) if record.get("finished_at") else None
+        return job
+
+
+class JobManager:
+    """
+    Runs generation jobs on a bounded worker pool.
+
+    At most `max_workers` jobs run at once and at most `max_queued` jobs may be
+    waiting; further submissions raise JobQueueFullError so the API can shed load
+    instead of piling up work. Finished jobs are kept (oldest evicted first) up
+    to `max_finished_jobs` so clients can still poll them.
+
+    Jobs run in the process that accepted them, but their records are saved to
+    the state store at every change, so any API process can report on them.
+    """
+
+    def __init__(self, max_workers=2, max_queued=32, max_finished_jobs=256, state_store=None):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_finished_jobs = max_finished_jobs
+        self.state_store = state_store if state_store is not None else get_state_store()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gxp-job")
+        self._active = {}  # job id -> Job, queued or running in this process
+        self._finished = deque()  # ids of the jobs this process finished, oldest first
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _save(self, job):
+        self.state_store.put(JOBS_NAMESPACE, job.id, job.to_record())
+
+    def _set_stage(self, job, stage):
+        job.set_stage(stage)
+        self._save(job)
+
+    def submit(self, func, metadata=None):
+        """
+        Queue `func(progress_callback)` for execution and return its Job.
+        The value returned by `func` is stored as the job result.
+        """
+        with self._lock:
+            if self._pending >= self.max_queued:
+                raise JobQueueFullError(
+                    f"Job queue is full ({self.max_queued} jobs waiting). Please retry later."
+                )
+            job = Job(uuid.uuid4().hex, metadata)
+            self._active[job.id] = job
+            self._pending += 1
+
+        self._save(job)
+        self._executor.submit(self._run, job, func)
+        logger.info(f"Job {job.id} queued.")
+        return job
+
+    def get(self, job_id):
+        """Return the Job with the given id (queued or run by any process), or None."""
+        record = self.state_store.get(JOBS_NAMESPACE, job_id)
+        return Job.from_record(record) if record is not None else None
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        # Jobs cancelled or interrupted here would otherwise be reported as pending forever
+        with self._lock:
+            unfinished = list(self._active.values())
+        for job in unfinished:
+            self._finish(job, error="The server shut down before the job finished.")
+
+    def _run(self, job, func):
+        with self._lock:
+            self._pending -= 1
+        with job._lock:
+            job.status = STATUS_RUNNING
+            job.started_at = datetime.now(timezone.utc)
+        self._save(job)
+        logger.info(f"Job {job.id} started.")
+        try:
+            result = func(lambda stage: self._set_stage(job, stage))
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}")
+            traceback.print_exc()
+            self._finish(job, error=str(e))
+            return
+        self._finish(job, result=result)
+        logger.info(f"Job {job.id} completed.")
+
+    def _finish(self, job, result=None, error=None):
+        with self._lock:
+            if self._active.pop(job.id, None) is None:
+                return
+            self._finished.append(job.id)
+            # Evict the oldest finished jobs beyond the limit
+            evicted = [self._finished.popleft() for _ in range(max(0, len(self._finished) - self.max_finished_jobs))]
+        with job._lock:
+            if error is None:
+                job.result = result
+                job.status = STATUS_COMPLETED
+                job.stage = "completed"
+            else:
+                job.status = STATUS_FAILED
+                job.error = error
+            job.finished_at = datetime.now(timezone.utc)
+        self._save(job)
+        for job_id in evicted:
+            self.state_store.delete(JOBS_NAMESPACE, job_id)
+
+
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """Return the process-wide JobManager, configured from JOB_MAX_WORKERS / JOB_MAX_QUEUED."""
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = JobManager(
+                max_workers=int(os.getenv("JOB_MAX_WORKERS", 2)),
+                max_queued=int(os.getenv("JOB_MAX_QUEUED", 32)),
+            )
+        return _job_manager
+
+
+def shutdown_job_manager():
+    """Stop the process-wide JobManager, cancelling jobs that have not started."""
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is not None:
+            _job_manager.shutdown()
+            _job_manager = None
@@ -0,0 +1,305 @@
+# src/llm_backends.py
+"""
+Pluggable LLM backends for GxPDocumentGenerator.
+
+A backend exposes the subset of the google.generativeai GenerativeModel interface
+the generator uses:
+    generate_content(prompt, stream=False, request_options=None) -> response
+        (response.text; with stream=True, an iterable of chunks with .text)
+    count_tokens(prompt) -> object with .total_tokens
+
+Backends:
+- "gemini": the real Gemini API (default).
+- "replay": serves recorded responses offline, with configurable latency and
+  streaming chunk timing, for load tests and CI.
+- "record": calls Gemini and stores every response for later replay.
+
+The backend is chosen with LLM_BACKEND (see create_backend).
+"""
+import os
+import json
+import math
+import time
+import random
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+from src.prompt_compaction import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+BACKEND_GEMINI = "gemini"
+BACKEND_REPLAY = "replay"
+BACKEND_RECORD = "record"
+BACKENDS = (BACKEND_GEMINI, BACKEND_REPLAY, BACKEND_RECORD)
+# Recordings live next to the other generated artifacts unless LLM_RECORDINGS_DIR is set
+DEFAULT_RECORDINGS_DIR = Path(__file__).parent.parent / "output" / "recordings"
+DEFAULT_CHUNK_CHARS = 200
+
+
+class LLMResponse:
+    """A response or streamed chunk with the attributes the generator reads"""
+
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class TokenCount:
+    def __init__(self, total_tokens):
+        self.total_tokens = total_tokens
+
+
+class LatencyModel:
+    """
+    A latency distribution in seconds, parsed from a spec string:
+        "none"                 no delay
+        "fixed:0.5"            always 0.5s
+        "uniform:0.2,1.5"      uniform between 0.2s and 1.5s
+        "normal:1.0,0.25"      normal with mean 1.0s and standard deviation 0.25s
+        "lognormal:0.0,0.5"    log-normal with mu 0.0 and sigma 0.5 (long tail)
+    """
+
+    def __init__(self, spec="none", seed=None):
+        self.spec = spec or "none"
+        kind, _, args = self.spec.partition(':')
+        self.kind = kind.strip().lower()
+        self.args = [float(arg) for arg in args.split(',') if arg.strip()]
+        expected_args = {"none": 0, "fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if expected_args.get(self.kind) != len(self.args):
+            raise ValueError(
+                f"Invalid latency spec '{self.spec}'. Use none, fixed:S, uniform:MIN,MAX, normal:MEAN,STD or lognormal:MU,SIGMA."
+            )
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        with self._lock:
+            if self.kind == "fixed":
+                value = self.args[0]
+            elif self.kind == "uniform":
+                value = self._random.uniform(*self.args)
+            elif self.kind == "normal":
+                value = self._random.gauss(*self.args)
+            elif self.kind == "lognormal":
+                value = self._random.lognormvariate(*self.args)
+            else:
+                value = 0.0
+        return max(0.0, value)
+
+    def sleep(self):
+        delay = self.sample()
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    def __repr__(self):
+        return f"LatencyModel({self.spec!r})"
+
+
+def prompt_key(prompt):
+    """Key under which the response to `prompt` is recorded"""
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+class GeminiBackend:
+    """The real Gemini API"""
+
+    name = BACKEND_GEMINI
+
+    def __init__(self, model_name):
+        api_key = os.getenv('GOOGLE_API_KEY')
+        if not api_key:
+            raise ValueError("Missing GOOGLE_API_KEY environment variable.")
+        # Imported here: the SDK takes about a second to import and the other backends never need it
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        return self.model.generate_content(prompt, stream=stream, request_options=request_options)
+
+    def count_tokens(self, prompt):
+        return self.model.count_tokens(prompt)
+
+
+class RecordingStore:
+    """Recorded responses, one JSON file per prompt key"""
+
+    def __init__(self, recordings_dir):
+        self.recordings_dir = Path(recordings_dir)
+        self.recordings_dir.mkdir(parents=True, exist_ok=True)
+
+    def save(self, prompt, text, model_name):
+        key = prompt_key(prompt)
+        path = self.recordings_dir / f"{key}.json"
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"key": key, "model": model_name, "prompt_chars": len(prompt), "text": text}, f)
+        os.replace(tmp_path, path)
+
+    def load_all(self):
+        """Return {key: text} for every recording"""
+        recordings = {}
+        for path in sorted(self.recordings_dir.glob("*.json")):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    recording = json.load(f)
+                recordings[recording["key"]] = recording["text"]
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable recording {path}: {e}")
+        return recordings
+
+
+class RecordingBackend:
+    """Calls another backend and records each complete response for later replay"""
+
+    name = BACKEND_RECORD
+
+    def __init__(self, inner, recordings_dir):
+        self.inner = inner
+        self.store = RecordingStore(recordings_dir)
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        response = self.inner.generate_content(prompt, stream=stream, request_options=request_options)
+        if not stream:
+            self.store.save(prompt, response.text, getattr(self.inner, "model_name", None))
+            return response
+        return self._record_stream(prompt, response)
+
+    def _record_stream(self, prompt, response):
+        chunks = []
+        for chunk in response:
+            chunks.append(chunk.text or "")
+            yield chunk
+        self.store.save(prompt, "".join(chunks), getattr(self.inner, "model_name", None))
+
+    def count_tokens(self, prompt):
+        return self.inner.count_tokens(prompt)
+
+
+class ReplayBackend:
+    """
+    Serves recorded responses without calling Gemini.
+
+    A prompt is answered with its exact recording when there is one. Otherwise
+    (inputs differ from the recorded run) a recording is picked deterministically
+    by prompt hash, or, with `strict`, a KeyError is raised. Without any
+    recordings a small placeholder document is returned.
+
+    `latency` delays the (first) response; when streaming, the text is split into
+    `chunk_chars`-sized chunks separated by `chunk_interval`.
+    """
+
+    name = BACKEND_REPLAY
+
+    def __init__(self, recordings_dir=None, latency=None, chunk_interval=None,
+                 chunk_chars=DEFAULT_CHUNK_CHARS, strict=False):
+        self.recordings = RecordingStore(recordings_dir).load_all() if recordings_dir else {}
+        self._keys = sorted(self.recordings)
+        self.latency = latency or LatencyModel()
+        self.chunk_interval = chunk_interval or LatencyModel()
+        self.chunk_chars = max(1, chunk_chars)
+        self.strict = strict
+        logger.info(f"Replay backend loaded {len(self.recordings)} recordings.")
+
+    def response_text(self, prompt):
+        key = prompt_key(prompt)
+        text = self.recordings.get(key)
+        if text is not None:
+            return text
+        if self.strict:
+            raise KeyError(f"No recorded response for prompt {key[:12]}.")
+        if self._keys:
+            return self.recordings[self._keys[int(key, 16) % len(self._keys)]]
+        return placeholder_response(prompt)
+
+    def _usage(self, prompt, text):
+        return _Usage(estimate_tokens(prompt), estimate_tokens(text))
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        text = self.response_text(prompt)
+        self.latency.sleep()
+        if not stream:
+            return LLMResponse(text, self._usage(prompt, text))
+        return self._stream(prompt, text)
+
+    def _stream(self, prompt, text):
+        chunk_count = max(1, math.ceil(len(text) / self.chunk_chars))
+        for index in range(chunk_count):
+            if index:
+                self.chunk_interval.sleep()
+            chunk = text[index * self.chunk_chars:(index + 1) * self.chunk_chars]
+            usage = self._usage(prompt, text) if index == chunk_count - 1 else None
+            yield LLMResponse(chunk, usage)
+
+    def count_tokens(self, prompt):
+        return TokenCount(estimate_tokens(prompt))
+
+
+class _Usage:
+    """Mirror of the usage_metadata fields the client reads"""
+
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+def placeholder_response(prompt):
+    """A small, well-formed document section used when no recordings exist"""
+    if "Document Summary" in prompt and "numbered sections" in prompt:
+        return "Document Summary\n    Replayed summary of the application."
+    return "\n".join([
+        "Document Summary",
+        "    Replayed document.",
+        "",
+        "1. Replayed Screen",
+        "1.1 Function of Screen",
+        "    Placeholder content served by the replay backend.",
+        "1.2 Title",
+        "    Replayed Screen",
+        "1.3 User Interface",
+        "    1.3.1 Screen Sample",
+        "        [Screen image]",
+        "1.4 Data Displayed",
+        "    None",
+        "1.5 Data Entry/Edit",
+        "    None",
+        "1.6 Controls",
+        "1.6.1 OK button",
+        "    1.6.1.1 Picture",
+        "        [Button image]",
+        "    1.6.1.2 Visible",
+        "        The button is visible at all times.",
+        "    1.6.1.3 Enabled",
+        "        The button is enabled at all times.",
+        "    1.6.1.4 Validation/Processing",
+        "        The screen closes.",
+    ])
+
+
+def create_backend(model_name, backend_name=None):
+    """
+    Create the backend selected by `backend_name` or the LLM_BACKEND environment
+    variable (gemini, replay or record). Replay and record use LLM_RECORDINGS_DIR;
+    replay also reads LLM_REPLAY_LATENCY, LLM_REPLAY_CHUNK_INTERVAL (LatencyModel
+    specs), LLM_REPLAY_CHUNK_CHARS and LLM_REPLAY_STRICT.
+    """
+    backend_name = (backend_name or os.getenv("LLM_BACKEND", BACKEND_GEMINI)).lower()
+    recordings_dir = Path(os.getenv("LLM_RECORDINGS_DIR", DEFAULT_RECORDINGS_DIR))
+    if backend_name == BACKEND_GEMINI:
+        return GeminiBackend(model_name)
+    if backend_name == BACKEND_RECORD:
+        return RecordingBackend(GeminiBackend(model_name), recordings_dir)
+    if backend_name == BACKEND_REPLAY:
+        return ReplayBackend(
+            recordings_dir=recordings_dir,
+            latency=LatencyModel(os.getenv("LLM_REPLAY_LATENCY", "none")),
+            chunk_interval=LatencyModel(os.getenv("LLM_REPLAY_CHUNK_INTERVAL", "none")),
+            chunk_chars=int(os.getenv("LLM_REPLAY_CHUNK_CHARS", DEFAULT_CHUNK_CHARS)),
+            strict=os.getenv("LLM_REPLAY_STRICT", "false").lower() in ("1", "true", "yes"),
+        )
+    raise ValueError(f"Unknown LLM backend '{backend_name}'. Expected one of: {', '.join(BACKENDS)}.")
@@ -0,0 +1,396 @@
+# src/llm_client.py
+"""
+Shared, rate-limited wrapper around the Gemini model.
+
+All generation calls in the process go through one ResilientLLMClient per model,
+which applies, in order:
+- a circuit breaker that fails fast while the upstream is degraded,
+- a cap on concurrent calls,
+- token buckets for requests and tokens per minute (the quota),
+- a per-call deadline, and retries with jittered exponential backoff on
+  rate-limit (429), transient server (5xx) and connection errors.
+"""
+import os
+import time
+import random
+import logging
+import threading
+from functools import lru_cache
+
+from src.prompt_compaction import estimate_tokens
+from src.metrics import record_llm_call
+
+logger = logging.getLogger(__name__)
+
+# Defaults can be overridden through environment variables (see get_llm_client)
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF_BASE_SECONDS = 1.0
+DEFAULT_BACKOFF_MAX_SECONDS = 30.0
+DEFAULT_CALL_TIMEOUT_SECONDS = 300.0
+DEFAULT_CIRCUIT_FAILURE_THRESHOLD = 5
+DEFAULT_CIRCUIT_RESET_SECONDS = 30.0
+
+
+@lru_cache(maxsize=None)
+def retryable_errors():
+    """
+    Errors worth retrying: quota exhaustion, transient server errors, network
+    failures. google.api_core is only imported once a call fails, not at startup.
+    """
+    from google.api_core import exceptions as google_exceptions
+    return (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.TooManyRequests,
+        google_exceptions.InternalServerError,
+        google_exceptions.BadGateway,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.GatewayTimeout,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.Aborted,
+        ConnectionError,
+        TimeoutError,
+    )
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised without calling the upstream while the circuit breaker is open"""
+
+
+class LLMDeadlineExceededError(TimeoutError):
+    """Raised when a call (including waiting and retries) cannot finish before its deadline"""
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to `capacity` tokens and refills continuously
+    at `capacity` per `period` seconds. A rate of 0 disables the bucket.
+    """
+
+    def __init__(self, capacity, period=60.0):
+        self.capacity = capacity
+        self.refill_per_second = capacity / period if capacity else 0
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._condition = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.refill_per_second)
+        self._updated_at = now
+
+    def acquire(self, amount=1, deadline=None):
+        """
+        Take `amount` tokens, waiting for the bucket to refill if needed.
+        Returns the seconds spent waiting; raises LLMDeadlineExceededError if the
+        tokens will not be available before `deadline` (a time.monotonic() value).
+        """
+        if not self.capacity:
+            return 0.0
+        # A single request larger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        started = time.monotonic()
+        with self._condition:
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return time.monotonic() - started
+                wait = (amount - self._tokens) / self.refill_per_second
+                if deadline is not None and time.monotonic() + wait > deadline:
+                    raise LLMDeadlineExceededError("Rate limit wait would exceed the call deadline.")
+                self._condition.wait(wait)
+
+    def consume(self, amount):
+        """Charge tokens used after the fact (e.g. response tokens); the balance may go negative"""
+        if not self.capacity or amount <= 0:
+            return
+        with self._condition:
+            self._refill()
+            self._tokens -= amount
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds; then lets one trial call through (half open) and
+    closes again if it succeeds.
+    """
+
+    def __init__(self, failure_threshold=DEFAULT_CIRCUIT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = CIRCUIT_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == CIRCUIT_OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return CIRCUIT_HALF_OPEN
+            return self._state
+
+    def before_call(self):
+        """Raise LLMUnavailableError if calls are currently rejected"""
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            if self._state == CIRCUIT_CLOSED:
+                return
+            retry_in = self.reset_timeout - (time.monotonic() - self._opened_at)
+            if self._state == CIRCUIT_OPEN and retry_in > 0:
+                raise LLMUnavailableError(
+                    f"Gemini API is unavailable after repeated failures; retrying in {retry_in:.0f}s."
+                )
+            # Half open: allow a single trial call
+            if self._trial_in_flight:
+                raise LLMUnavailableError("Gemini API is recovering; a trial call is in progress.")
+            self._state = CIRCUIT_HALF_OPEN
+            self._trial_in_flight = True
+
+    def abandon_call(self):
+        """A call admitted by before_call() never reached the upstream"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._state = CIRCUIT_CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == CIRCUIT_HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != CIRCUIT_OPEN:
+                    logger.warning(f"Circuit breaker opened after {self._failures} consecutive failures.")
+                self._state = CIRCUIT_OPEN
+                self._opened_at = time.monotonic()
+
+
+class ResilientLLMClient:
+    """
+    Wraps a GenerativeModel with rate limiting, bounded concurrency, retries,
+    deadlines and a circuit breaker. Safe to share between threads.
+    """
+
+    def __init__(self, model, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff_base=DEFAULT_BACKOFF_BASE_SECONDS,
+                 backoff_max=DEFAULT_BACKOFF_MAX_SECONDS, call_timeout=DEFAULT_CALL_TIMEOUT_SECONDS,
+                 circuit_breaker=None):
+        self.model = model
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.call_timeout = call_timeout
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+
+        self._stats_lock = threading.Lock()
+        self._stats = {"calls": 0, "retries": 0, "failures": 0, "rejected": 0, "throttled_seconds": 0.0}
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["throttled_seconds"] = round(stats["throttled_seconds"], 3)
+        stats["circuit_state"] = self.circuit_breaker.state
+        return stats
+
+    def _backoff_delay(self, attempt):
+        """Full jitter: a random delay up to the exponential backoff for this attempt"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _acquire_slot(self, deadline):
+        if self._slots is None:
+            return
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        if not self._slots.acquire(timeout=timeout):
+            raise LLMDeadlineExceededError("Timed out waiting for a free Gemini call slot.")
+
+    def _release_slot(self):
+        if self._slots is not None:
+            self._slots.release()
+
+    def _throttle(self, prompt, deadline):
+        waited = self.request_bucket.acquire(1, deadline)
+        waited += self.token_bucket.acquire(estimate_tokens(prompt), deadline)
+        if waited:
+            self._count("throttled_seconds", waited)
+
+    @staticmethod
+    def _usage_tokens(usage, prompt):
+        """(input, output) tokens reported by Gemini; the input falls back to an estimate"""
+        input_tokens = (getattr(usage, "prompt_token_count", 0) or 0) if usage is not None else 0
+        output_tokens = (getattr(usage, "candidates_token_count", 0) or 0) if usage is not None else 0
+        return input_tokens or estimate_tokens(prompt), output_tokens
+
+    def _charge_response(self, output_tokens):
+        """Charge the response tokens against the tokens-per-minute quota"""
+        if output_tokens:
+            self.token_bucket.consume(output_tokens)
+
+    def _call_with_retries(self, call, prompt, timeout, keep_slot=False):
+        """
+        Run `call(remaining_seconds)` under the breaker, concurrency cap, limiter and
+        retry policy. With `keep_slot` the concurrency slot stays taken after a
+        successful call and the caller must release it (see stream_content).
+        """
+        timeout = self.call_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout if timeout else None
+        attempt = 0
+        while True:
+            try:
+                self.circuit_breaker.before_call()
+            except LLMUnavailableError:
+                self._count("rejected")
+                raise
+            try:
+                self._acquire_slot(deadline)
+            except LLMDeadlineExceededError:
+                self.circuit_breaker.abandon_call()
+                self._count("failures")
+                raise
+            release_slot = True
+            try:
+                self._throttle(prompt, deadline)
+                remaining = None if deadline is None else deadline - time.monotonic()
+                self._count("calls")
+                result = call(remaining)
+            except LLMDeadlineExceededError:
+                # Ran out of time waiting for quota; the upstream was not called
+                self.circuit_breaker.abandon_call()
+                self._count("failures")
+                raise
+            except retryable_errors() as e:
+                self.circuit_breaker.record_failure()
+                delay = self._backoff_delay(attempt)
+                attempt += 1
+                out_of_time = deadline is not None and time.monotonic() + delay > deadline
+                if attempt > self.max_retries or out_of_time:
+                    self._count("failures")
+                    if out_of_time:
+                        raise LLMDeadlineExceededError(f"Gemini call did not succeed before its deadline: {e}") from e
+                    raise
+                logger.warning(f"Retryable Gemini error ({type(e).__name__}: {e}); retry {attempt}/{self.max_retries} in {delay:.1f}s.")
+                self._count("retries")
+            except Exception:
+                # Not retryable (bad request, safety block, ...); the upstream did answer
+                self.circuit_breaker.record_success()
+                self._count("failures")
+                raise
+            else:
+                self.circuit_breaker.record_success()
+                release_slot = not keep_slot
+                return result
+            finally:
+                if release_slot:
+                    self._release_slot()
+            time.sleep(delay)
+
+    @staticmethod
+    def _request_options(remaining):
+        return {"timeout": max(1.0, remaining)} if remaining is not None else None
+
+    def generate_content(self, prompt, timeout=None):
+        """Generate a complete response; `timeout` (seconds) bounds waiting, the call and its retries"""
+        def call(remaining):
+            return self.model.generate_content(prompt, request_options=self._request_options(remaining))
+
+        started = time.perf_counter()
+        response = self._call_with_retries(call, prompt, timeout)
+        input_tokens, output_tokens = self._usage_tokens(getattr(response, "usage_metadata", None), prompt)
+        self._charge_response(output_tokens)
+        record_llm_call("complete", time.perf_counter() - started,
+                        input_tokens=input_tokens, output_tokens=output_tokens)
+        return response
+
+    def stream_content(self, prompt, timeout=None):
+        """
+        Yield response chunks as they arrive. Retries only happen before the first
+        chunk; once text has been yielded an error is raised to the caller.
+        """
+        def call(remaining):
+            response = self.model.generate_content(prompt, stream=True, request_options=self._request_options(remaining))
+            iterator = iter(response)
+            # Pull the first chunk inside the retry loop, where connection errors surface
+            return response, iterator, next(iterator, None)
+
+        # The concurrency slot stays taken until the stream is exhausted or closed
+        started = time.perf_counter()
+        response, iterator, first_chunk = self._call_with_retries(call, prompt, timeout, keep_slot=True)
+        ttft = time.perf_counter() - started
+        usage = None
+        try:
+            if first_chunk is None:
+                return
+            yield first_chunk
+            usage = getattr(first_chunk, "usage_metadata", None) or usage
+            for chunk in iterator:
+                # Gemini reports the usage on the stream's chunks; the last one is complete
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                yield chunk
+            input_tokens, output_tokens = self._usage_tokens(usage, prompt)
+            self._charge_response(output_tokens)
+            record_llm_call("stream", time.perf_counter() - started, ttft=ttft,
+                            input_tokens=input_tokens, output_tokens=output_tokens)
+        finally:
+            self._release_slot()
+
+    def count_tokens(self, prompt):
+        return self.model.count_tokens(prompt)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _env_number(name, default, cast=float):
+    return cast(os.getenv(name, default))
+
+
+def get_llm_client(model, model_name):
+    """
+    Return the process-wide client for `model_name`, creating it around `model`
+    on first use, so every generator and request shares the same limits.
+    Limits of 0 disable the corresponding check.
+    """
+    with _clients_lock:
+        client = _clients.get(model_name)
+        if client is None:
+            client = ResilientLLMClient(
+                model,
+                requests_per_minute=_env_number("GEMINI_REQUESTS_PER_MINUTE", DEFAULT_REQUESTS_PER_MINUTE),
+                tokens_per_minute=_env_number("GEMINI_TOKENS_PER_MINUTE", DEFAULT_TOKENS_PER_MINUTE),
+                max_concurrency=_env_number("GEMINI_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY, int),
+                max_retries=_env_number("GEMINI_MAX_RETRIES", DEFAULT_MAX_RETRIES, int),
+                backoff_base=_env_number("GEMINI_BACKOFF_BASE_SECONDS", DEFAULT_BACKOFF_BASE_SECONDS),
+                backoff_max=_env_number("GEMINI_BACKOFF_MAX_SECONDS", DEFAULT_BACKOFF_MAX_SECONDS),
+                call_timeout=_env_number("GEMINI_CALL_TIMEOUT_SECONDS", DEFAULT_CALL_TIMEOUT_SECONDS),
+                circuit_breaker=CircuitBreaker(
+                    failure_threshold=_env_number("GEMINI_CIRCUIT_FAILURE_THRESHOLD", DEFAULT_CIRCUIT_FAILURE_THRESHOLD, int),
+                    reset_timeout=_env_number("GEMINI_CIRCUIT_RESET_SECONDS", DEFAULT_CIRCUIT_RESET_SECONDS),
+                ),
+            )
+            _clients[model_name] = client
+        return client
@@ -1,10 +1,20 @@
 # from gxp_doc_generator import GxPDocumentGenerator
-from gxp_doc_generator_gemini import GxPDocumentGenerator
+import sys
+from pathlib import Path
+
+# Allow running as a script (python src/main_check.py) with the project-level imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.gxp_doc_generator_gemini import GxPDocumentGenerator
+
+DATA_PATH = Path(__file__).parent.parent / 'data'
 
 def main():
     try:
         generator = GxPDocumentGenerator()
-        output_file = generator.generate()
+        output_file = generator.generate(
+            sorted((DATA_PATH / 'userstories').glob('BLOOD-*.txt')),
+            DATA_PATH / 'database-design' / 'blood_collection_schema.sql'
+        )
         print(f"GxP documentation generated successfully at: {output_file}")
     except Exception as e:
         print(f"Error: {str(e)}")
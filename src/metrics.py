@@ -0,0 +1,287 @@
+# src/metrics.py
+"""
+Per-stage generation timings and Prometheus metrics.
+
+A GenerationTimings object collects how long each stage of one generation took
+(prompt_load, input_load, prompt_build, content, llm, repair, parse, render,
+write, total) plus the LLM token counts, and llm_ttft when the generation
+streamed from Gemini. The generator makes it the current
+timings for its thread with use_timings(); code at any depth records into it
+with timed_stage() and record_llm_call() without passing it around. Worker
+threads see it when started through run_in_context().
+
+When a generation ends its timings are added to the process-wide histograms,
+which /metrics exposes in the Prometheus text format. The same timings become
+the Server-Timing header of the /generate response. /generate makes only
+non-streaming Gemini calls, so its header never has llm_ttft. /generate/stream
+sends its headers before generating and has no Server-Timing; the time to first
+token of its streamed calls is only recorded in the gxp_llm_time_to_first_token_seconds
+histogram. Stages timed in a worker process are sent back and added with
+record_stages().
+"""
+import math
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Histogram buckets: seconds for latencies, tokens for prompt/response sizes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+class Histogram:
+    """A Prometheus histogram with optional labels"""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        lines = []
+        for key, values in sorted(series.items()):
+            for bound, count in zip(self.buckets, values):
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(values[-2])}")
+            lines.append(f"{self.name}_count{labels} {values[-1]}")
+        return lines
+
+
+class Counter:
+    """A monotonically increasing Prometheus counter with optional labels"""
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """Register a callable returning extra (name, type, help, [(labels dict, value)]) tuples at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        for collector in self._collectors:
+            for name, metric_type, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+GENERATION_SECONDS = REGISTRY.register(Histogram(
+    "gxp_generation_seconds", "Total duration of a document generation.", ["mode", "status"]
+))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "gxp_generation_stage_seconds",
+    "Time spent per generation stage (llm is summed over all calls of the generation).", ["stage"]
+))
+LLM_CALL_SECONDS = REGISTRY.register(Histogram(
+    "gxp_llm_call_seconds", "Duration of one Gemini call, including quota waits and retries.", ["kind"]
+))
+LLM_TTFT_SECONDS = REGISTRY.register(Histogram(
+    "gxp_llm_time_to_first_token_seconds", "Time until the first chunk of a streamed Gemini response."
+))
+LLM_TOKENS = REGISTRY.register(Histogram(
+    "gxp_llm_tokens", "Tokens per Gemini call.", ["direction"], buckets=TOKEN_BUCKETS
+))
+LLM_TOKENS_TOTAL = REGISTRY.register(Counter(
+    "gxp_llm_tokens_total", "Tokens sent to and received from Gemini.", ["direction"]
+))
+SECTION_REPAIRS = REGISTRY.register(Counter(
+    "gxp_section_repairs_total",
+    "Malformed top-level sections by repair outcome (renumbered, repaired, improved, failed).", ["outcome"]
+))
+
+
+class GenerationTimings:
+    """Stage durations (seconds) and token counts of one generation"""
+
+    def __init__(self):
+        self.stages = {}
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.llm_calls = 0
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        """Add `seconds` to `stage` (stages such as llm or prompt_build can occur several times)"""
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_llm_call(self, seconds, ttft, input_tokens, output_tokens):
+        with self._lock:
+            self.stages["llm"] = self.stages.get("llm", 0.0) + seconds
+            if ttft is not None and "llm_ttft" not in self.stages:
+                # Time to the first token of the generation's first streamed call
+                self.stages["llm_ttft"] = ttft
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+            self.llm_calls += 1
+
+    def observe(self, mode, status):
+        """Add this generation to the process-wide histograms"""
+        with self._lock:
+            stages = dict(self.stages)
+        for stage, seconds in stages.items():
+            if stage == "total":
+                GENERATION_SECONDS.observe(seconds, mode=mode, status=status)
+            elif stage != "llm_ttft":
+                STAGE_SECONDS.observe(seconds, stage=stage)
+
+    def server_timing(self):
+        """Value of a Server-Timing header (durations in milliseconds)"""
+        with self._lock:
+            stages = dict(self.stages)
+            tokens = (self.input_tokens, self.output_tokens, self.llm_calls)
+        entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in stages.items()]
+        if tokens[2]:
+            entries.append(f'llm_tokens;desc="in={tokens[0]} out={tokens[1]} calls={tokens[2]}"')
+        return ", ".join(entries)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "stages": {stage: round(seconds, 4) for stage, seconds in self.stages.items()},
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "llm_calls": self.llm_calls,
+            }
+
+
+_current_timings = contextvars.ContextVar("gxp_generation_timings", default=None)
+
+
+def current_timings():
+    return _current_timings.get()
+
+
+@contextmanager
+def use_timings(timings):
+    """Make `timings` the current GenerationTimings for this thread/context"""
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+@contextmanager
+def timed_stage(stage):
+    """
+    Time the enclosed block as `stage` of the current generation, or straight
+    into the stage histogram when no generation is being timed.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.add(stage, elapsed)
+        else:
+            STAGE_SECONDS.observe(elapsed, stage=stage)
+
+
+def record_stages(stages):
+    """Add stage durations measured elsewhere (e.g. in a worker process) to the current generation"""
+    timings = _current_timings.get()
+    for stage, seconds in stages.items():
+        if timings is not None:
+            timings.add(stage, seconds)
+        else:
+            STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+def record_llm_call(kind, seconds, ttft=None, input_tokens=0, output_tokens=0):
+    """Record one Gemini call ("complete" or "stream") in the histograms and the current generation"""
+    LLM_CALL_SECONDS.observe(seconds, kind=kind)
+    if ttft is not None:
+        LLM_TTFT_SECONDS.observe(ttft)
+    for direction, tokens in (("input", input_tokens), ("output", output_tokens)):
+        if tokens:
+            LLM_TOKENS.observe(tokens, direction=direction)
+            LLM_TOKENS_TOTAL.inc(tokens, direction=direction)
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add_llm_call(seconds, ttft, input_tokens, output_tokens)
+
+
+def run_in_context(executor, function, *args):
+    """Submit `function` to `executor` so it sees the caller's current timings"""
+    return executor.submit(contextvars.copy_context().run, function, *args)
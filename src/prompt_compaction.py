@@ -0,0 +1,145 @@
+# src/prompt_compaction.py
+"""
+Prompt compaction: shrink the inputs embedded in a generation prompt without
+changing what they say, and estimate prompt sizes in tokens.
+
+- minify_ddl() drops standalone SQL comments and formatting whitespace, writing
+  each statement on one line (inline column notes such as "-- (Routine/STAT)"
+  are kept as /*...*/ since they document allowed values).
+- compact_user_stories() drops story metadata that does not affect the design
+  (story points), collapses blank lines, and moves lines repeated verbatim in
+  every story into a single shared block.
+- dedupe_instructions() removes numbered instructions that repeat an earlier one.
+"""
+import re
+import math
+from functools import lru_cache
+
+from src.epics import split_stories, STORY_START_PATTERN, EPIC_PATTERN
+
+# Rule of thumb for Gemini models: one token is about four characters
+CHARS_PER_TOKEN = 4
+# Story fields that carry no information for a functional design document
+STORY_METADATA_PATTERN = re.compile(r'^\s*Story\s+Points\s*:', re.IGNORECASE)
+# Lines that structure a story and must stay in every story even if shared
+STORY_LABEL_PATTERN = re.compile(r'^[^:]{1,60}:\s*$')
+# Numbered instruction at the start of a line, e.g. "3. Use plain text only"
+INSTRUCTION_PATTERN = re.compile(r'^\d+\.\s+(\S.*)$')
+# SQL string literals, quoted identifiers and comments
+SQL_TOKEN_PATTERN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+SHARED_STORY_LINES_HEADING = "Applies to all stories:"
+
+
+class PromptBudgetExceededError(ValueError):
+    """Raised when a prompt is larger than the configured per-request token budget"""
+
+    def __init__(self, tokens, budget):
+        self.tokens = tokens
+        self.budget = budget
+        super().__init__(
+            f"Prompt is about {tokens} tokens, which exceeds the per-request budget of {budget} tokens."
+        )
+
+
+def estimate_tokens(text):
+    """Approximate token count of `text` (no API call)"""
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def _collapse_blank_lines(lines):
+    """Strip trailing whitespace and reduce runs of blank lines to one"""
+    result = []
+    for line in lines:
+        line = line.rstrip()
+        if not line and (not result or not result[-1]):
+            continue
+        result.append(line)
+    while result and not result[-1]:
+        result.pop()
+    return result
+
+
+def _minify_sql_code(code):
+    """Collapse whitespace in SQL code that contains no literals or comments"""
+    code = re.sub(r'\s+', ' ', code)
+    code = re.sub(r'\s*([,;])\s*', r'\1', code)
+    code = re.sub(r'\(\s+', '(', code)
+    return re.sub(r'\s+\)', ')', code)
+
+
+@lru_cache(maxsize=16)
+def minify_ddl(db_design):
+    """Return the DDL with comments and formatting whitespace removed, one statement per line"""
+    if not db_design:
+        return db_design
+    parts = []
+    position = 0
+    for match in SQL_TOKEN_PATTERN.finditer(db_design):
+        parts.append(_minify_sql_code(db_design[position:match.start()]))
+        token = match.group(0)
+        if token.startswith('--'):
+            line_start = db_design.rfind('\n', 0, match.start()) + 1
+            code_before = db_design[line_start:match.start()].strip()
+            note = token[2:].strip()
+            # Inline notes document a column; comments on their own line only label the statement
+            if note and code_before and not code_before.endswith(';'):
+                parts.append(f"/*{note}*/")
+        elif token.startswith('/*'):
+            pass
+        else:
+            parts.append(token)
+        position = match.end()
+    parts.append(_minify_sql_code(db_design[position:]))
+    minified = "".join(parts)
+    # Move notes that followed a column's comma in front of it, so they stay with their column
+    minified = re.sub(r',(/\*.*?\*/)\s*', r'\1,', minified)
+    return "\n".join(statement.strip() + ";" for statement in minified.split(";") if statement.strip())
+
+
+def compact_user_stories(user_stories_text):
+    """Return the user stories text without metadata fields, redundant blank lines and shared boilerplate"""
+    stories = split_stories([user_stories_text or ""])
+    compacted = [
+        [line for line in story.splitlines() if not STORY_METADATA_PATTERN.match(line)]
+        for story in stories
+    ]
+
+    shared = []
+    if len(compacted) > 2:
+        # Lines that appear verbatim in every story (a template footer, a common
+        # disclaimer) are stated once instead of once per story
+        common = set.intersection(*(
+            {line.strip() for line in story if line.strip()} for story in compacted
+        ))
+        shared = sorted(
+            line for line in common
+            if not STORY_LABEL_PATTERN.match(line)
+            and not STORY_START_PATTERN.match(line) and not EPIC_PATTERN.match(line)
+        )
+        if shared:
+            shared_set = set(shared)
+            compacted = [[line for line in story if line.strip() not in shared_set] for story in compacted]
+
+    blocks = ["\n".join(_collapse_blank_lines(story)) for story in compacted]
+    if shared:
+        blocks.insert(0, "\n".join([SHARED_STORY_LINES_HEADING] + shared))
+    return "\n\n".join(block for block in blocks if block)
+
+
+@lru_cache(maxsize=16)
+def dedupe_instructions(system_prompt):
+    """Return the system prompt without numbered instructions that repeat an earlier one"""
+    if not system_prompt:
+        return system_prompt
+    seen = set()
+    lines = []
+    for line in system_prompt.splitlines():
+        match = INSTRUCTION_PATTERN.match(line.rstrip())
+        if match:
+            instruction = re.sub(r'\s+', ' ', match.group(1)).strip().lower()
+            if instruction in seen:
+                continue
+            seen.add(instruction)
+        lines.append(line)
+    return "\n".join(_collapse_blank_lines(lines))
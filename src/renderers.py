@@ -0,0 +1,204 @@
+# src/renderers.py
+"""
+Output renderers for a parsed GxP document.
+
+Each renderer turns the shared document model (a ParsedDocument, see
+src/section_parser.py) into one output format, so the generated content is
+parsed once no matter how many formats are produced. Renderers are registered
+by format name with their file suffix and media type; render_formats() renders
+several formats of the same document concurrently. python-docx is imported
+only when a DOCX document is rendered.
+"""
+import re
+import html
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from src.section_parser import HEADING, CONTENT
+from src.metrics import timed_stage, run_in_context
+
+OUTPUT_FORMAT_TXT = "txt"
+OUTPUT_FORMAT_DOCX = "docx"
+OUTPUT_FORMAT_MD = "md"
+OUTPUT_FORMAT_HTML = "html"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+DEFAULT_FONT_NAME = "Arial"
+DOCUMENT_TITLE = "GxP Function Detail Design Document"
+# Markdown and HTML have six heading levels; deeper headings are rendered as bold lines
+MAX_MARKUP_HEADING_LEVEL = 6
+MARKDOWN_LIST_NUMBER_PATTERN = re.compile(r'^(\d+)([.)])')
+# Headings listed in the HTML table of contents
+HTML_TOC_MAX_LEVEL = 3
+
+
+class Renderer:
+    """A registered output format"""
+
+    def __init__(self, name, suffix, media_type, render):
+        self.name = name
+        self.suffix = suffix
+        self.media_type = media_type
+        self.render = render  # render(document, output_file, generated_at, font_name) -> output_file
+
+    def __repr__(self):
+        return f"Renderer({self.name!r}, suffix={self.suffix!r})"
+
+
+RENDERERS = {}
+
+
+def register_renderer(name, suffix, media_type):
+    """Decorator registering `render(document, output_file, generated_at, font_name)` for a format"""
+    def decorator(render):
+        RENDERERS[name] = Renderer(name, suffix, media_type, render)
+        return render
+    return decorator
+
+
+def get_renderer(name):
+    renderer = RENDERERS.get(name)
+    if renderer is None:
+        raise ValueError(f"Unknown output format '{name}'. Expected one of: {', '.join(RENDERERS)}.")
+    return renderer
+
+
+def format_txt_lines(section, previous_section=None):
+    """Return the TXT output lines for one parsed section, given the section before it"""
+    lines = []
+    # Add blank line between different top-level sections (level 1)
+    # or before a heading that's not immediately following another heading
+    if section.type == HEADING and previous_section is not None:
+        # Add space before a new top-level heading if not the first heading
+        if section.level == 1 and previous_section.level > 0:
+            lines.append('')
+        # Add space before a heading if the previous line was content
+        elif previous_section.type == CONTENT:
+            lines.append('')
+
+    # Use 4 spaces per indent level
+    indent = '    ' * section.indent_level
+    lines.append(f"{indent}{section.text}")
+    return lines
+
+
+def _write_text(output_file, text):
+    with timed_stage("write"), open(output_file, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return output_file
+
+
+@register_renderer(OUTPUT_FORMAT_TXT, ".txt", "text/plain")
+def render_txt(document, output_file, generated_at=None, font_name=None):
+    """Plain text: title, timestamp, then every line indented four spaces per level"""
+    generated_at = generated_at or datetime.now()
+    output_lines = [DOCUMENT_TITLE, '', f'Generated on: {generated_at.strftime(TIMESTAMP_FORMAT)}', '']
+    previous_section = None
+    for section in document:
+        output_lines.extend(format_txt_lines(section, previous_section))
+        previous_section = section
+    return _write_text(output_file, '\n'.join(output_lines))
+
+
+@register_renderer(OUTPUT_FORMAT_DOCX, ".docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+def render_word(document, output_file, generated_at=None, font_name=None):
+    """Word document with a linked table of contents (see src/docx_renderer.py)"""
+    from src.docx_renderer import render_docx
+    return render_docx(document, output_file, font_name=font_name or DEFAULT_FONT_NAME, generated_at=generated_at)
+
+
+def _escape_markdown(text):
+    """Escape the characters of a content line that Markdown would read as markup"""
+    text = text.replace('\\', '\\\\').replace('*', '\\*').replace('_', '\\_')
+    if text[:1] in ('#', '>', '-', '+', '|'):
+        return '\\' + text
+    # "2. Provider selects a test" would otherwise become an ordered list item
+    return MARKDOWN_LIST_NUMBER_PATTERN.sub(r'\1\\\2', text)
+
+
+@register_renderer(OUTPUT_FORMAT_MD, ".md", "text/markdown")
+def render_markdown(document, output_file, generated_at=None, font_name=None):
+    """Markdown: the title as '#', headings one level below it, content as paragraphs"""
+    generated_at = generated_at or datetime.now()
+    output_lines = [f"# {DOCUMENT_TITLE}", '', f"_Generated on: {generated_at.strftime(TIMESTAMP_FORMAT)}_"]
+    kinds, levels, texts = document.kinds, document.levels, document.texts
+    for kind, level, text in zip(kinds, levels, texts):
+        output_lines.append('')
+        if not kind:
+            output_lines.append(_escape_markdown(text))
+        elif level + 1 <= MAX_MARKUP_HEADING_LEVEL:
+            # Heading text starts with its number ("1.2. Title"), which is fine after the '#'s
+            output_lines.append('#' * (level + 1) + ' ' + text.replace('#', '\\#'))
+        else:
+            output_lines.append(f"**{_escape_markdown(text)}**")
+    return _write_text(output_file, '\n'.join(output_lines) + '\n')
+
+
+HTML_STYLE = """body{font-family:Arial,sans-serif;max-width:60em;margin:2em auto;line-height:1.4}
+nav li{list-style:none}.level-2{margin-left:1.5em}.level-3{margin-left:3em}
+h1,h2,h3,h4,h5,h6,p.heading{margin-bottom:.3em}p.heading{font-weight:bold}"""
+
+
+@register_renderer(OUTPUT_FORMAT_HTML, ".html", "text/html")
+def render_html(document, output_file, generated_at=None, font_name=None):
+    """Standalone HTML page with a table of contents linked to the headings"""
+    generated_at = generated_at or datetime.now()
+    escape = html.escape
+    kinds, levels, texts = document.kinds, document.levels, document.texts
+    title = escape(DOCUMENT_TITLE)
+    parts = [
+        '<!DOCTYPE html>',
+        '<html lang="en"><head><meta charset="utf-8">',
+        f'<title>{title}</title>',
+        f'<style>{HTML_STYLE}</style>',
+        '</head><body>',
+        f'<h1>{title}</h1>',
+        f'<p><em>Generated on: {generated_at.strftime(TIMESTAMP_FORMAT)}</em></p>',
+        '<nav><h2>Table of Contents</h2><ul>',
+    ]
+    for i in document.heading_indices():
+        if levels[i] <= HTML_TOC_MAX_LEVEL:
+            parts.append(f'<li class="level-{levels[i]}"><a href="#s{i}">{escape(texts[i])}</a></li>')
+    parts.append('</ul></nav>')
+
+    for i, (kind, level, text) in enumerate(zip(kinds, levels, texts)):
+        # Indent like the other formats: content one level below its heading
+        margin = (level - kind) * 1.5
+        style = f' style="margin-left:{margin:g}em"' if margin else ''
+        if not kind:
+            parts.append(f'<p{style}>{escape(text)}</p>')
+        elif level + 1 <= MAX_MARKUP_HEADING_LEVEL:
+            tag = f"h{level + 1}"
+            parts.append(f'<{tag} id="s{i}"{style}>{escape(text)}</{tag}>')
+        else:
+            parts.append(f'<p class="heading" id="s{i}"{style}>{escape(text)}</p>')
+    parts.append('</body></html>')
+    return _write_text(output_file, '\n'.join(parts) + '\n')
+
+
+OUTPUT_FORMATS = tuple(RENDERERS)
+
+
+def render_formats(document, output_files, generated_at=None, font_name=None, max_workers=None, pool=None):
+    """
+    Render `document` into every format of `output_files` ({format: path})
+    concurrently and return {format: path}. All formats share one timestamp.
+    With a `pool` (src/cpu_pool.py) each format is rendered in a worker process,
+    otherwise on threads of this process.
+    """
+    generated_at = generated_at or datetime.now()
+    renderers = {name: get_renderer(name) for name in output_files}
+    if pool is not None:
+        results = pool.map([
+            (renderer.render, (document, output_files[name], generated_at, font_name))
+            for name, renderer in renderers.items()
+        ])
+        return dict(zip(renderers, results))
+    if len(renderers) == 1:
+        name, renderer = next(iter(renderers.items()))
+        return {name: renderer.render(document, output_files[name], generated_at, font_name)}
+    with ThreadPoolExecutor(max_workers=max_workers or len(renderers), thread_name_prefix="gxp-render") as executor:
+        futures = {
+            name: run_in_context(executor, renderer.render, document, output_files[name], generated_at, font_name)
+            for name, renderer in renderers.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
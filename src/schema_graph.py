@@ -0,0 +1,260 @@
+# src/schema_graph.py
+"""
+Helpers for working with the database design (DDL) passed to the generator.
+"""
+import re
+from functools import lru_cache
+
+# "CREATE TABLE name (" ... up to the statement terminator
+CREATE_TABLE_PATTERN = re.compile(
+    r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?["`\[]?(\w+)["`\]]?\s*\(.*?\)\s*;',
+    re.IGNORECASE | re.DOTALL
+)
+# Statements acting on one table: "CREATE [UNIQUE] INDEX ... ON table(...)" and "ALTER TABLE table ..."
+TABLE_DEPENDENT_STATEMENT_PATTERN = re.compile(
+    r'^[ \t]*(?:CREATE\s+(?:UNIQUE\s+)?INDEX\b[^;]*?\bON\s+(?:ONLY\s+)?|ALTER\s+TABLE\s+(?:IF\s+EXISTS\s+)?(?:ONLY\s+)?)'
+    r'["`\[]?(\w+)["`\]]?[^;]*;',
+    re.IGNORECASE | re.MULTILINE
+)
+
+
+def split_create_table_statements(db_design):
+    """Return {table_name: CREATE TABLE statement} for every table in the DDL, in file order"""
+    return {
+        match.group(1).lower(): match.group(0).strip()
+        for match in CREATE_TABLE_PATTERN.finditer(db_design or "")
+    }
+
+
+def split_table_dependent_statements(db_design):
+    """Return [(table_name, statement)] for the CREATE INDEX ... ON / ALTER TABLE statements of the DDL, in file order"""
+    return [
+        (match.group(1).lower(), match.group(0).strip())
+        for match in TABLE_DEPENDENT_STATEMENT_PATTERN.finditer(db_design or "")
+    ]
+
+
+def table_name_variants(table_name):
+    """
+    Phrases under which a table may be mentioned in story text, e.g.
+    "blood_collection_orders" -> {"blood_collection_orders", "blood collection orders", "blood collection order"}.
+    """
+    spaced = table_name.replace('_', ' ')
+    variants = {table_name, spaced}
+    if spaced.endswith('ies'):
+        variants.add(spaced[:-3] + 'y')
+    elif spaced.endswith('s'):
+        variants.add(spaced[:-1])
+    return variants
+
+
+def find_referenced_tables(text, table_names):
+    """Return the table names (in the given order) that are mentioned in `text`"""
+    normalized = re.sub(r'[\s_]+', ' ', (text or "").lower())
+    referenced = []
+    for table_name in table_names:
+        for variant in table_name_variants(table_name):
+            if re.search(r'\b' + re.escape(variant.replace('_', ' ')) + r'\b', normalized):
+                referenced.append(table_name)
+                break
+    return referenced
+
+
+# Inline "REFERENCES table(column)" of a column definition
+INLINE_REFERENCE_PATTERN = re.compile(r'\bREFERENCES\s+["`\[]?(\w+)["`\]]?\s*(?:\(\s*["`\[]?(\w+)["`\]]?\s*\))?', re.IGNORECASE)
+# Table-level "FOREIGN KEY (column) REFERENCES table(column)"
+FOREIGN_KEY_PATTERN = re.compile(
+    r'^\s*(?:CONSTRAINT\s+\w+\s+)?FOREIGN\s+KEY\s*\(\s*["`\[]?(\w+)["`\]]?[^)]*\)\s*'
+    r'REFERENCES\s+["`\[]?(\w+)["`\]]?\s*(?:\(\s*["`\[]?(\w+)["`\]]?)?',
+    re.IGNORECASE
+)
+# A table needs more referencing tables than this (and a third of the schema) to count as a hub
+HUB_MIN_REFERENCES = 3
+# Table-level constraints that are not column definitions
+TABLE_CONSTRAINT_PATTERN = re.compile(r'^\s*(CONSTRAINT|PRIMARY\s+KEY|FOREIGN\s+KEY|UNIQUE|CHECK|INDEX|KEY)\b', re.IGNORECASE)
+
+
+def _stem_words(text):
+    """Lower-case words with a crude plural/-ing suffix removal ("tracking" -> "track")"""
+    words = []
+    for word in re.findall(r'[a-z0-9]+', text.lower()):
+        for suffix in ('ing', 'ies', 'es', 's'):
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                word = word[:-len(suffix)] + ('y' if suffix == 'ies' else '')
+                break
+        words.append(word)
+    return words
+
+
+class Column:
+    """A column of a parsed table, with the (table, column) it references if it is a foreign key"""
+
+    def __init__(self, name, definition, references=None):
+        self.name = name
+        self.definition = definition
+        self.references = references
+
+    def __repr__(self):
+        return f"Column({self.name!r}, references={self.references!r})"
+
+
+class Table:
+    """A parsed CREATE TABLE statement"""
+
+    def __init__(self, name, statement):
+        self.name = name
+        self.statement = statement
+        self.columns = []
+        self.foreign_keys = []  # (column, referenced table, referenced column)
+
+    def __repr__(self):
+        return f"Table({self.name!r}, columns={len(self.columns)}, foreign_keys={len(self.foreign_keys)})"
+
+
+def _split_top_level(body):
+    """Split a column list on commas that are not inside parentheses, e.g. DECIMAL(5,2)"""
+    parts = []
+    depth = 0
+    current = []
+    for char in body:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append("".join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _strip_line_comments(sql):
+    return re.sub(r'--[^\n]*', '', sql)
+
+
+def parse_table(name, statement):
+    """Parse the columns and foreign keys of one CREATE TABLE statement"""
+    table = Table(name, statement)
+    body = _strip_line_comments(statement)
+    body = body[body.index('(') + 1:body.rindex(')')]
+    for definition in _split_top_level(body):
+        foreign_key = FOREIGN_KEY_PATTERN.match(definition)
+        if foreign_key:
+            column, referenced_table, referenced_column = foreign_key.groups()
+            table.foreign_keys.append((column.lower(), referenced_table.lower(), (referenced_column or "").lower() or None))
+            continue
+        if TABLE_CONSTRAINT_PATTERN.match(definition):
+            continue
+        column_name = definition.split()[0].strip('"`[]').lower()
+        reference = INLINE_REFERENCE_PATTERN.search(definition)
+        references = None
+        if reference:
+            references = (reference.group(1).lower(), (reference.group(2) or "").lower() or None)
+            table.foreign_keys.append((column_name, *references))
+        table.columns.append(Column(column_name, definition, references))
+    return table
+
+
+class SchemaGraph:
+    """
+    Tables, columns and foreign keys of a DDL script.
+
+    Tables are nodes and foreign keys undirected edges, so the context needed for
+    a piece of text is the tables it mentions plus their direct FK neighbours.
+    """
+
+    def __init__(self, db_design):
+        self.db_design = db_design or ""
+        self.tables = {}
+        for name, statement in split_create_table_statements(self.db_design).items():
+            try:
+                self.tables[name] = parse_table(name, statement)
+            except ValueError:
+                # Unparseable column list; keep the table without columns
+                self.tables[name] = Table(name, statement)
+        # Indexes and ALTER TABLE statements, which go with their table into a pruned schema
+        self.dependent_statements = [
+            (name, statement) for name, statement in split_table_dependent_statements(self.db_design)
+            if name in self.tables
+        ]
+        # Tables each table references, and tables referencing it
+        self.references = {name: set() for name in self.tables}
+        self.referenced_by = {name: set() for name in self.tables}
+        for name, table in self.tables.items():
+            for _, referenced_table, _ in table.foreign_keys:
+                if referenced_table in self.tables and referenced_table != name:
+                    self.references[name].add(referenced_table)
+                    self.referenced_by[referenced_table].add(name)
+        # A table referenced by many others (users, providers) would pull most of the
+        # schema into every prompt, so its referencing tables are not neighbours
+        self.hub_threshold = max(HUB_MIN_REFERENCES, len(self.tables) // 3)
+
+    def __len__(self):
+        return len(self.tables)
+
+    def is_hub(self, table_name):
+        return len(self.referenced_by.get(table_name, ())) > self.hub_threshold
+
+    def neighbours(self, table_name):
+        """Tables that `table_name` references, plus the tables referencing it unless it is a hub"""
+        neighbours = set(self.references.get(table_name, ()))
+        if not self.is_hub(table_name):
+            neighbours |= self.referenced_by.get(table_name, set())
+        return neighbours
+
+    def mentioned_tables(self, text):
+        """
+        Table names (in file order) mentioned in `text`: by name (see
+        find_referenced_tables), or with every word of the name on one line,
+        e.g. "specimen location tracking" for specimen_tracking.
+        """
+        mentioned = set(find_referenced_tables(text, self.tables.keys()))
+        line_words = [set(_stem_words(line)) for line in (text or "").lower().splitlines()]
+        for name in self.tables:
+            if name in mentioned:
+                continue
+            name_words = set(_stem_words(name.replace('_', ' ')))
+            if len(name_words) > 1 and any(name_words <= words for words in line_words):
+                mentioned.add(name)
+        return [name for name in self.tables if name in mentioned]
+
+    def relevant_tables(self, text, include_neighbours=True):
+        """
+        Table names (in file order) mentioned in `text`, plus their FK neighbours.
+        Returns an empty list when no table is mentioned.
+        """
+        selected = set(self.mentioned_tables(text))
+        if include_neighbours:
+            for name in list(selected):
+                selected |= self.neighbours(name)
+        return [name for name in self.tables if name in selected]
+
+    def subset_ddl(self, table_names):
+        """
+        The CREATE TABLE statements of `table_names` followed by the indexes and
+        ALTER TABLE statements on them, in file order
+        """
+        wanted = set(table_names)
+        ddl = "\n\n".join(table.statement for name, table in self.tables.items() if name in wanted)
+        dependent = [statement for name, statement in self.dependent_statements if name in wanted]
+        if dependent:
+            ddl += "\n\n" + "\n".join(dependent)
+        return ddl
+
+    def prune(self, text, include_neighbours=True):
+        """
+        Return (ddl, table_names) with only the tables relevant to `text`. Falls back
+        to the whole DDL (and all tables) when no tables were parsed or none is mentioned.
+        """
+        table_names = self.relevant_tables(text, include_neighbours) if self.tables else []
+        if not table_names:
+            return self.db_design, list(self.tables)
+        return self.subset_ddl(table_names), table_names
+
+
+@lru_cache(maxsize=8)
+def parse_schema(db_design):
+    """Parse (and memoize) the SchemaGraph of a DDL script"""
+    return SchemaGraph(db_design)
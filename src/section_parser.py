@@ -0,0 +1,299 @@
+# src/section_parser.py
+"""
+Single-pass section parser shared by both generator modules.
+
+A document is tokenized line by line into a column-oriented ParsedDocument
+(one row per non-empty line: kind, level, text, number, parent heading).
+Section records are compact __slots__ views created on demand, and the outline
+tree of headings is derived from the parent column when first requested.
+"""
+from array import array
+
+HEADING = 'heading'
+CONTENT = 'content'
+# Values stored in the kind column
+_KIND_CONTENT = 0
+_KIND_HEADING = 1
+
+
+def split_heading(stripped_line):
+    """
+    Return (number, text) if the stripped line is a numbered heading such as
+    "1. Heading", "1.2. Subheading" or "1.6.1.4 Validation/Processing", else None.
+
+    Equivalent to matching r'(\\d+(\\.\\d+)*)\\.?\\s+(.+)' but done with str methods,
+    which is considerably faster than a regex match per line.
+    """
+    if not stripped_line[0].isdecimal():
+        return None
+    parts = stripped_line.split(None, 1)
+    if len(parts) != 2:
+        return None
+    number = parts[0]
+    if number[-1] == '.':
+        number = number[:-1]
+    if not number or number[-1] == '.' or '..' in number or not number.replace('.', '').isdecimal():
+        return None
+    return number, parts[1]
+
+
+class Section:
+    """
+    One parsed line of a document.
+
+    `parent` is the index (in the parsed document) of the heading this section
+    belongs to, or -1 for top-level headings and content that appears before the
+    first heading. Records also support read-only dict-style access
+    (section['text']) for callers written against the original dict records.
+    """
+    __slots__ = ('type', 'level', 'text', 'number', 'indent_level', 'parent')
+
+    def __init__(self, type, level, text, number, indent_level, parent):
+        self.type = type
+        self.level = level
+        self.text = text
+        self.number = number
+        self.indent_level = indent_level
+        self.parent = parent
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    @property
+    def dots_count(self):
+        return self.level - 1
+
+    def to_dict(self):
+        data = {'type': self.type, 'level': self.level, 'text': self.text, 'indent_level': self.indent_level}
+        if self.type == HEADING:
+            data['number'] = self.number
+        return data
+
+    def __eq__(self, other):
+        if not isinstance(other, Section):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f"Section({self.type!r}, level={self.level}, text={self.text!r})"
+
+
+class OutlineNode:
+    """A heading in the outline tree, with its sub-headings and the indices of its content lines"""
+    __slots__ = ('document', 'index', 'children', 'content')
+
+    def __init__(self, document, index=-1):
+        self.document = document
+        self.index = index  # -1 for the root node
+        self.children = []
+        self.content = []
+
+    @property
+    def section(self):
+        return self.document[self.index] if self.index >= 0 else None
+
+    @property
+    def text(self):
+        return self.document.texts[self.index] if self.index >= 0 else None
+
+    @property
+    def number(self):
+        return self.document.numbers[self.index] if self.index >= 0 else None
+
+    def content_texts(self):
+        texts = self.document.texts
+        return [texts[i] for i in self.content]
+
+    def iter_headings(self):
+        """Depth-first iteration over all heading nodes below this one"""
+        stack = list(reversed(self.children))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def __repr__(self):
+        return f"OutlineNode({self.text or '<root>'!r}, children={len(self.children)})"
+
+
+class ParsedDocument:
+    """
+    Column-oriented result of parsing a document.
+
+    Row i describes the i-th non-empty line: kinds[i] (1 heading, 0 content),
+    levels[i], texts[i], numbers[i] (heading number or None) and parents[i]
+    (index of the enclosing heading or -1). Indexing or iterating yields Section
+    records; `outline` is the heading tree.
+    """
+    __slots__ = ('kinds', 'levels', 'texts', 'numbers', 'parents', '_outline')
+
+    def __init__(self):
+        self.kinds = array('b')
+        self.levels = array('i')
+        self.texts = []
+        self.numbers = []
+        self.parents = array('i')
+        self._outline = None
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self.texts)
+        level = self.levels[i]
+        if self.kinds[i]:
+            return Section(HEADING, level, self.texts[i], self.numbers[i], level - 1, self.parents[i])
+        # Content is indented one level deeper than its parent heading (level 0 before any heading)
+        return Section(CONTENT, level, self.texts[i], None, level, self.parents[i])
+
+    def __iter__(self):
+        return iter(self.sections())
+
+    def sections(self, start=0):
+        """Section records for rows `start` onwards"""
+        records = []
+        append = records.append
+        rows = zip(self.kinds[start:], self.levels[start:], self.texts[start:],
+                   self.numbers[start:], self.parents[start:])
+        for kind, level, text, number, parent in rows:
+            if kind:
+                append(Section(HEADING, level, text, number, level - 1, parent))
+            else:
+                append(Section(CONTENT, level, text, None, level, parent))
+        return records
+
+    def is_heading(self, i):
+        return bool(self.kinds[i])
+
+    def indent_level(self, i):
+        return self.levels[i] - self.kinds[i]
+
+    def heading_indices(self):
+        return [i for i, kind in enumerate(self.kinds) if kind]
+
+    @property
+    def outline(self):
+        """Root OutlineNode of the heading tree (built on first access)"""
+        if self._outline is None or self._outline[0] != len(self.texts):
+            root = OutlineNode(self)
+            nodes = {}
+            for i, (kind, parent) in enumerate(zip(self.kinds, self.parents)):
+                parent_node = nodes.get(parent, root)
+                if kind:
+                    node = OutlineNode(self, i)
+                    nodes[i] = node
+                    parent_node.children.append(node)
+                else:
+                    parent_node.content.append(i)
+            self._outline = (len(self.texts), root)
+        return self._outline[1]
+
+
+class IncrementalSectionParser:
+    """
+    Incremental, single-pass section parser.
+
+    Text can be fed in arbitrary chunks (e.g. as it streams from the LLM); each
+    call to feed() returns the sections for every line completed so far, i.e.
+    as soon as a line boundary is seen. close() flushes the trailing partial line.
+    The rows accumulate in `self.document`.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self.document = ParsedDocument()
+        # Open headings as (level, index); the root entry has level 0
+        self._stack = [(0, -1)]
+        # Most recent heading, which owns the following content lines
+        self._current_level = 0
+        self._current_index = -1
+
+    def feed(self, chunk):
+        """Consume a chunk of text and return the sections for the lines it completed"""
+        if not chunk:
+            return []
+        self._buffer += chunk
+        *complete_lines, self._buffer = self._buffer.split('\n')
+        start = len(self.document)
+        self.add_lines(complete_lines)
+        return self.document.sections(start)
+
+    def close(self):
+        """Flush the remaining buffered text and return its sections"""
+        line, self._buffer = self._buffer, ""
+        start = len(self.document)
+        self.add_lines([line])
+        return self.document.sections(start)
+
+    def add_lines(self, lines):
+        """Tokenize complete lines into the document columns"""
+        document = self.document
+        kinds_append = document.kinds.append
+        levels_append = document.levels.append
+        texts_append = document.texts.append
+        numbers_append = document.numbers.append
+        parents_append = document.parents.append
+        stack = self._stack
+        current_level = self._current_level
+        current_index = self._current_index
+        index = len(document.texts)
+
+        for line in lines:
+            stripped_line = line.strip()
+            if not stripped_line: # Skip empty lines
+                continue
+
+            # Inlined split_heading(): this loop is the parser's hot path
+            number = None
+            if stripped_line[0].isdecimal():
+                parts = stripped_line.split(None, 1)
+                if len(parts) == 2:
+                    number = parts[0]
+                    if number[-1] == '.':
+                        number = number[:-1]
+                    if not number or number[-1] == '.' or '..' in number or not number.replace('.', '').isdecimal():
+                        number = None
+            if number is not None:
+                text = parts[1]
+                level = number.count('.') + 1
+                # Close headings at the same or a deeper level
+                while stack[-1][0] >= level:
+                    stack.pop()
+                kinds_append(_KIND_HEADING)
+                levels_append(level)
+                # Reconstruct text for consistency
+                texts_append(f"{number}. {text}")
+                numbers_append(number)
+                parents_append(stack[-1][1])
+                stack.append((level, index))
+                current_level = level
+                current_index = index
+            else:
+                kinds_append(_KIND_CONTENT)
+                levels_append(current_level)
+                texts_append(stripped_line)
+                numbers_append(None)
+                parents_append(current_index)
+            index += 1
+
+        self._current_level = current_level
+        self._current_index = current_index
+
+
+def parse_document(content):
+    """Parse a complete document into a column-oriented ParsedDocument"""
+    parser = IncrementalSectionParser()
+    parser.add_lines(content.split('\n'))
+    return parser.document
+
+
+def parse_sections(content):
+    """Parse a complete document into a list of Section records"""
+    return parse_document(content).sections()
@@ -0,0 +1,329 @@
+# src/similarity_index.py
+"""
+Local index of previous generations for near-duplicate inputs.
+
+Analysts often re-upload user stories that differ only in whitespace, a typo
+fix or the order of acceptance criteria. Such inputs miss the exact-hash
+generation and section caches, but the document generated before is still
+(almost) right. This index finds it.
+
+Texts are normalized (lowercase, punctuation and whitespace collapsed), split
+into overlapping word shingles within each line and summarized by a MinHash signature; the
+share of equal signature values estimates the Jaccard similarity of two
+shingle sets. Signatures are banded for locality-sensitive hashing, so a
+lookup only compares the entries sharing a band with the query instead of
+every stored entry, which keeps lookups fast at tens of thousands of entries.
+
+The stories and the schema of an entry are signed separately and the match
+score is the lower of the two similarities, so a large schema cannot hide a
+change in the stories. Entries are only compared within the same scope (the
+kind of output plus the system prompt, model and prompt version it was
+generated with).
+
+Entries are appended to `<index_dir>/index.jsonl` and their content is kept in
+`<index_dir>/content/<sha256>.txt`. Every process of a deployment appends to
+the same file and reads what the others appended before each lookup.
+"""
+import os
+import re
+import json
+import time
+import base64
+import random
+import hashlib
+import logging
+import threading
+from array import array
+from functools import lru_cache
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_SIZE = 3  # Words per shingle
+NUM_PERMUTATIONS = 128
+# 16 bands of 8 rows: pairs above ~0.8 similarity share a band with high probability
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+# Same seed in every process, so stored signatures stay comparable
+MINHASH_SEED = 1
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+NON_WORD_PATTERN = re.compile(r'[^a-z0-9]+')
+
+# Defaults can be overridden through environment variables (see get_similarity_index)
+DEFAULT_REUSE_THRESHOLD = 0.95
+DEFAULT_SEED_THRESHOLD = 0.8
+DEFAULT_OUTPUT_PATH = Path(__file__).parent.parent / "output"
+
+_random = random.Random(MINHASH_SEED)
+_PERMUTATIONS = [
+    (_random.randrange(1, _MERSENNE_PRIME), _random.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+
+def normalize_text(text):
+    """Lowercase words of `text` with punctuation and whitespace removed"""
+    return NON_WORD_PATTERN.sub(" ", (text or "").lower()).split()
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """
+    The set of `size`-word shingles of the normalized text. Shingles do not
+    span lines, so reordered lines (e.g. acceptance criteria) give the same set.
+    """
+    result = set()
+    for line in (text or "").splitlines():
+        words = normalize_text(line)
+        if 0 < len(words) <= size:
+            result.add(" ".join(words))
+        result.update(" ".join(words[i:i + size]) for i in range(len(words) - size + 1))
+    return result
+
+
+def minhash(text):
+    """MinHash signature (NUM_PERMUTATIONS 32-bit values) of the text's shingles, or None for empty text"""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        for shingle in shingles(text)
+    ]
+    if not hashes:
+        return None
+    return array("I", (
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    ))
+
+
+# Schemas are long and the same schema comes with every epic of a document
+@lru_cache(maxsize=32)
+def _schema_minhash(schema):
+    return minhash(schema)
+
+
+def similarity(signature_a, signature_b):
+    """Estimated Jaccard similarity of two signatures (None stands for empty text)"""
+    if signature_a is None or signature_b is None:
+        return 1.0 if signature_a is signature_b else 0.0
+    return sum(1 for a, b in zip(signature_a, signature_b) if a == b) / NUM_PERMUTATIONS
+
+
+def _text_hash(text):
+    return hashlib.sha256(" ".join(normalize_text(text)).encode("utf-8")).hexdigest()
+
+
+def _encode_signature(signature):
+    return base64.b64encode(signature.tobytes()).decode("ascii") if signature is not None else None
+
+
+def _decode_signature(value):
+    if value is None:
+        return None
+    signature = array("I")
+    signature.frombytes(base64.b64decode(value))
+    return signature
+
+
+class NearDuplicate:
+    """A previous generation whose inputs are similar to the looked-up ones"""
+
+    def __init__(self, similarity, content, label, reuse):
+        self.similarity = similarity
+        self.content = content
+        self.label = label
+        # True: similar enough to be the result; False: only a seed for a delta prompt
+        self.reuse = reuse
+
+    def __repr__(self):
+        return f"NearDuplicate(label={self.label!r}, similarity={self.similarity:.3f}, reuse={self.reuse})"
+
+
+class SimilarityIndex:
+    """
+    MinHash/LSH index of generated content keyed by the stories and schema it
+    was generated from. Matches at or above `reuse_threshold` are returned as a
+    result, matches at or above `seed_threshold` as a seed for a delta prompt.
+    """
+
+    def __init__(self, index_dir, reuse_threshold=DEFAULT_REUSE_THRESHOLD, seed_threshold=DEFAULT_SEED_THRESHOLD):
+        self.index_dir = Path(index_dir)
+        self.content_dir = self.index_dir / "content"
+        self.content_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.index_dir / "index.jsonl"
+        self.reuse_threshold = reuse_threshold
+        self.seed_threshold = seed_threshold
+
+        self._entries = []  # (scope, stories signature, schema signature, content hash, label)
+        self._buckets = {}  # hash of (scope, band, band values) -> entry positions
+        self._exact = {}  # (scope, normalized stories hash, normalized schema hash) -> entry position
+        self._offset = 0  # Bytes of index.jsonl already loaded
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "reused": 0, "seeded": 0, "misses": 0, "stores": 0}
+        with self._lock:
+            self._sync()
+
+    @staticmethod
+    def _band_keys(scope, signature):
+        return [
+            hash((scope, band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes()))
+            for band in range(LSH_BANDS)
+        ]
+
+    def find(self, scope, stories, schema=""):
+        """Return the most similar previous generation above the seed threshold, or None"""
+        exact_key = (scope, _text_hash(stories), _text_hash(schema))
+        stories_signature = minhash(stories)
+        schema_signature = _schema_minhash(schema) if stories_signature is not None else None
+        with self._lock:
+            self._sync()
+            self._stats["lookups"] += 1
+            position = self._exact.get(exact_key)
+            if position is not None:
+                candidates = [(1.0, position)]
+            elif stories_signature is None:
+                candidates = []
+            else:
+                positions = set()
+                for band_key in self._band_keys(scope, stories_signature):
+                    positions.update(self._buckets.get(band_key, ()))
+                candidates = []
+                for position in positions:
+                    entry = self._entries[position]
+                    if entry[0] != scope:
+                        continue
+                    score = min(similarity(stories_signature, entry[1]), similarity(schema_signature, entry[2]))
+                    if score >= self.seed_threshold:
+                        candidates.append((score, position))
+                candidates.sort(reverse=True)
+
+            for score, position in candidates:
+                _, _, _, content_hash, label = self._entries[position]
+                content = self._read_content(content_hash)
+                if content is None:
+                    continue
+                reuse = score >= self.reuse_threshold
+                self._stats["reused" if reuse else "seeded"] += 1
+                return NearDuplicate(score, content, label, reuse)
+            self._stats["misses"] += 1
+            return None
+
+    def add(self, scope, stories, schema, content, label=None):
+        """Index `content` as generated from `stories` and `schema` (skipped if these are already indexed)"""
+        stories_signature = minhash(stories)
+        if stories_signature is None or not content.strip():
+            return
+        exact_key = (scope, _text_hash(stories), _text_hash(schema))
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        record = {
+            "scope": scope,
+            "stories_hash": exact_key[1],
+            "schema_hash": exact_key[2],
+            "stories": _encode_signature(stories_signature),
+            "schema": _encode_signature(_schema_minhash(schema)),
+            "content": content_hash,
+            "label": label,
+            "created_at": time.time(),
+        }
+        with self._lock:
+            self._sync()
+            if exact_key in self._exact:
+                return
+            try:
+                self._write_content(content_hash, content)
+                # One append per entry; other processes pick it up on their next lookup
+                with open(self.index_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError as e:
+                logger.warning(f"Could not add to the similarity index {self.index_path}: {e}")
+                return
+            self._stats["stores"] += 1
+            self._sync()
+
+    def stats(self):
+        with self._lock:
+            self._sync()
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "reuse_threshold": self.reuse_threshold,
+                "seed_threshold": self.seed_threshold,
+            }
+
+    # --- Internal helpers (caller must hold self._lock) ---
+
+    def _sync(self):
+        """Load the entries appended to index.jsonl (by any process) since the last call"""
+        try:
+            with open(self.index_path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.warning(f"Could not read the similarity index {self.index_path}: {e}")
+            return
+        # A line still being appended by another process is read next time
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                self._load_record(json.loads(line))
+            except (ValueError, KeyError) as e:
+                logger.warning(f"Skipping invalid similarity index entry: {e}")
+        self._offset += end
+
+    def _load_record(self, record):
+        exact_key = (record["scope"], record["stories_hash"], record["schema_hash"])
+        if exact_key in self._exact:
+            return
+        stories_signature = _decode_signature(record["stories"])
+        position = len(self._entries)
+        self._entries.append((
+            record["scope"], stories_signature, _decode_signature(record["schema"]),
+            record["content"], record.get("label")
+        ))
+        self._exact[exact_key] = position
+        for band_key in self._band_keys(record["scope"], stories_signature):
+            self._buckets.setdefault(band_key, []).append(position)
+
+    def _content_path(self, content_hash):
+        return self.content_dir / f"{content_hash}.txt"
+
+    def _read_content(self, content_hash):
+        try:
+            return self._content_path(content_hash).read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    def _write_content(self, content_hash, content):
+        path = self._content_path(content_hash)
+        if path.exists():
+            return
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp_path.write_text(content, encoding="utf-8")
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+
+_similarity_index = None
+_similarity_index_lock = threading.Lock()
+
+
+def get_similarity_index(output_path=None):
+    """
+    Return the process-wide near-duplicate index (stored under
+    `<output_path>/similarity`), or None if disabled via
+    NEAR_DUPLICATE_ENABLED=false.
+    """
+    global _similarity_index
+    if os.getenv("NEAR_DUPLICATE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    with _similarity_index_lock:
+        if _similarity_index is None:
+            _similarity_index = SimilarityIndex(
+                Path(output_path or DEFAULT_OUTPUT_PATH) / "similarity",
+                reuse_threshold=float(os.getenv("NEAR_DUPLICATE_REUSE_THRESHOLD", DEFAULT_REUSE_THRESHOLD)),
+                seed_threshold=float(os.getenv("NEAR_DUPLICATE_SEED_THRESHOLD", DEFAULT_SEED_THRESHOLD)),
+            )
+        return _similarity_index
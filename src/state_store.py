@@ -0,0 +1,228 @@
+# src/state_store.py
+"""
+Pluggable store for state that spans requests: upload bundle manifests, job
+records and the artifact index.
+
+Every process of a deployment (uvicorn --workers N, several containers) must
+see the same state, so an upload accepted by one process can be generated from
+by another and a job queued on one can be polled on any. Values are JSON
+objects stored under (namespace, key).
+
+Stores:
+- "file": one JSON file per value, `<state_dir>/<namespace>/<key>.json`,
+  written atomically. Works across hosts that share the output volume (default).
+- "sqlite": one SQLite database in WAL mode, `<state_dir>/state.db`. Faster for
+  frequent updates such as job progress, but all processes must run on one host
+  (WAL does not work over network filesystems).
+- "memory": a dict in this process, for tests and single-process runs.
+
+The store is chosen with STATE_STORE (see create_state_store).
+"""
+import os
+import re
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+STATE_STORE_FILE = "file"
+STATE_STORE_SQLITE = "sqlite"
+STATE_STORE_MEMORY = "memory"
+STATE_STORES = (STATE_STORE_FILE, STATE_STORE_SQLITE, STATE_STORE_MEMORY)
+DEFAULT_STATE_DIR = Path(__file__).parent.parent / "output"
+# Namespaces and keys become file names in the file store
+STATE_KEY_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,128}$')
+# How long a SQLite writer waits for another process's write to finish
+SQLITE_BUSY_TIMEOUT_SECONDS = 30
+
+
+def _is_valid_key(namespace, key):
+    return bool(STATE_KEY_PATTERN.match(namespace)) and bool(STATE_KEY_PATTERN.match(key or ""))
+
+
+def _check_key(namespace, key):
+    if not _is_valid_key(namespace, key):
+        raise ValueError(f"Invalid state key '{namespace}/{key}'.")
+
+
+class StateStore(ABC):
+    """Interface of the state stores: JSON values under (namespace, key)"""
+
+    @abstractmethod
+    def get(self, namespace, key):
+        """Return the value stored under `key`, or None"""
+
+    @abstractmethod
+    def put(self, namespace, key, value):
+        """Store `value` (a JSON-serializable dict) under `key`, replacing any previous value"""
+
+    @abstractmethod
+    def delete(self, namespace, key):
+        """Remove the value stored under `key`, if any"""
+
+    def close(self):
+        pass
+
+
+class MemoryStateStore(StateStore):
+    """State kept in this process only"""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace, key):
+        with self._lock:
+            value = self._values.get((namespace, key))
+        # Copies, so callers cannot change the stored value in place
+        return json.loads(value) if value is not None else None
+
+    def put(self, namespace, key, value):
+        _check_key(namespace, key)
+        with self._lock:
+            self._values[(namespace, key)] = json.dumps(value)
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._values.pop((namespace, key), None)
+
+
+class FileStateStore(StateStore):
+    """
+    One JSON file per value. Each write goes to a temporary file that is then
+    renamed over the old one, so readers in any process see either the old or
+    the new value, never a partial one.
+    """
+
+    def __init__(self, state_dir):
+        self.state_dir = Path(state_dir)
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, namespace, key):
+        return self.state_dir / namespace / f"{key}.json"
+
+    def get(self, namespace, key):
+        if not _is_valid_key(namespace, key):
+            return None
+        try:
+            with open(self._path(namespace, key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read state {namespace}/{key}: {e}")
+            return None
+
+    def put(self, namespace, key, value):
+        _check_key(namespace, key)
+        path = self._path(namespace, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{uuid.uuid4().hex}.part")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f, indent=2)
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def delete(self, namespace, key):
+        if not _is_valid_key(namespace, key):
+            return
+        self._path(namespace, key).unlink(missing_ok=True)
+
+
+class SQLiteStateStore(StateStore):
+    """
+    All state in one SQLite database in WAL mode: readers never block the
+    writer, and processes on the same host share it safely. Each thread uses
+    its own connection.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, updated_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=SQLITE_BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # With WAL, NORMAL only risks the last commits on power loss, never corruption
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def get(self, namespace, key):
+        row = self._connection().execute(
+            "SELECT value FROM state WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, namespace, key, value):
+        _check_key(namespace, key)
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO state (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), time.time())
+            )
+
+    def delete(self, namespace, key):
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+
+def create_state_store(store_name=None, state_dir=None):
+    """
+    Create the store selected by `store_name` or the STATE_STORE environment
+    variable (file, sqlite or memory), under STATE_DIR (default `output/`).
+    """
+    store_name = (store_name or os.getenv("STATE_STORE", STATE_STORE_FILE)).lower()
+    state_dir = Path(state_dir or os.getenv("STATE_DIR", DEFAULT_STATE_DIR))
+    if store_name == STATE_STORE_FILE:
+        return FileStateStore(state_dir)
+    if store_name == STATE_STORE_SQLITE:
+        return SQLiteStateStore(state_dir / "state.db")
+    if store_name == STATE_STORE_MEMORY:
+        return MemoryStateStore()
+    raise ValueError(f"Unknown state store '{store_name}'. Expected one of: {', '.join(STATE_STORES)}.")
+
+
+_state_store = None
+_state_store_lock = threading.Lock()
+
+
+def get_state_store():
+    """Return the process-wide state store"""
+    global _state_store
+    with _state_store_lock:
+        if _state_store is None:
+            _state_store = create_state_store()
+            logger.info(f"Using {type(_state_store).__name__} for shared state.")
+        return _state_store
@@ -0,0 +1,148 @@
+# src/structure_validator.py
+"""
+Structural validation of generated documents against the outline required by
+prompt/system.txt.
+
+Every epic becomes one top-level section "N. [Screen Name]" with the
+subsections N.1 Function of Screen, N.2 Title, N.3 User Interface (with N.3.1
+Screen Sample), N.4 Data Displayed, N.5 Data Entry/Edit and N.6 Controls. Each
+control N.6.k has N.6.k.1 Picture, N.6.k.2 Visible, N.6.k.3 Enabled and
+N.6.k.4 Validation/Processing. Every heading must be nested under the heading
+its number belongs to, and the text must not use markdown.
+
+validate_section() checks one section on its parsed outline and returns the
+problems found, so the generator can re-prompt for just the malformed sections
+instead of regenerating the whole document.
+"""
+import re
+
+from src.epics import NUMBERED_LINE_PATTERN
+from src.section_parser import parse_document
+
+REQUIRED_SUBSECTIONS = (
+    ("1", "Function of Screen"),
+    ("2", "Title"),
+    ("3", "User Interface"),
+    ("3.1", "Screen Sample"),
+    ("4", "Data Displayed"),
+    ("5", "Data Entry/Edit"),
+    ("6", "Controls"),
+)
+CONTROL_SUBSECTIONS = (
+    ("1", "Picture"),
+    ("2", "Visible"),
+    ("3", "Enabled"),
+    ("4", "Validation/Processing"),
+)
+# Headings, bullets and tables at the start of a line; bold text or code fences anywhere
+MARKDOWN_PATTERN = re.compile(r'^\s*(?:#{1,6}\s|[*+-]\s|\|)|\*\*|```')
+NON_ALPHANUMERIC_PATTERN = re.compile(r'[^a-z0-9]+')
+
+
+def _normalize_title(title):
+    return NON_ALPHANUMERIC_PATTERN.sub("", title.lower())
+
+
+def _check_heading(document, headings, number, title, issues):
+    index = headings.get(number)
+    if index is None:
+        issues.append(f"missing {number} {title}")
+        return
+    actual = document.texts[index].split(None, 1)[1]
+    if not _normalize_title(actual).startswith(_normalize_title(title)):
+        issues.append(f"{number} should be '{title}', not '{actual}'")
+
+
+def _outline_text(section_text):
+    """
+    The section without its numbered list items. As in renumber_section, the
+    first unindented "N. Name" line is the section heading and only dotted
+    numbers under N ("N.6.1.4 ...") are sub-headings; any other numbered line,
+    such as an indented "1. Provider can search" acceptance criterion, is content.
+    """
+    lines = []
+    top = None
+    for line in section_text.splitlines():
+        match = NUMBERED_LINE_PATTERN.match(line)
+        if match and (match.group(5) or "").strip():
+            indent, number, rest = match.group(1), match.group(2), match.group(3)
+            if top is None and not rest and not indent:
+                top = number
+            elif not rest or number != top:
+                continue
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def validate_section(section_text, number):
+    """
+    Return the structural problems of top-level section `number` (an empty list
+    if it follows the required outline).
+    """
+    issues = []
+    for line in section_text.splitlines():
+        if MARKDOWN_PATTERN.search(line):
+            issues.append(f"markdown formatting in '{line.strip()[:60]}'")
+            break
+
+    # List items are content for the checks below; the parser would read them as headings
+    document = parse_document(_outline_text(section_text))
+    heading_indices = document.heading_indices()
+    top = str(number)
+    if not heading_indices or document.numbers[heading_indices[0]] != top:
+        issues.append(f"does not start with the heading '{top}. [Screen Name]'")
+
+    headings = {}  # heading number -> row index
+    for i in heading_indices:
+        heading_number = document.numbers[i]
+        if heading_number in headings:
+            issues.append(f"duplicate heading {heading_number}")
+            continue
+        headings[heading_number] = i
+        expected_parent = heading_number.rpartition('.')[0]
+        parent = document.parents[i]
+        if expected_parent and (parent < 0 or document.numbers[parent] != expected_parent):
+            issues.append(f"{heading_number} is not nested under {expected_parent}")
+
+    for suffix, title in REQUIRED_SUBSECTIONS:
+        _check_heading(document, headings, f"{top}.{suffix}", title, issues)
+    controls = [n for n in headings if n.count('.') == 2 and n.startswith(f"{top}.6.")]
+    if f"{top}.6" in headings and not controls:
+        issues.append(f"{top}.6 Controls describes no control ({top}.6.1 ...)")
+    for control in controls:
+        for suffix, title in CONTROL_SUBSECTIONS:
+            _check_heading(document, headings, f"{control}.{suffix}", title, issues)
+    return issues
+
+
+def split_top_level_sections(content):
+    """
+    Split a document into the text before its first top-level heading (the
+    Document Summary) and the text of each top-level section. A top-level
+    heading is an unindented "N. Name" line numbered above the previous one,
+    so numbered list items inside a section do not start a new section.
+    """
+    preamble = []
+    sections = []
+    current = preamble
+    last_number = 0
+    for line in content.splitlines():
+        match = NUMBERED_LINE_PATTERN.match(line)
+        if match and not match.group(1) and not match.group(3) and (match.group(5) or "").strip() \
+                and int(match.group(2)) > last_number:
+            last_number = int(match.group(2))
+            current = []
+            sections.append(current)
+        current.append(line)
+    return "\n".join(preamble).strip(), ["\n".join(section).strip() for section in sections]
+
+
+def validate_document(content):
+    """Return [(position, issues)] for every malformed top-level section; section i must be numbered i + 1"""
+    _, sections = split_top_level_sections(content)
+    report = []
+    for position, section in enumerate(sections):
+        issues = validate_section(section, position + 1)
+        if issues:
+            report.append((position, issues))
+    return report
@@ -0,0 +1,232 @@
+# src/upload_archives.py
+"""
+Bulk uploads: several user story files in one request, or zip/tar archives of
+them. Archives are extracted entry by entry in fixed-size chunks straight into
+the UploadStore, so neither an archive nor an entry is ever held in memory and
+oversized or zip-bomb archives are rejected as soon as a limit is crossed.
+
+Each stored file is split into stories (see src/epics.py) and the manifest
+records, per file, its upload id and size and, per story, its title, epic and
+SHA-256, so later stages can work with individual stories.
+"""
+import os
+import zlib
+import codecs
+import hashlib
+import logging
+import tarfile
+import zipfile
+from pathlib import PurePosixPath
+
+from src.epics import split_stories, story_epic_name, STORY_START_PATTERN
+from src.upload_store import UploadLimitExceededError, UPLOAD_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_MAX_ENTRY_MB = 10
+DEFAULT_MAX_TOTAL_MB = 100
+# Uncompressed/compressed size ratio above which a zip entry is treated as a zip bomb
+DEFAULT_MAX_COMPRESSION_RATIO = 100
+# Archive members that are never user stories (macOS resource forks, hidden files)
+IGNORED_NAME_PREFIXES = (".", "__MACOSX")
+ZIP_MAGIC = (b"PK\x03\x04", b"PK\x05\x06")
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+
+class InvalidArchiveError(ValueError):
+    """Raised for an archive that cannot be read"""
+
+
+class NotTextError(ValueError):
+    """Raised for an entry that is not UTF-8 text"""
+
+
+class BulkUploadLimits:
+    """Size limits of a bulk upload, read from the environment by default"""
+
+    def __init__(self, max_entries=None, max_entry_bytes=None, max_total_bytes=None, max_compression_ratio=None):
+        self.max_entries = max_entries or int(os.getenv("UPLOAD_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        self.max_entry_bytes = max_entry_bytes or int(
+            float(os.getenv("UPLOAD_MAX_ENTRY_MB", DEFAULT_MAX_ENTRY_MB)) * 1024 * 1024
+        )
+        self.max_total_bytes = max_total_bytes or int(
+            float(os.getenv("UPLOAD_MAX_TOTAL_MB", DEFAULT_MAX_TOTAL_MB)) * 1024 * 1024
+        )
+        self.max_compression_ratio = max_compression_ratio or float(
+            os.getenv("UPLOAD_MAX_COMPRESSION_RATIO", DEFAULT_MAX_COMPRESSION_RATIO)
+        )
+
+
+def archive_kind(filename, fileobj):
+    """Return "zip", "tar" or None (a plain file), from the content and the file name"""
+    head = fileobj.read(4)
+    fileobj.seek(0)
+    if head in ZIP_MAGIC:
+        return "zip"
+    if (filename or "").lower().endswith(TAR_SUFFIXES):
+        return "tar"
+    return None
+
+
+def is_ignored(name):
+    return any(part.startswith(IGNORED_NAME_PREFIXES) for part in PurePosixPath(name).parts)
+
+
+def read_chunks(fileobj, chunk_size=UPLOAD_CHUNK_SIZE):
+    while chunk := fileobj.read(chunk_size):
+        yield chunk
+
+
+def archive_member_chunks(member, name):
+    """Chunks of an archive member; corruption found while reading raises InvalidArchiveError"""
+    try:
+        yield from read_chunks(member)
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, zlib.error) as e:
+        raise InvalidArchiveError(f"Cannot read archive entry '{name}': {e}")
+
+
+def utf8_checked(chunks):
+    """Pass chunks through, raising NotTextError if they are not valid UTF-8"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        for chunk in chunks:
+            decoder.decode(chunk)
+            yield chunk
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError as e:
+        raise NotTextError(f"Not UTF-8 text: {e}")
+
+
+def iter_zip_entries(fileobj, limits):
+    """Yield (name, chunk iterator) for each regular file of a zip archive, in name order"""
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile as e:
+        raise InvalidArchiveError(f"Invalid zip archive: {e}")
+    with archive:
+        for info in sorted(archive.infolist(), key=lambda info: info.filename):
+            if info.is_dir():
+                continue
+            if info.file_size > limits.max_entry_bytes:
+                raise UploadLimitExceededError(
+                    f"Archive entry '{info.filename}' is {info.file_size} bytes, "
+                    f"larger than the limit of {limits.max_entry_bytes} bytes."
+                )
+            if info.compress_size and info.file_size / info.compress_size > limits.max_compression_ratio:
+                raise UploadLimitExceededError(
+                    f"Archive entry '{info.filename}' has a compression ratio above {limits.max_compression_ratio:g}."
+                )
+            try:
+                member = archive.open(info)
+            except (zipfile.BadZipFile, RuntimeError) as e:
+                # RuntimeError: encrypted entry
+                raise InvalidArchiveError(f"Cannot read archive entry '{info.filename}': {e}")
+            with member:
+                yield info.filename, archive_member_chunks(member, info.filename)
+
+
+def iter_tar_entries(fileobj, limits):
+    """
+    Yield (name, chunk iterator) for each regular file of a (compressed) tar
+    archive. The archive is read as a stream, in member order; links and
+    devices are skipped.
+    """
+    try:
+        with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                if member.size > limits.max_entry_bytes:
+                    raise UploadLimitExceededError(
+                        f"Archive entry '{member.name}' is {member.size} bytes, "
+                        f"larger than the limit of {limits.max_entry_bytes} bytes."
+                    )
+                yield member.name, archive_member_chunks(archive.extractfile(member), member.name)
+    except tarfile.TarError as e:
+        raise InvalidArchiveError(f"Invalid tar archive: {e}")
+
+
+def iter_upload_entries(filename, fileobj, limits):
+    """Yield (name, chunk iterator) for an uploaded file: its entries if it is an archive, else itself"""
+    kind = archive_kind(filename, fileobj)
+    if kind == "zip":
+        yield from iter_zip_entries(fileobj, limits)
+    elif kind == "tar":
+        yield from iter_tar_entries(fileobj, limits)
+    else:
+        yield filename or "upload", read_chunks(fileobj)
+
+
+def story_records(text):
+    """Title, epic and SHA-256 of each story in `text`"""
+    records = []
+    for story in split_stories([text]):
+        title_line = next((line for line in story.splitlines() if STORY_START_PATTERN.match(line)), None)
+        records.append({
+            "title": STORY_START_PATTERN.match(title_line).group(1) if title_line else None,
+            "epic": story_epic_name(story),
+            "sha256": hashlib.sha256(story.encode('utf-8')).hexdigest(),
+        })
+    return records
+
+
+def store_bulk_upload(upload_store, files, limits=None):
+    """
+    Extract and store every user story file in `files` ((filename, binary file
+    object) pairs; archives are expanded) and save a bundle manifest.
+
+    Entries that are hidden, empty or not UTF-8 text are skipped and listed in
+    the result. Raises UploadLimitExceededError when a limit is exceeded,
+    InvalidArchiveError for an unreadable archive and ValueError when nothing
+    usable was uploaded. Returns the manifest plus "skipped" and totals.
+    """
+    limits = limits or BulkUploadLimits()
+    entries = []
+    skipped = []
+    total_bytes = 0
+    for filename, fileobj in files:
+        for name, chunks in iter_upload_entries(filename, fileobj, limits):
+            source = name if name == filename else f"{filename}/{name}"
+            if is_ignored(name):
+                skipped.append({"filename": source, "reason": "hidden or system file"})
+                continue
+            if len(entries) >= limits.max_entries:
+                raise UploadLimitExceededError(f"Upload contains more than {limits.max_entries} files.")
+            remaining = limits.max_total_bytes - total_bytes
+            try:
+                stored = upload_store.save_chunks(
+                    utf8_checked(chunks), max_size=min(limits.max_entry_bytes, remaining)
+                )
+            except NotTextError as e:
+                skipped.append({"filename": source, "reason": str(e)})
+                continue
+            except UploadLimitExceededError:
+                if remaining < limits.max_entry_bytes:
+                    raise UploadLimitExceededError(f"Upload is larger than the limit of {limits.max_total_bytes} bytes in total.")
+                raise UploadLimitExceededError(
+                    f"File '{source}' is larger than the limit of {limits.max_entry_bytes} bytes."
+                )
+            total_bytes += stored["size"]
+            if not stored["size"]:
+                skipped.append({"filename": source, "reason": "empty file"})
+                continue
+            text = upload_store.path_for(stored["upload_id"]).read_text(encoding='utf-8')
+            entries.append({
+                "filename": source,
+                "upload_id": stored["upload_id"],
+                "size": stored["size"],
+                "stories": story_records(text),
+            })
+
+    if not entries:
+        raise ValueError("No user story files found in the upload.")
+    manifest = upload_store.save_manifest(entries)
+    logger.info(f"Stored bundle {manifest['bundle_id']} with {len(entries)} files ({total_bytes} bytes).")
+    return {
+        **manifest,
+        "file_count": len(entries),
+        "story_count": sum(len(entry["stories"]) for entry in entries),
+        "total_size": total_bytes,
+        "skipped": skipped,
+    }
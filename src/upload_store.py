@@ -0,0 +1,150 @@
+# src/upload_store.py
+import os
+import re
+import uuid
+import hashlib
+import logging
+from pathlib import Path
+
+import aiofiles
+
+logger = logging.getLogger(__name__)
+
+# Uploads are read and hashed in chunks of this size
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
+UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+# State store namespace of the bulk upload manifests
+BUNDLES_NAMESPACE = "bundles"
+
+
+class UploadLimitExceededError(ValueError):
+    """Raised when an upload (or an archive entry) is larger than allowed"""
+
+
+class UploadStore:
+    """
+    Content-addressed storage for uploaded input files.
+
+    Each upload is hashed (SHA-256) while it is streamed to disk and stored as
+    `<upload_dir>/<sha256>`; the hash is the upload id. Uploading identical
+    content again reuses the existing file, and because nothing is stored under
+    a fixed name, concurrent users cannot overwrite each other's inputs.
+
+    A bulk upload of several files is stored as one upload per file plus a
+    manifest listing them in the "bundles" namespace of the state store; the
+    bundle id can be used wherever an upload id is expected and resolves to the
+    list of its files (see input_paths).
+    """
+
+    def __init__(self, upload_dir, state_store):
+        self.upload_dir = Path(upload_dir)
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        self.state_store = state_store
+
+    @staticmethod
+    def is_valid_id(upload_id):
+        return bool(upload_id) and bool(UPLOAD_ID_PATTERN.match(upload_id))
+
+    def path_for(self, upload_id):
+        """Return the stored file for `upload_id`, or None if the id is invalid or unknown"""
+        if not self.is_valid_id(upload_id):
+            return None
+        path = self.upload_dir / upload_id
+        return path if path.exists() else None
+
+    def input_paths(self, upload_id):
+        """
+        Return the stored file for a single upload, the list of entry files for a
+        bundle, or None if `upload_id` is neither.
+        """
+        path = self.path_for(upload_id)
+        if path is not None:
+            return path
+        manifest = self.load_manifest(upload_id)
+        if manifest is None:
+            return None
+        paths = [self.path_for(entry["upload_id"]) for entry in manifest["entries"]]
+        if not paths or any(path is None for path in paths):
+            logger.warning(f"Bundle {upload_id} references missing uploads.")
+            return None
+        return paths
+
+    async def save(self, upload_file):
+        """
+        Stream a FastAPI UploadFile into the store.
+        Returns {"upload_id", "size", "deduplicated"}.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        tmp_path = self.upload_dir / f".{uuid.uuid4().hex}.part"
+        try:
+            async with aiofiles.open(tmp_path, 'wb') as out_file:
+                while chunk := await upload_file.read(UPLOAD_CHUNK_SIZE):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    await out_file.write(chunk)
+            return self._commit(tmp_path, digest.hexdigest(), size)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def save_chunks(self, chunks, max_size=None):
+        """
+        Store content produced by an iterable of byte chunks (e.g. an archive
+        entry being extracted), raising UploadLimitExceededError as soon as it
+        grows beyond `max_size` bytes. Returns the same dict as save().
+        """
+        digest = hashlib.sha256()
+        size = 0
+        tmp_path = self.upload_dir / f".{uuid.uuid4().hex}.part"
+        try:
+            with open(tmp_path, 'wb') as out_file:
+                for chunk in chunks:
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise UploadLimitExceededError(f"File is larger than the limit of {max_size} bytes.")
+                    digest.update(chunk)
+                    out_file.write(chunk)
+            return self._commit(tmp_path, digest.hexdigest(), size)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def save_bytes(self, data):
+        """Store in-memory content. Returns the same dict as save()."""
+        upload_id = hashlib.sha256(data).hexdigest()
+        if (self.upload_dir / upload_id).exists():
+            return {"upload_id": upload_id, "size": len(data), "deduplicated": True}
+        tmp_path = self.upload_dir / f".{uuid.uuid4().hex}.part"
+        try:
+            tmp_path.write_bytes(data)
+            return self._commit(tmp_path, upload_id, len(data))
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def _commit(self, tmp_path, upload_id, size):
+        final_path = self.upload_dir / upload_id
+        if final_path.exists():
+            # Identical content is already stored; drop the new copy
+            logger.info(f"Upload {upload_id} already stored, skipping write.")
+            return {"upload_id": upload_id, "size": size, "deduplicated": True}
+        # Atomic rename, so readers never see a partially written upload
+        os.replace(tmp_path, final_path)
+        return {"upload_id": upload_id, "size": size, "deduplicated": False}
+
+    def save_manifest(self, entries):
+        """
+        Store a bundle manifest for `entries` (dicts with at least "upload_id").
+        The bundle id is the SHA-256 of the ordered entry ids, so uploading the
+        same files in the same order again returns the same bundle.
+        """
+        bundle_id = hashlib.sha256(
+            "\n".join(entry["upload_id"] for entry in entries).encode('utf-8')
+        ).hexdigest()
+        manifest = {"bundle_id": bundle_id, "entries": entries}
+        self.state_store.put(BUNDLES_NAMESPACE, bundle_id, manifest)
+        return manifest
+
+    def load_manifest(self, bundle_id):
+        """Return the manifest stored for `bundle_id`, or None"""
+        if not self.is_valid_id(bundle_id):
+            return None
+        return self.state_store.get(BUNDLES_NAMESPACE, bundle_id)